@@ -1,4 +1,8 @@
 import json, requests
+from http_client import get_shared_client
+from endpoint_capabilities import EndpointCapabilities
+from circuit_breaker import CircuitBreaker
+from message_ids import MessageIndex, ensure_message_ids, new_message_id, strip_message_ids
 from tkinter import messagebox
 from functools import wraps
 import re
@@ -59,6 +63,10 @@ def handle_api_errors(parse_response=True):
 
                 if parse_response:
                     data = response.json()
+                    if isinstance(data, dict) and data.get("usage"):
+                        # args are (cls, request_data, ...) for the APIHandler classmethods
+                        request_data = args[1] if len(args) > 1 else kwargs.get("data")
+                        APIHandler.notify_usage(request_data, data["usage"])
                     if "choices" in data and data["choices"]:
                         return data["choices"][0]["message"]["content"].strip()
                     return "Error: Unexpected response structure"
@@ -78,15 +86,46 @@ def handle_api_errors(parse_response=True):
                 print(f"Unexpected error: {e}")
                 return None
             finally:
+                # Closing a fully read response only hands its connection back to the pool
                 APIHandler.close_session(response)
         return wrapper
     return decorator
 
 class APIHandler:
     BASE_URL = config['BASE_URL'].rstrip('/')  # Remove trailing slash if present
-    USES_V1 = True  # Set to True by default, change to False if fails to fetch models at boot
+    USES_V1 = True  # /v1 path layout, detected by fetch_models and remembered in the capability registry
     embeddings_models = []  # Dedicated list for embedding models
     non_embedding_models = []  # Main list for non-embedding models
+    http = get_shared_client()  # pooled keep-alive session, replace with set_http_client()
+    GENERATION_TIMEOUT = (10, 300)  # (connect, read): generation can be slow, a dead host should not be
+    MODELS_TIMEOUT = (10, 60)
+    TOKEN_COUNTER_TIMEOUT = (5, 60)
+    SUMMARY_MODEL = config.get("SUMMARY_MODEL")  # optional cheaper model for conversation summaries
+    EVICTION_POLICY = config.get("EVICTION_POLICY", "lexical")  # "lexical", "embedding" (opt-in, one request per send) or "recency"
+    capabilities = EndpointCapabilities()  # optional endpoints supported by BASE_URL, persisted with a TTL
+    # Transient token counter failures (timeouts, connection errors) stop the counting for a while
+    token_counter_breaker = CircuitBreaker("token-counter", failure_threshold=3, reset_timeout=300)
+
+    usage_callbacks = []  # called with (request_data, usage) after every parsed completion
+
+    @classmethod
+    def register_usage_callback(cls, callback):
+        """Registers a function called with (request_data, usage) whenever a completion reports token usage."""
+        if callback not in cls.usage_callbacks:
+            cls.usage_callbacks.append(callback)
+
+    @classmethod
+    def notify_usage(cls, request_data, usage):
+        for callback in list(cls.usage_callbacks):
+            try:
+                callback(request_data, usage)
+            except Exception as e:
+                print(f"Usage callback failed: {e}")
+
+    @classmethod
+    def set_http_client(cls, http_client):
+        """Replaces the HttpClient used for every API call (dependency injection)."""
+        cls.http = http_client
 
     @classmethod
     def load_api_key(cls):
@@ -100,71 +139,53 @@ class APIHandler:
         """
         Fetches available models from the API and returns a list of model IDs.
         Populates embeddings_models if any model with "embedding" or "intfloat" (non-case sensitive) in its name is found.
+
+        The /v1 vs flat path layout is read from the capability registry; only when it is unknown (or the
+        remembered layout stops working) are both layouts tried, and the one that works is remembered.
         """
         cls.load_api_key()
-        if cls.USES_V1:  # Default path
-            try:
-                response = requests.get(f"{cls.BASE_URL}/v1/models", headers=cls.HEADERS)
-                response.raise_for_status()
-                data = response.json()
+        known_layout = cls.capabilities.get(cls.BASE_URL, "v1_layout")
+        layouts = [True, False] if known_layout is None else [known_layout, not known_layout]
 
-                # Check if the response is a list or a dict with 'data' key
-                if isinstance(data, list):
-                    models = [model.get('id', model.get('name', '')) for model in data if isinstance(model, dict)]
-                elif isinstance(data, dict) and 'data' in data and isinstance(data['data'], list):
-                    models = [model.get('id', model.get('name', '')) for model in data['data'] if isinstance(model, dict)]
-                else:
-                    print("Unexpected response structure")
-                    # first fail, switch to not using v1
-                    print("Switching to not using v1")
-                    cls.USES_V1 = False
-                    # we recursively call this method to try fetching models again without v1
-                    return cls.fetch_models()
-
-                # clean the model list before separating them
-                models = cls.clean_model_list(models)
-
-                # Separate models into embeddings and non-embeddings
-                embedding_pattern = re.compile(r'(?i)embedding|intfloat')
-                cls.embeddings_models = [model for model in models if embedding_pattern.search(model)]
-                cls.non_embedding_models = [model for model in models if model not in cls.embeddings_models]
-                return cls.non_embedding_models
-
-            except requests.exceptions.RequestException as e:
-                print(f"Error fetching models: {e}")
-                # first fail, switch to not using v1
-                cls.USES_V1 = False
-                print("Switching to not using v1")
-                return cls.fetch_models()
+        for uses_v1 in layouts:
+            models = cls._request_models(uses_v1)
+            if models is None:
+                continue
+            cls.USES_V1 = uses_v1
+            cls.capabilities.set(cls.BASE_URL, "v1_layout", uses_v1)
 
-        else:  # not using v1, try alt path
-            try:
-                response = requests.get(f"{cls.BASE_URL}/models", headers=cls.HEADERS)
-                response.raise_for_status()
-                data = response.json()
+            # clean the model list before separating them
+            models = cls.clean_model_list(models)
 
-                if isinstance(data, list):
-                    models = [model.get('id', model.get('name', '')) for model in data if isinstance(model, dict)]
-                elif isinstance(data, dict) and 'data' in data and isinstance(data['data'], list):
-                    models = [model.get('id', model.get('name', '')) for model in data['data'] if isinstance(model, dict)]
-                else:
-                    print("Unexpected response structure")
-                    # still fails, return empty list
-                    return []
+            # Separate models into embeddings and non-embeddings
+            embedding_pattern = re.compile(r'(?i)embedding|intfloat')
+            cls.embeddings_models = [model for model in models if embedding_pattern.search(model)]
+            cls.non_embedding_models = [model for model in models if model not in cls.embeddings_models]
+            return cls.non_embedding_models
 
-                # clean the model list before separating them
-                models = cls.clean_model_list(models)
+        # both layouts failed, keep the old behaviour of using the flat layout
+        cls.USES_V1 = False
+        return []
 
-                # Separate models into embeddings and non-embeddings
-                embedding_pattern = re.compile(r'(?i)embedding|intfloat')
-                cls.embeddings_models = [model for model in models if embedding_pattern.search(model)]
-                cls.non_embedding_models = [model for model in models if model not in cls.embeddings_models]
-                return cls.non_embedding_models
+    @classmethod
+    def _request_models(cls, uses_v1):
+        """Requests the model list with one path layout. Returns the model IDs, or None if this layout does not work."""
+        url = f"{cls.BASE_URL}/v1/models" if uses_v1 else f"{cls.BASE_URL}/models"
+        try:
+            response = cls.http.get(url, headers=cls.HEADERS, timeout=cls.MODELS_TIMEOUT)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Error fetching models from {url}: {e}")
+            return None
 
-            except requests.exceptions.RequestException as e:
-                print(f"Error fetching models: {e}")
-                # still fails, return empty list
-                return []
+        # Check if the response is a list or a dict with 'data' key
+        if isinstance(data, list):
+            return [model.get('id', model.get('name', '')) for model in data if isinstance(model, dict)]
+        if isinstance(data, dict) and 'data' in data and isinstance(data['data'], list):
+            return [model.get('id', model.get('name', '')) for model in data['data'] if isinstance(model, dict)]
+        print(f"Unexpected response structure from {url}")
+        return None
 
     @classmethod
     def get_embeddings_models(cls):
@@ -177,10 +198,10 @@ class APIHandler:
         cls.load_api_key()
         if cls.USES_V1:  # Default path
             print("Using v1 path for chat completions")
-            return requests.post(f"{cls.BASE_URL}/v1/completions", json=data, headers=cls.HEADERS, timeout=300, stream=stream)
+            return cls.http.post(f"{cls.BASE_URL}/v1/completions", json=data, headers=cls.HEADERS, timeout=cls.GENERATION_TIMEOUT, stream=stream)
         else:  # not using v1, try alt path
             print("Using non-v1 path for chat completions")
-            return requests.post(f"{cls.BASE_URL}/completions", json=data, headers=cls.HEADERS, timeout=300, stream=stream)
+            return cls.http.post(f"{cls.BASE_URL}/completions", json=data, headers=cls.HEADERS, timeout=cls.GENERATION_TIMEOUT, stream=stream)
 
     @classmethod
     @handle_api_errors(parse_response=True)
@@ -188,12 +209,12 @@ class APIHandler:
         cls.load_api_key()
         if cls.USES_V1:  # Default path
             print("Using v1 path for chat completions")
-            return requests.post(f"{cls.BASE_URL}/v1/chat/completions", json=data, headers=cls.HEADERS, timeout=300, stream=stream)
+            return cls.http.post(f"{cls.BASE_URL}/v1/chat/completions", json=data, headers=cls.HEADERS, timeout=cls.GENERATION_TIMEOUT, stream=stream)
         else:  # not using v1, try alt path
             print("Using non-v1 path for chat completions")
             #print(f"POST Body: {json.dumps(data, indent=4)}")  # Print the post body
             # Note: This is the OAI compatible path that Gemini uses
-            return requests.post(f"{cls.BASE_URL}/chat/completions", json=data, headers=cls.HEADERS, timeout=300, stream=stream)
+            return cls.http.post(f"{cls.BASE_URL}/chat/completions", json=data, headers=cls.HEADERS, timeout=cls.GENERATION_TIMEOUT, stream=stream)
 
     @staticmethod
     def close_session(response):
@@ -202,6 +223,16 @@ class APIHandler:
 
     @classmethod
     def count_tokens(cls, model, prompt):
+        """
+        Counts tokens with the provider's /utils/token_counter endpoint.
+        Returns None without any request once the endpoint is known to be missing (404/405/501 or a response
+        without "total_tokens"), and fails fast while the token counter circuit breaker is open.
+        """
+        if cls.capabilities.get(cls.BASE_URL, "token_counter") is False:
+            return None
+        if not cls.token_counter_breaker.allow_request():
+            return None
+
         cls.load_api_key()
         url = f"{cls.BASE_URL}/utils/token_counter"
         data = {
@@ -209,15 +240,30 @@ class APIHandler:
             "prompt": prompt
         }
         try:
-            response = requests.post(url, json=data, headers=cls.HEADERS, timeout=300)
+            response = cls.http.post(url, json=data, headers=cls.HEADERS, timeout=cls.TOKEN_COUNTER_TIMEOUT)
+            if response.status_code in (404, 405, 501):
+                print(f"Token counter not available at {url} ({response.status_code}), using local estimates from now on")
+                cls.capabilities.set(cls.BASE_URL, "token_counter", False)
+                cls.token_counter_breaker.record_success()  # the host answered, the endpoint just does not exist
+                return None
             response.raise_for_status()
-            return response.json()
+            token_data = response.json()
+        except ValueError as e:
+            print(f"Failed to parse API response: {e}")
+            cls.capabilities.set(cls.BASE_URL, "token_counter", False)
+            cls.token_counter_breaker.record_success()
+            return None
         except requests.exceptions.RequestException as e:
             print(f"Request failed: {e}")
+            cls.token_counter_breaker.record_failure()
             return None
-        except json.JSONDecodeError as e:
-            print(f"Failed to parse API response: {e}")
+
+        cls.token_counter_breaker.record_success()
+        if not isinstance(token_data, dict) or "total_tokens" not in token_data:
+            cls.capabilities.set(cls.BASE_URL, "token_counter", False)
             return None
+        cls.capabilities.set(cls.BASE_URL, "token_counter", True)
+        return token_data
 
     @classmethod
     def clean_model_list(cls, model_list):
@@ -248,6 +294,7 @@ class ChatbotAPI:
         if not isinstance(sys_prompt, str):
             raise ValueError("sys_prompt must be a non-empty string")
         self.sys_prompt = sys_prompt
+        self.message_index = MessageIndex()  # message id -> position in chat_history
         self.chat_history = []
         self.is_totalgpt = APIHandler.BASE_URL.startswith("https://api.totalgpt.ai")
         self.is_gemini = APIHandler.BASE_URL.startswith("https://generativelanguage.googleapis.com")
@@ -263,7 +310,7 @@ class ChatbotAPI:
 
         # Initialize with the system prompt only if the history is empty
         if not self.chat_history:
-            self.chat_history.append({"role": "system", "content": self.sys_prompt})
+            self.append_message("system", self.sys_prompt)
 
         # If not using TotalGPT, fetch available models
         if not self.is_totalgpt:
@@ -308,6 +355,33 @@ class ChatbotAPI:
         # Ensure there's always a system prompt
         if not new_history or new_history[0].get("role") != "system":
             self._chat_history.insert(0, {"role": "system", "content": self.sys_prompt})
+        # Every message carries a stable ID (histories saved before IDs existed get new ones)
+        ensure_message_ids(self._chat_history)
+        self.message_index.attach(self._chat_history)
+
+    def append_message(self, role, content, message_id=None):
+        """
+        Appends a message to the chat history.
+
+        Args:
+            role (str): "user", "assistant" or "system".
+            content (str): The message text.
+            message_id (str): ID to use (a new one is created if None).
+
+        Returns:
+            dict: The stored message.
+        """
+        message = {"role": role, "content": content, "id": message_id or new_message_id()}
+        self.chat_history.append(message)
+        return message
+
+    def extend_messages(self, messages):
+        """Appends existing messages (keeping their IDs) to the chat history."""
+        self.chat_history.extend(ensure_message_ids(list(messages)))
+
+    def get_message(self, message_id):
+        """Returns the message with `message_id`, or None."""
+        return self.message_index.get(message_id)
 
     def get_sys_prompt(self):
         """Returns the system prompt."""
@@ -339,7 +413,7 @@ class ChatbotAPI:
         updated_sys_prompt = base_sys_prompt.replace("{character_sheet}", char_sheet).replace("{user}", user_name)
 
         # Update the chat history with the new system prompt
-        self.chat_history[0] = {"role": "system", "content": updated_sys_prompt}
+        self.chat_history[0] = {"role": "system", "content": updated_sys_prompt, "id": self.chat_history[0].get("id") or new_message_id()}
         self.sys_prompt = updated_sys_prompt
 
     def get_current_model(self):
@@ -406,13 +480,14 @@ class ChatbotAPI:
             else:
                 raise ValueError(f"Unknown model name or model not available in the API: {creativity_mode}")
 
-    def send_message(self, message_text, store_message=None, custom_history=None):
+    def send_message(self, message_text, store_message=None, custom_history=None, message_id=None):
         """Sends a message to the LLM API and returns the response using chat completion.
 
         Args:
             message_text (str): The message to be sent. If None, will use custom_history.
             store_message (str): The message to store in the chat history (optional).
             custom_history (list): Optional custom chat history to use for this request.
+            message_id (str): ID for the stored user message (optional, e.g. when metadata was already registered under it).
 
         Returns:
             str or None: The response from the LLM API if successful, None otherwise.
@@ -431,7 +506,7 @@ class ChatbotAPI:
         # Prepare the base data to send to the API
         base_data = {
             "model": self.current_model,
-            "messages": messages_to_send,
+            "messages": strip_message_ids(messages_to_send),  # IDs are local, providers may reject unknown keys
             "temperature": 0.7,
             "max_tokens": 2048,
             "top_p": 0.95,
@@ -456,14 +531,14 @@ class ChatbotAPI:
         if custom_history is None:
             # Add user message if not already added
             if message_text and store_message:
-                self.chat_history.append({"role": "user", "content": store_message})
+                self.append_message("user", store_message, message_id)
             # Add assistant response
-            self.chat_history.append({"role": "assistant", "content": response})
+            self.append_message("assistant", response)
         else:
             # When using custom history, still add the user message and response to the actual history
             if store_message:
-                self.chat_history.append({"role": "user", "content": store_message})
-            self.chat_history.append({"role": "assistant", "content": response})
+                self.append_message("user", store_message, message_id)
+            self.append_message("assistant", response)
 
         return response
 
@@ -481,4 +556,16 @@ class ChatbotAPI:
             if message["content"] == old_text:
                 message["content"] = new_text
                 return True
-        return False
\ No newline at end of file
+        return False
+
+    def update_message_by_id(self, message_id, new_text):
+        """Updates the content of the message with `message_id`.
+
+        Returns:
+            bool: True if the message was found and updated, False otherwise
+        """
+        message = self.get_message(message_id)
+        if message is None:
+            return False
+        message["content"] = new_text
+        return True
\ No newline at end of file
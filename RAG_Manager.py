@@ -1,21 +1,35 @@
-import requests
-from sklearn.metrics.pairwise import cosine_similarity
+from http_client import get_shared_client
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import json
+import threading
+import numpy as np
+import requests
+from bm25_index import BM25Index
+from embedding_store import EmbeddingStore
+from local_embedder import LocalEmbedder
+from text_chunks import word_chunk_spans
+from vector_index import VideoVectorIndex
 
 class RAGManager:
     """
     RAG (Retrieval-Augmented Generation) Manager for semantic similarity and context retrieval.
     """
-    def __init__(self, model=None, debug=False, api_handler=None):
+    EMBEDDINGS_TIMEOUT = (10, 120)  # (connect, read) seconds
+    SCORE_RANGE = (0.7, 1.0)  # raw cosine similarities of API embeddings mapped to [0, 1] by normalize_score
+    HYBRID_VECTOR_WEIGHT = 0.5  # share of the embedding similarity in the hybrid score, the rest is BM25
+    QUERY_EMBEDDING_TIMEOUT = 2.0  # seconds a question may wait for its remote embedding before BM25 ranks alone
+
+    def __init__(self, model=None, debug=False, api_handler=None, http_client=None, embedding_store=None, local_embedder=None):
         """
         Initialize the RAG Manager. Uses first available embedding model if none specified; on error tries each model on list until one works.
-        if no available models are found, stops itself from functioning, the app will still work just without RAG functionality.
-
-        TODO:
-        [ ] Add a basic generic method alike to embeddings to use when no embedding model is available, something is better than nothing.
+        If no available models are found (or the provider has no embeddings endpoint), embeddings are computed locally
+        by a LocalEmbedder instead, so retrieval still works, offline.
 
         Args:
             model (str): The model name to use for generating embeddings. (Optional)
+            http_client (HttpClient): Pooled HTTP client to use (defaults to the shared one). (Optional)
+            embedding_store (EmbeddingStore): Persistent embedding cache (defaults to embedding_cache.db, shared by every session). (Optional)
+            local_embedder (LocalEmbedder): Fallback embedder used without an embedding model (defaults to a LocalEmbedder()). (Optional)
         """
         with open("config.json", "r") as f:
             config = json.load(f)
@@ -26,6 +40,11 @@ class RAGManager:
         self.embeddings_endpoint = f"{self.base_url}/v1/embeddings" if self.USES_V1 else f"{self.base_url}/embeddings"
         self.debug = debug
         self.api_handler = api_handler
+        self.http = http_client or get_shared_client()
+        self._embedding_store = embedding_store  # opened on first use, so embedding_cache.db is only created once RAG is used
+        self._embedding_store_lock = threading.Lock()
+        self.local_embedder = local_embedder if local_embedder is not None else LocalEmbedder()
+        self.score_range = self.SCORE_RANGE
         self.full_embeddings_list = []  # Store all embeddings in case one returns error
         self.current_model_index = 0  # Track current model index for changing models
 
@@ -37,29 +56,92 @@ class RAGManager:
             self.api_handler.fetch_models()  # Ensure models are fetched at initialization
         self.available_embedding_models = self.api_handler.get_embeddings_models()
 
+        # Prefer the path layout APIHandler already detected for this provider
+        self.capabilities = getattr(self.api_handler, "capabilities", None)
+        known_layout = self.capabilities.get(self.base_url, "v1_layout") if self.capabilities is not None else None
+        if known_layout is not None:
+            self.USES_V1 = known_layout
+            self.embeddings_endpoint = f"{self.base_url}/v1/embeddings" if self.USES_V1 else f"{self.base_url}/embeddings"
+
         # Get first available embedding model if none specified
         if self.model is None and self.available_embedding_models:
             self.model = self.available_embedding_models[0]
             print(f"Using embedding model: {self.model}")
             # also update full list of embeddings
             self.full_embeddings_list = self.available_embedding_models
-        else:
-            print("No embedding model specified and no available models found. RAGManager will disable itself to avoid errors.")
-            self.model = None # all other methods are expected to fail gracefully if model is None
+        elif self.model is None:
+            self._use_local_embedder("No embedding model specified and no available models found")
+        if self.capabilities is not None and self.capabilities.get(self.base_url, "embeddings") is False:
+            self._use_local_embedder("Embeddings endpoint not supported by this provider")
+
+        # Transcript chunks are indexed once per video (BM25, and embeddings per model), questions then only score the query
+        self.bm25_index = BM25Index()
+        self.vector_index = VideoVectorIndex(self)
+        self._query_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rag-query")
+
+    @property
+    def embedding_store(self):
+        """The persistent embedding cache, opened (default EmbeddingStore()) the first time it is needed."""
+        with self._embedding_store_lock:
+            if self._embedding_store is None:
+                self._embedding_store = EmbeddingStore()
+            return self._embedding_store
+
+    def _use_local_embedder(self, reason):
+        """Switches to the local embedder (vectors of the remote and local models are never mixed: they are stored under different model names)."""
+        print(f"{reason}. Using local embeddings ({self.local_embedder.name}), RAG works offline.")
+        self.model = self.local_embedder.name
+        self.score_range = self.local_embedder.SCORE_RANGE
 
     def _get_embeddings(self, texts):
         """
         Get embeddings for a list of texts using the specified API and model.
+        Vectors computed before (in any session) are read from the embedding store; only the others are requested.
 
         Args:
             texts (list): List of text strings to generate embeddings for.
 
         Returns:
-            list: List of embeddings corresponding to the input texts.
+            list: List of embeddings (float32 arrays) corresponding to the input texts.
+        """
+        if self.model is None:
+            print("No embedding model available. Returning empty list.")
+            return []
+        if self.model == self.local_embedder.name:
+            return self.local_embedder.embed(texts)  # cheaper to recompute than to read back from the store
+        model = self.model
+        vectors = self.embedding_store.get_many(model, texts)
+        missing = [index for index, vector in enumerate(vectors) if vector is None]
+        if not missing:
+            return vectors
+
+        missing_texts = [texts[index] for index in missing]
+        fetched = self._request_embeddings(missing_texts)
+        if self.model == self.local_embedder.name:
+            return self._get_embeddings(texts)  # the remote endpoint gave up while requesting
+        if len(fetched) != len(missing_texts):
+            return []
+        self.embedding_store.put_many(self.model, missing_texts, fetched)
+        if self.model != model:
+            # Switched to another model while requesting: vectors of the old model are not comparable
+            return self._get_embeddings(texts)
+        for index, vector in zip(missing, fetched):
+            vectors[index] = np.asarray(vector, dtype=np.float32)
+        return vectors
+
+    def _request_embeddings(self, texts):
+        """
+        Requests embeddings from the API (no cache), switching to the next embedding model on errors.
+
+        Returns:
+            list: List of embeddings corresponding to the input texts ([] if the endpoint is unavailable).
         """
         if self.model is None:
             print("No embedding model available. Returning empty list.")
             return []
+        if self.capabilities is not None and self.capabilities.get(self.base_url, "embeddings") is False:
+            self._use_local_embedder("Embeddings endpoint not supported by this provider")
+            return []
 
         headers = {
             "Content-Type": "application/json",
@@ -76,9 +158,23 @@ class RAGManager:
             print(f"Request Data: {data}\n")
 
         # Make the API request to get embeddings
-        response = requests.post(self.embeddings_endpoint, headers=headers, json=data)
+        try:
+            response = self.http.post(self.embeddings_endpoint, headers=headers, json=data, timeout=self.EMBEDDINGS_TIMEOUT)
+        except requests.RequestException as e:
+            # Network failure (timeout, connection refused...): no vectors this time, the model is kept for the next request
+            print(f"Error fetching embeddings: {e}")
+            return []
         if response.status_code == 200:
+            if self.capabilities is not None:
+                self.capabilities.set(self.base_url, "embeddings", True)
             return [item["embedding"] for item in response.json()["data"]]
+        elif response.status_code in (404, 405, 501):
+            # The endpoint itself is missing, trying other models would not help
+            print(f"Embeddings endpoint not available at {self.embeddings_endpoint} ({response.status_code})")
+            if self.capabilities is not None:
+                self.capabilities.set(self.base_url, "embeddings", False)
+            self._use_local_embedder("Embeddings endpoint missing")
+            return []
         else:
             # if any error occurs, we will try to use the next model in the list
             print(f"Error fetching embeddings: {response.status_code} - {response.text}")
@@ -86,9 +182,10 @@ class RAGManager:
             if self.current_model_index < len(self.full_embeddings_list):
                 self.model = self.full_embeddings_list[self.current_model_index]
                 print(f"Switching to next embedding model: {self.model}")
-                return self._get_embeddings(texts)
+                return self._request_embeddings(texts)
             else:
-                raise Exception("No more embedding models available to try. Please check your API key or model availability.")
+                self._use_local_embedder("No more embedding models available to try, please check your API key or model availability")
+                return []
 
     def _break_into_chunks(self, texts, max_tokens=512):
         """
@@ -107,26 +204,88 @@ class RAGManager:
 
         chunks = []
         for text in texts:
-            words = text.split()
-            current_chunk = []
-            current_token_count = 0
-            for word in words:
-                current_chunk.append(word)
-                current_token_count += 1
-                if current_token_count >= max_tokens:
-                    chunks.append(" ".join(current_chunk))
-                    current_chunk = []
-                    current_token_count = 0
-            if current_chunk:
-                chunks.append(" ".join(current_chunk))
+            chunks.extend(" ".join(text[start:end].split()) for start, end in word_chunk_spans(text, max_tokens))
         return chunks
 
     def normalize_score(self, raw_score):
-        """Normalize scores to [0.7-1.0] range for consistency with API"""
-        normalized = (raw_score - 0.7) / 0.3
-        return max(0, min(normalized, 1.0))  # Clamp values
+        """Normalize scores from the embedder's score_range ([0.7-1.0] for API embeddings) to [0-1] (works on floats and NumPy arrays)"""
+        low, high = self.score_range
+        normalized = np.clip((np.asarray(raw_score, dtype=np.float32) - low) / (high - low), 0.0, 1.0)  # Clamp values
+        return float(normalized) if normalized.ndim == 0 else normalized
+
+    @staticmethod
+    def _normalize_rows(vectors):
+        """float32 matrix (or vector) with unit-length rows, so cosine similarity is a plain dot product."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    @staticmethod
+    def top_k(scores, threshold, k=None):
+        """
+        Indices of the scores at or above `threshold`, best first, at most `k` of them.
+        Uses argpartition, so only the selected scores are sorted.
+        """
+        candidates = np.flatnonzero(scores >= threshold)
+        if k is not None and len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
 
-    def get_relevant_context(self, user_input, context_strings, threshold=0.333):  # Defaults to 33.3% of normalized range
+    def index_transcript(self, video_id, transcript):
+        """
+        Indexes a transcript at ingest: BM25 right away (in-process), the chunk embeddings in the background.
+
+        Returns:
+            Future: The indexing of the embeddings, None without an embedding model.
+        """
+        if not video_id or not transcript:
+            return None
+        self.bm25_index.add(video_id, transcript)
+        return self.vector_index.add_async(video_id, transcript) if self.vector_index.available() else None
+
+    def rank_chunks(self, video_id, transcript, query):
+        """
+        Hybrid relevance of the chunks of a video transcript to a query: BM25 (exact words, names and numbers)
+        fused with the embedding similarity. When the chunk embeddings are not ready yet or the query cannot be
+        embedded within QUERY_EMBEDDING_TIMEOUT, BM25 ranks alone instead of waiting.
+
+        Returns:
+            tuple: ((n, 2) character spans of the chunks, n scores in [0, 1]), or (None, None) for an empty transcript.
+        """
+        entry = self.bm25_index.add(video_id, transcript)  # returns the stored entry when already indexed
+        if entry is None or not len(entry["spans"]):
+            return None, None
+        lexical = self.bm25_index.scores(entry, query)
+        if lexical.max() > 0:
+            lexical = lexical / lexical.max()
+        similarities = self._vector_scores(video_id, transcript, query)
+        if similarities is None or len(similarities) != len(lexical):
+            return entry["spans"], lexical
+        return entry["spans"], self.HYBRID_VECTOR_WEIGHT * self.normalize_score(similarities) + (1 - self.HYBRID_VECTOR_WEIGHT) * lexical
+
+    def _vector_scores(self, video_id, transcript, query):
+        """Embedding similarity of the indexed chunks to the query, None when it is not available without waiting."""
+        if not self.vector_index.available():
+            return None
+        entry = self.vector_index.get(video_id, transcript)
+        if entry is None:
+            self.vector_index.add_async(video_id, transcript)  # ready for the next questions
+            print("Chunk embeddings not ready yet, ranking with BM25 only.")
+            return None
+        try:
+            if self.model == self.local_embedder.name:
+                return self.vector_index.scores(entry, query)  # computed in-process
+            future = self._query_executor.submit(self.vector_index.scores, entry, query)
+            return future.result(timeout=self.QUERY_EMBEDDING_TIMEOUT)
+        except FutureTimeoutError:
+            print(f"Query embedding took more than {self.QUERY_EMBEDDING_TIMEOUT}s, ranking with BM25 only.")
+            return None
+        except requests.RequestException as e:
+            print(f"Query embedding failed ({e}), ranking with BM25 only.")
+            return None
+
+    def get_relevant_context(self, user_input, context_strings, threshold=0.333, video_id=None, top_k=None):  # Defaults to 33.3% of normalized range
         """
         Retrieve relevant context based on semantic similarity with the user input.
 
@@ -134,6 +293,9 @@ class RAGManager:
             user_input (str): The user's input query.
             context_strings (list): List of context strings to compare against.
             threshold (float): Minimum similarity score to consider a match (default: 0.75).
+            video_id (str): When the context is a single video transcript, its ID: the chunks are taken from the
+                per-video indexes and ranked by rank_chunks (hybrid BM25 and embedding scores), only the user input is embedded.
+            top_k (int): Maximum number of chunks returned (default: every chunk above the threshold).
 
         Returns:
             str: Relevant context as a single formatted string.
@@ -142,26 +304,37 @@ class RAGManager:
             print("No embedding model available. Returning no relevant context.")
             return "No relevant context found."
 
-        # Break context strings into smaller chunks
-        context_chunks = self._break_into_chunks(context_strings)
+        normalized_scores = None
+        if video_id is not None and len(context_strings) == 1:
+            spans, normalized_scores = self.rank_chunks(video_id, context_strings[0], user_input)
+            if normalized_scores is not None:
+                similarity_scores = normalized_scores  # hybrid scores are already in [0, 1]
+                transcript = context_strings[0]
+                chunk_text = lambda index: " ".join(transcript[spans[index][0]:spans[index][1]].split())
+
+        if normalized_scores is None:
+            # Break context strings into smaller chunks
+            context_chunks = self._break_into_chunks(context_strings)
+            context_embeddings = self._get_embeddings(context_chunks)
+            if not context_chunks or len(context_embeddings) != len(context_chunks):
+                return "Relevant Context:\nNo relevant context found."
+            context_matrix = self._normalize_rows(context_embeddings)
+            chunk_text = lambda index: context_chunks[index]
 
-        # Get embeddings for user input and context chunks
-        user_embedding = self._get_embeddings([user_input])[0]
-        context_embeddings = self._get_embeddings(context_chunks)
+            # One dot product scores every chunk (rows are unit length)
+            user_embedding = self._get_embeddings([user_input])
+            if not user_embedding:
+                return "Relevant Context:\nNo relevant context found."
+            similarity_scores = context_matrix @ self._normalize_rows(user_embedding[0])
 
-        # Calculate cosine similarity scores
-        similarity_scores = cosine_similarity([user_embedding], context_embeddings)[0]
+            # Normalize scores to API range (0.333 = 0.8 raw with API embeddings)
+            normalized_scores = self.normalize_score(similarity_scores)
 
-        # Normalize scores to API range
-        normalized_scores = [self.normalize_score(score) for score in similarity_scores]
+        # Keep the best chunks above the threshold
+        selected = self.top_k(normalized_scores, threshold, top_k)
 
-        # Filter and sort chunks based on normalized scores
-        relevant_chunks = [
-            {"chunk": chunk, "score": norm_score}
-            for chunk, raw_score, norm_score in zip(context_chunks, similarity_scores, normalized_scores)
-            if norm_score >= threshold  # Use normalized threshold (0.333 = 0.75 raw)
-        ]
-        relevant_chunks.sort(key=lambda x: x["score"], reverse=True)
+        # Only the selected chunks become Python objects
+        relevant_chunks = [{"chunk": chunk_text(index), "score": float(normalized_scores[index])} for index in selected]
 
         # Join relevant chunks into a single string
         relevant_context = "Relevant Context:\n"
@@ -176,8 +349,8 @@ class RAGManager:
             print(f"Model: {self.model}")
             print(f"User Input: {user_input}")
             print(f"Context Chunks and their respective Scores (pre-normalized):")
-            for chunk, raw_score, norm_score in zip(context_chunks, similarity_scores, normalized_scores):
-                print(f"  Chunk: {chunk[:50]}... | Raw Score: {raw_score:.4f} | Normalized Score: {norm_score:.4f}")
+            for index in range(len(similarity_scores)):
+                print(f"  Chunk: {chunk_text(index)[:50]}... | Raw Score: {similarity_scores[index]:.4f} | Normalized Score: {normalized_scores[index]:.4f}")
             print(f"Threshold for relevance: {threshold}")
             print(f"Relevant Chunks (after filtering and sorting):")
             for chunk in relevant_chunks:
@@ -0,0 +1,107 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+from local_embedder import STOP_WORDS
+from text_chunks import word_chunk_spans
+
+class BM25Index:
+    """
+    Lexical (BM25) inverted index of transcript chunks, one per video.
+
+    A transcript is indexed once, when it is ingested: its chunks (the chunking of VideoVectorIndex, so both
+    indexes score the same chunks) are counted into a sparse chunk x term matrix stored column-wise, i.e.
+    one posting list (chunks and term frequencies) per term. Scoring a question only reads the posting
+    lists of its words: no network call, and exact names and numbers ("RTX 5090") count fully.
+    """
+    def __init__(self, chunk_words=120, k1=1.5, b=0.75, max_videos=32):
+        """
+        Initialize the index.
+
+        Args:
+            chunk_words (int): Words per chunk.
+            k1 (float): Term frequency saturation.
+            b (float): Strength of the chunk length normalization.
+            max_videos (int): Indexed videos kept in memory, least recently used dropped first.
+        """
+        self.chunk_words = chunk_words
+        self.k1 = k1
+        self.b = b
+        self.max_videos = max_videos
+        self.analyzer = CountVectorizer(strip_accents="unicode", token_pattern=r"(?u)\b\w+\b", stop_words=list(STOP_WORDS)).build_analyzer()
+        self._entries = OrderedDict()  # video_id -> {"spans", "postings", "vocabulary", "idf", "length_norms", "checksum"}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def checksum(text):
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def get(self, video_id, text=None):
+        """The index entry of a video, or None (also when it was built from a text other than `text`)."""
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(video_id)
+        if text is not None and entry["checksum"] != self.checksum(text):
+            return None
+        return entry
+
+    def add(self, video_id, text):
+        """
+        Indexes the chunks of a transcript (no-op if already indexed).
+
+        Returns:
+            dict: The index entry, or None for an empty text.
+        """
+        entry = self.get(video_id, text)
+        if entry is not None or not text:
+            return entry
+        spans = word_chunk_spans(text, self.chunk_words)
+        chunks = [text[start:end] for start, end in spans]
+        vectorizer = CountVectorizer(analyzer=self.analyzer)
+        try:
+            postings = vectorizer.fit_transform(chunks).tocsc()
+            vocabulary = vectorizer.vocabulary_
+        except ValueError:
+            postings, vocabulary = sparse.csc_matrix((len(chunks), 0)), {}  # only stop words or symbols
+        lengths = np.asarray(postings.sum(axis=1), dtype=np.float32).ravel()
+        document_frequencies = np.diff(postings.indptr)
+
+        entry = {
+            "spans": np.asarray(spans, dtype=np.int64).reshape(-1, 2),
+            "postings": postings,
+            "vocabulary": vocabulary,
+            "idf": np.log(1.0 + (len(chunks) - document_frequencies + 0.5) / (document_frequencies + 0.5)),
+            # k1 * (1 - b + b * length / average length), the chunk part of the BM25 denominator
+            "length_norms": self.k1 * (1.0 - self.b + self.b * lengths / max(float(lengths.mean()), 1.0)),
+            "checksum": self.checksum(text)
+        }
+        with self._lock:
+            self._entries[video_id] = entry
+            self._entries.move_to_end(video_id)
+            while len(self._entries) > self.max_videos:
+                self._entries.popitem(last=False)
+        return entry
+
+    def scores(self, entry, query):
+        """BM25 score of every chunk of an entry for the query (0 for chunks without any of its words)."""
+        scores = np.zeros(len(entry["spans"]), dtype=np.float32)
+        postings = entry["postings"]
+        for term in set(self.analyzer(query)):
+            column = entry["vocabulary"].get(term)
+            if column is None:
+                continue
+            start, end = postings.indptr[column], postings.indptr[column + 1]
+            rows, frequencies = postings.indices[start:end], postings.data[start:end]
+            scores[rows] += entry["idf"][column] * frequencies * (self.k1 + 1) / (frequencies + entry["length_norms"][rows])
+        return scores
+
+    def forget(self, video_id=None):
+        """Drops one video or the whole index."""
+        with self._lock:
+            for key in [key for key in self._entries if video_id is None or key == video_id]:
+                del self._entries[key]
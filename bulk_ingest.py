@@ -0,0 +1,304 @@
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from http_client import get_shared_client
+from transcript_cache import TranscriptCache
+from youtube_transcript_module import YouTubeTranscriptDownloader, classify_youtube_url
+
+PLAYLIST_VIDEO_ID_PATTERN = re.compile(r'"videoId":"([a-zA-Z0-9_-]{11})"')
+CHANNEL_PATH_PATTERN = re.compile(r'^/(@[^/]+|channel/[^/]+|c/[^/]+|user/[^/]+)')
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+    Allows bursts of up to `capacity` requests, refilled at `rate` tokens per second.
+    """
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate (float): Tokens added per second (sustained requests per second).
+            capacity (float): Maximum burst size (defaults to max(1, rate)).
+        """
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1.0):
+        """Blocks until `tokens` are available, then consumes them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+class StubTranscriptProvider:
+    """
+    Offline stand-in for YouTubeTranscriptDownloader, for local testing and benchmarks.
+    Returns deterministic titles and transcripts without touching the network.
+    """
+    cache_language = "stub"
+
+    def __init__(self, words_per_transcript=2000, latency=0.0):
+        """
+        Args:
+            words_per_transcript (int): Size of each generated transcript.
+            latency (float): Simulated seconds per call, to exercise the worker pool.
+        """
+        self.words_per_transcript = words_per_transcript
+        self.latency = latency
+
+    def get_video_title(self, video_id):
+        if self.latency:
+            time.sleep(self.latency)
+        return f"Stub video {video_id}"
+
+    def download_transcript(self, video_id):
+        if self.latency:
+            time.sleep(self.latency)
+        return " ".join(f"{video_id}-word{i}" for i in range(self.words_per_transcript))
+
+def expand_source(source, session=None):
+    """
+    Turns a bulk-ingest source into a list of video IDs.
+
+    Args:
+        source (str): A file of video IDs/URLs (one per line, '#' for comments), a playlist URL,
+            a channel URL (/@handle, /channel/..., /c/..., /user/...) or a single video URL.
+        session: Optional requests-like object used to download playlist/channel pages.
+
+    Returns:
+        list: Unique video IDs, in source order.
+    """
+    if os.path.isfile(source):
+        return read_video_ids_file(source)
+
+    kind, video_id = classify_youtube_url(source)
+    if kind == "video" and "list=" not in source:
+        return [video_id]
+    return list_page_video_ids(source, session=session)
+
+def read_video_ids_file(path):
+    """Reads video IDs (or any YouTube video URLs) from a text file, one per line."""
+    video_ids = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            kind, video_id = classify_youtube_url(line)
+            if kind == "video":
+                video_ids.append(video_id)
+            elif re.fullmatch(r'[a-zA-Z0-9_-]{11}', line):
+                video_ids.append(line)
+            else:
+                print(f"[BulkIngest] Skipping unrecognised line: {line}")
+    return list(dict.fromkeys(video_ids))
+
+def list_page_video_ids(url, session=None):
+    """
+    Lists the video IDs shown on a playlist or channel page.
+    Only the first page YouTube renders is read (roughly the first 100 videos), no API key needed.
+    """
+    http = session or get_shared_client()
+    if "list=" in url:
+        list_id = re.search(r'list=([a-zA-Z0-9_-]+)', url).group(1)
+        page_url = f"https://www.youtube.com/playlist?list={list_id}"
+    else:
+        path = re.sub(r'^https?://[^/]+', '', url if "://" in url else f"https://{url}")
+        match = CHANNEL_PATH_PATTERN.match(path)
+        if not match:
+            print(f"[BulkIngest] Not a playlist or channel URL: {url}")
+            return []
+        page_url = f"https://www.youtube.com/{match.group(1)}/videos"
+
+    response = http.get(page_url, timeout=(5, 30))
+    response.raise_for_status()
+    video_ids = list(dict.fromkeys(PLAYLIST_VIDEO_ID_PATTERN.findall(response.text)))
+    print(f"[BulkIngest] Found {len(video_ids)} videos on {page_url}")
+    return video_ids
+
+class BulkIngestWorker:
+    """
+    Preloads transcripts into the TranscriptCache with a bounded worker pool and a token-bucket rate limiter.
+    Progress is checkpointed to disk so an interrupted run resumes where it stopped.
+    """
+    def __init__(self, provider=None, cache=None, max_workers=4, rate_per_second=1.0, checkpoint_path=None):
+        """
+        Args:
+            provider: Object with get_video_title/download_transcript/cache_language
+                (defaults to a YouTubeTranscriptDownloader sharing `cache`).
+            cache (TranscriptCache): Where transcripts are written (defaults to the app's cache file).
+            max_workers (int): Maximum videos processed at the same time.
+            rate_per_second (float): Sustained YouTube requests per second across all workers.
+            checkpoint_path (str): JSON file recording finished video IDs (optional).
+        """
+        self.cache = cache if cache is not None else TranscriptCache()
+        self.provider = provider or YouTubeTranscriptDownloader(cache=self.cache)
+        self.max_workers = max(1, max_workers)
+        self.rate_limiter = TokenBucket(rate_per_second, capacity=max(1.0, rate_per_second))
+        self.checkpoint_path = checkpoint_path
+        self._checkpoint_lock = threading.Lock()
+        self._done = set()
+        self._failed = set()
+        self._load_checkpoint()
+
+    def _load_checkpoint(self):
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._done = set(data.get("done", []))
+            self._failed = set(data.get("failed", []))
+            print(f"[BulkIngest] Resuming from checkpoint: {len(self._done)} done, {len(self._failed)} failed previously")
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"[BulkIngest] Could not read checkpoint {self.checkpoint_path}: {e}")
+
+    def _save_checkpoint_locked(self):
+        if not self.checkpoint_path:
+            return
+        temp_path = f"{self.checkpoint_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"done": sorted(self._done), "failed": sorted(self._failed)}, f)
+        os.replace(temp_path, self.checkpoint_path)  # atomic, a crash never leaves a half-written checkpoint
+
+    def _mark(self, video_id, ok):
+        with self._checkpoint_lock:
+            if ok:
+                self._done.add(video_id)
+                self._failed.discard(video_id)
+            else:
+                self._failed.add(video_id)
+            self._save_checkpoint_locked()
+
+    def _ingest_one(self, video_id):
+        """Fetches and caches one video. Returns the transcript length, or None on failure."""
+        language = self.provider.cache_language
+        if self.cache.get(video_id, language):
+            return 0  # already cached by the app or a previous run
+
+        self.rate_limiter.acquire()
+        transcript = self.provider.download_transcript(video_id)
+        if not transcript:
+            return None
+
+        self.rate_limiter.acquire()
+        title = self.provider.get_video_title(video_id)
+        get_segments = getattr(self.provider, "get_transcript_segments", None)
+        segments = get_segments(video_id, allow_download=False) if get_segments else None
+        self.cache.put(
+            video_id, language, transcript, title if title and title != "Desconhecido" else None,
+            segments=segments.to_bytes() if segments is not None and segments.text == transcript else None
+        )
+        return len(transcript)
+
+    def run(self, video_ids):
+        """
+        Ingests every video not already finished in the checkpoint.
+
+        Returns:
+            dict: Throughput stats (total, skipped, fetched, already_cached, failed, chars, elapsed_seconds,
+            videos_per_second, chars_per_second).
+        """
+        unique_ids = list(dict.fromkeys(video_ids))
+        pending = [video_id for video_id in unique_ids if video_id not in self._done]
+        stats = {
+            "total": len(unique_ids),
+            "skipped": len(unique_ids) - len(pending),
+            "fetched": 0,
+            "already_cached": 0,
+            "failed": 0,
+            "chars": 0
+        }
+        start = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bulk-ingest") as executor:
+            futures = {executor.submit(self._ingest_one, video_id): video_id for video_id in pending}
+            for completed, future in enumerate(as_completed(futures), start=1):
+                video_id = futures[future]
+                try:
+                    length = future.result()
+                except Exception as e:
+                    print(f"[BulkIngest] {video_id} failed: {e}")
+                    length = None
+
+                if length is None:
+                    stats["failed"] += 1
+                elif length == 0:
+                    stats["already_cached"] += 1
+                else:
+                    stats["fetched"] += 1
+                    stats["chars"] += length
+                self._mark(video_id, length is not None)
+
+                if completed % 10 == 0 or completed == len(pending):
+                    elapsed = time.monotonic() - start
+                    print(f"[BulkIngest] {completed}/{len(pending)} processed ({completed / elapsed if elapsed else 0:.2f} videos/s)")
+
+        elapsed = time.monotonic() - start
+        stats["elapsed_seconds"] = elapsed
+        stats["videos_per_second"] = (stats["fetched"] + stats["already_cached"]) / elapsed if elapsed else 0.0
+        stats["chars_per_second"] = stats["chars"] / elapsed if elapsed else 0.0
+        return stats
+
+def positive_float(value):
+    """argparse type for a strictly positive float."""
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {value}")
+    return number
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Preload YouTube transcripts into the transcript cache.")
+    parser.add_argument("sources", nargs="+", metavar="source", help="Playlist URL, channel URL, video URL or a file with one video ID/URL per line")
+    parser.add_argument("--workers", type=int, default=4, help="Videos processed at the same time (default: 4)")
+    parser.add_argument("--rate", type=positive_float, default=1.0, help="YouTube requests per second across all workers (default: 1)")
+    parser.add_argument("--checkpoint", default="bulk_ingest_checkpoint.json", help="Checkpoint file used to resume")
+    parser.add_argument("--cache", default="transcript_cache.db", help="Transcript cache database")
+    parser.add_argument("--stub", action="store_true", help="Use an offline stub transcript provider (local testing)")
+    args = parser.parse_args(argv)
+
+    cache = TranscriptCache(args.cache)
+    provider = StubTranscriptProvider() if args.stub else None
+    video_ids = []
+    failed_sources = 0
+    for source in args.sources:
+        try:
+            video_ids += expand_source(source)
+        except requests.RequestException as e:
+            # Like a failed video: reported, and the other sources are still ingested
+            failed_sources += 1
+            print(f"[BulkIngest] Could not list the videos of {source}: {e}")
+    if not video_ids:
+        print("[BulkIngest] No videos found.")
+        return 1
+
+    worker = BulkIngestWorker(provider, cache, max_workers=args.workers, rate_per_second=args.rate, checkpoint_path=args.checkpoint)
+    stats = worker.run(video_ids)
+    print(
+        f"[BulkIngest] Done in {stats['elapsed_seconds']:.1f}s: {stats['fetched']} fetched, "
+        f"{stats['already_cached']} already cached, {stats['skipped']} skipped (checkpoint), {stats['failed']} failed\n"
+        f"[BulkIngest] Throughput: {stats['videos_per_second']:.2f} videos/s, {stats['chars_per_second']:.0f} chars/s"
+    )
+    if failed_sources:
+        print(f"[BulkIngest] {failed_sources} source(s) could not be listed")
+    return 0 if stats["failed"] == 0 and not failed_sources else 2
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,109 @@
+import threading
+import time
+
+class CircuitOpenError(Exception):
+    """Raised when a call is attempted while the circuit breaker is open."""
+    pass
+
+class CircuitBreaker:
+    """
+    Minimal thread-safe circuit breaker.
+
+    closed: calls go through, consecutive failures are counted.
+    open: calls fail fast until `reset_timeout` seconds have passed.
+    half_open: a single trial call is let through; success closes the circuit, failure opens it again.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=60):
+        """
+        Initialize the circuit breaker.
+
+        Args:
+            name (str): Name used in log messages.
+            failure_threshold (int): Consecutive failures needed to open the circuit.
+            reset_timeout (float): Seconds the circuit stays open before a trial call is allowed.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._open_for = reset_timeout
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """Returns the current state, moving from open to half_open once the timeout has passed."""
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self._open_for:
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            return self._state
+
+    def allow_request(self):
+        """Returns True if a call may go through right now."""
+        state = self.state
+        with self._lock:
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        """Marks a call as successful, closing the circuit."""
+        with self._lock:
+            if self._state != self.CLOSED:
+                print(f"[CircuitBreaker:{self.name}] Circuit closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """Counts a failed call, opening the circuit once the threshold is reached."""
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._open_locked(self.reset_timeout)
+
+    def trip(self, open_for=None):
+        """Opens the circuit immediately (e.g. on an explicit rate limit response)."""
+        with self._lock:
+            self._open_locked(open_for if open_for is not None else self.reset_timeout)
+
+    def _open_locked(self, open_for):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._open_for = open_for
+        self._trial_in_flight = False
+        print(f"[CircuitBreaker:{self.name}] Circuit opened for {open_for:.0f}s after {self._failures} failure(s)")
+
+    def reset(self):
+        """Forces the circuit back to closed."""
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def call(self, func, *args, **kwargs):
+        """
+        Runs func through the breaker. Any exception counts as a failure and is re-raised.
+
+        Raises:
+            CircuitOpenError: If the circuit is open.
+        """
+        if not self.allow_request():
+            raise CircuitOpenError(f"Circuit '{self.name}' is open")
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
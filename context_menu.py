@@ -4,10 +4,11 @@ import tkinter as tk
 import customtkinter as ctk
 
 class ContextMenu:
-    def __init__(self, master, bubble, app):
+    def __init__(self, master, bubble, app, message_id=None):
         self.master = master
         self.bubble = bubble
         self.app = app
+        self.message_id = message_id
         self.menu = tk.Menu(self.master, tearoff=0)
 
         self.menu.add_command(label="Copy", command=self.copy_text)
@@ -53,14 +54,18 @@ class ContextMenu:
             )
             self.bubble.pack(padx=15, pady=10)
 
-            # Update the chat history
-            self.app.chatbot_api.update_message(text, new_text)
+            # Update the chat history (by ID when the bubble has one, identical texts are then never confused)
+            if self.message_id:
+                self.app.chatbot_api.update_message_by_id(self.message_id, new_text)
+                self.app.message_bubbles[self.message_id] = self.bubble
+            else:
+                self.app.chatbot_api.update_message(text, new_text)
 
             # Auto-save the session
             self.app.auto_save_session()
 
             # Create a new context menu
-            context_menu = ContextMenu(self.master, self.bubble, self.app)
+            context_menu = ContextMenu(self.master, self.bubble, self.app, message_id=self.message_id)
             self.bubble.bind("<3>", lambda e: context_menu.show(e.x_root, e.y_root))
 
         # Create a button to save the changes
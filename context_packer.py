@@ -0,0 +1,207 @@
+class ContextPacker:
+    """
+    Decides in one pass which YouTube transcripts fit in the context window.
+
+    The packer only does arithmetic on token costs measured beforehand, so no token counter is called
+    while the plan is built:
+        - every message has a base cost (YouTube messages with all their videos as links)
+        - every video has an option: the extra tokens its transcript adds over its link, and optionally
+          the extra tokens of its extractive summary, a middle tier used when the transcript does not fit
+    Options can be pinned (kept expanded no matter what); when even the base does not fit, user/assistant
+    pairs are dropped: the oldest first, like MemoryManager.remove_oldest_message_pair, or the lowest
+    scored first when the messages have priorities (see eviction_policy.py).
+
+    Strategies:
+        "greedy": newest videos first, each gets its transcript, else its summary, else stays a link (recency wins)
+        "knapsack": the tier per video that fills the budget with the most video tokens
+    """
+    STRATEGIES = ("greedy", "knapsack")
+
+    def __init__(self, max_tokens, call_overhead=0, separator_tokens=0, strategy="greedy"):
+        """
+        Initialize the packer.
+
+        Args:
+            max_tokens (int): Token budget of the packed history.
+            call_overhead (float): Tokens the counter adds once per history.
+            separator_tokens (float): Tokens of the separator between two messages.
+            strategy (str): "greedy" or "knapsack".
+        """
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown packing strategy: {strategy}")
+        self.max_tokens = max_tokens
+        self.call_overhead = call_overhead
+        self.separator_tokens = separator_tokens
+        self.strategy = strategy
+
+    def total(self, costs, kept, options, chosen, summarized=()):
+        """Token count of the kept messages with the chosen options expanded and the `summarized` ones as summaries."""
+        if not kept:
+            return 0
+        tokens = self.call_overhead + self.separator_tokens * (len(kept) - 1)
+        tokens += sum(costs[index] for index in kept)
+        tokens += sum(options[option]["tokens"] for option in chosen)
+        tokens += sum(options[option]["summary_tokens"] for option in summarized)
+        return int(tokens)
+
+    def pack(self, roles, costs, options, pinned=(), remove_pairs=True, dropped=(), priorities=None, protected=()):
+        """
+        Builds the packing plan.
+
+        Args:
+            roles (list): Role of every message ("system", "user", "assistant").
+            costs (list): Base token cost of every message.
+            options (list): One dict per video: {"message_index", "tokens", "title"} plus "summary_tokens" when the
+                video has a summary, ordered oldest first.
+            pinned (iterable): Positions in `options` that must stay expanded while their message is kept.
+            remove_pairs (bool): Drop the oldest pairs to fit (pinned transcripts are compressed before their own message is dropped,
+                and the pairs dropped for them are then kept again when they fit).
+            dropped (iterable): Message indices left out from the start (e.g. turns already covered by a summary).
+            priorities (list): Score of every message (None: by age). The pair with the lowest best score is dropped
+                first and the greedy strategy offers the videos of the highest scored messages first.
+            protected (iterable): Message indices never dropped (e.g. the message being sent).
+
+        Returns:
+            dict: {"kept": message indices, "removed": message indices, "expanded": option positions shown as transcripts,
+                "summarized": option positions shown as summaries, "total_tokens": int}
+        """
+        dropped = set(dropped)
+        kept = [index for index in range(len(roles)) if index not in dropped]
+        removed = sorted(dropped)
+        pinned = set(pinned)
+        protected = set(protected)
+
+        def available(option):
+            return options[option]["message_index"] in kept
+
+        # Drop the oldest pairs until the base (plus the pinned transcripts) fits
+        removed_for_pins = []
+        while remove_pairs and self.total(costs, kept, options, [o for o in pinned if available(o)]) > self.max_tokens:
+            removable = [index for index in kept if index not in protected]
+            pair = self._oldest_pair(roles, removable) if priorities is None else self._lowest_pair(roles, removable, priorities)
+            if pinned and (not pair or any(options[option]["message_index"] in pair for option in pinned)):
+                # Compress the pinned transcripts before removing their own message; the pairs dropped to make
+                # room for them come back and are only dropped again if the compressed history still does not fit
+                pinned = set()
+                kept = sorted(kept + removed_for_pins)
+                removed = [index for index in removed if index not in removed_for_pins]
+                removed_for_pins = []
+                continue
+            if not pair:
+                break
+            for index in pair:
+                kept.remove(index)
+                removed.append(index)
+                if pinned:
+                    removed_for_pins.append(index)
+        chosen = [option for option in pinned if available(option)]
+
+        candidates = [option for option in range(len(options)) if available(option) and option not in chosen]
+        budget = self.max_tokens - self.total(costs, kept, options, chosen)
+        if self.strategy == "knapsack":
+            expanded, summarized = self._knapsack(options, self._visit_order(options, candidates, priorities), budget)
+        else:
+            expanded, summarized = self._greedy(costs, kept, options, self._visit_order(options, candidates, priorities), chosen)
+        chosen += expanded
+
+        plan = {
+            "kept": kept,
+            "removed": sorted(removed),
+            "expanded": sorted(chosen),
+            "summarized": sorted(summarized),
+            "total_tokens": self.total(costs, kept, options, chosen, summarized)
+        }
+        self._log(roles, costs, options, plan)
+        return plan
+
+    @staticmethod
+    def _oldest_pair(roles, kept):
+        """First kept user message and the assistant message answering it (same rule as remove_oldest_message_pair)."""
+        user = next((index for index in kept if roles[index] == "user"), None)
+        if user is None:
+            return []
+        assistant = next((index for index in kept if index > user and roles[index] == "assistant"), None)
+        return [user] if assistant is None else [user, assistant]
+
+    @staticmethod
+    def _lowest_pair(roles, kept, priorities):
+        """Kept user message (and the assistant message answering it) whose pair has the lowest best score, the oldest on ties."""
+        pairs = []
+        for position, index in enumerate(kept):
+            if roles[index] != "user":
+                continue
+            following = kept[position + 1] if position + 1 < len(kept) else None
+            pair = [index] if following is None or roles[following] != "assistant" else [index, following]
+            pairs.append((max(priorities[member] for member in pair), index, pair))
+        return min(pairs)[2] if pairs else []
+
+    @staticmethod
+    def _visit_order(options, candidates, priorities):
+        """Candidates newest first, or highest scored message first (then newest) when there are priorities."""
+        if priorities is None:
+            return sorted(candidates, key=lambda o: (options[o]["message_index"], o), reverse=True)
+        return sorted(candidates, key=lambda o: (priorities[options[o]["message_index"]], options[o]["message_index"], o), reverse=True)
+
+    def _greedy(self, costs, kept, options, ordered, chosen):
+        """
+        Videos in `ordered` order (newest first by default): the transcript if it fits, otherwise the summary
+        if the video has one and it fits. A video that fits in neither tier stays a link and the next ones are still tried.
+
+        Returns:
+            tuple: (options expanded to transcripts, options shown as summaries)
+        """
+        expanded, summarized = [], []
+        for option in ordered:
+            if self.total(costs, kept, options, chosen + expanded + [option], summarized) <= self.max_tokens:
+                expanded.append(option)
+            elif options[option].get("summary_tokens") is not None and self.total(costs, kept, options, chosen + expanded, summarized + [option]) <= self.max_tokens:
+                summarized.append(option)
+        return expanded, summarized
+
+    @staticmethod
+    def _knapsack(options, ordered, budget):
+        """
+        Multiple-choice knapsack over whole tokens: per video none, summary or transcript, maximizing the
+        video tokens within the budget. Videos are visited in `ordered` order, so between equal totals the first ones win.
+
+        Returns:
+            tuple: (options expanded to transcripts, options shown as summaries)
+        """
+        if budget <= 0:
+            return [], []
+        best = {0: (0.0, (), ())}  # rounded cost -> (video tokens, expanded, summarized)
+        for option in ordered:
+            tiers = [(options[option]["tokens"], True)]
+            if options[option].get("summary_tokens") is not None:
+                tiers.append((options[option]["summary_tokens"], False))
+            for cost, (value, expanded, summarized) in list(best.items()):
+                for tokens, is_transcript in tiers:
+                    new_cost = cost + max(0, int(-(-tokens // 1)))  # round up so the sum never exceeds the budget
+                    if new_cost > budget or (new_cost in best and best[new_cost][0] >= value + tokens):
+                        continue
+                    if is_transcript:
+                        best[new_cost] = (value + tokens, expanded + (option,), summarized)
+                    else:
+                        best[new_cost] = (value + tokens, expanded, summarized + (option,))
+        _, expanded, summarized = max(best.values(), key=lambda state: state[0])
+        return list(expanded), list(summarized)
+
+    def _log(self, roles, costs, options, plan):
+        expanded = set(plan["expanded"])
+        summarized = set(plan["summarized"])
+        print(f"[ContextPacker] Packing decision ({self.strategy}), budget {self.max_tokens} tokens:")
+        for index, role in enumerate(roles):
+            status = "removed" if index in plan["removed"] else "kept"
+            print(f"[ContextPacker]   #{index} {role}: {int(costs[index])} tokens, {status}")
+            for position, option in enumerate(options):
+                if option["message_index"] != index:
+                    continue
+                if index in plan["removed"]:
+                    decision = "removed"
+                elif position in expanded:
+                    decision = "transcript"
+                else:
+                    decision = "summary" if position in summarized else "link only"
+                summary = f", +{int(option['summary_tokens'])} as summary" if option.get("summary_tokens") is not None else ""
+                print(f"[ContextPacker]       '{option.get('title')}': +{int(option['tokens'])} tokens as transcript{summary} -> {decision}")
+        print(f"[ContextPacker] Total: {plan['total_tokens']}/{self.max_tokens} tokens, {len(expanded)} transcript(s) expanded, {len(summarized)} summarized, {len(plan['removed'])} message(s) removed")
@@ -0,0 +1,150 @@
+import queue
+import threading
+
+SUMMARY_MESSAGE_ID = "conversation-summary"
+SUMMARY_HEADER = "Resumo da conversa anterior (mensagens antigas que não cabem mais no contexto):\n\n"
+SUMMARY_INSTRUCTIONS = (
+    "Você resume conversas. Atualize o resumo existente com as novas mensagens abaixo, em português, "
+    "em no máximo {max_words} palavras. Mantenha fatos, nomes, pedidos do usuário, vídeos citados e decisões; "
+    "descarte cumprimentos e repetições. Responda apenas com o resumo atualizado."
+)
+
+class ConversationSummarizer:
+    """
+    Folds turns evicted from the context into a running summary, off the send path.
+
+    When the context packer has to drop the oldest pairs, MemoryManager hands them to fold_async().
+    A single daemon worker asks the model for an updated summary (previous summary + evicted turns)
+    and stores it together with the IDs of the messages it covers. From then on those messages are left
+    out of the context and the summary is appended to the system prompt instead, so long sessions
+    keep their early context at a bounded token cost.
+    """
+    MAX_SUMMARY_WORDS = 250
+    MAX_SUMMARY_CHARS = 3000  # hard cap on what is pinned, whatever the model answers
+    MAX_MESSAGE_CHARS = 2000  # each evicted message is cut to this before it is summarized
+
+    def __init__(self, api_handler, model=None, temperature=0.3):
+        """
+        Initialize the summarizer.
+
+        Args:
+            api_handler: Class or instance with chat_completion_generate(data) (APIHandler).
+            model (str): Model used for summaries (None: the chat model passed to fold_async, e.g. when no cheaper one is configured).
+            temperature (float): Sampling temperature for the summary requests.
+        """
+        self.api_handler = api_handler
+        self.model = model
+        self.temperature = temperature
+        self.summary = ""
+        self.summarized_ids = []  # IDs of the messages folded into the summary, oldest first
+        self._pending_ids = set()  # IDs queued but not summarized yet
+        self._generation = 0  # bumped by load()/clear() so folds started for an older session are discarded
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+
+    def covered_ids(self):
+        """IDs of the messages the current summary stands for."""
+        with self._lock:
+            return set(self.summarized_ids)
+
+    def summary_message(self):
+        """The summary as a system message (MemoryManager merges its content into the system prompt), or None before the first summary."""
+        with self._lock:
+            if not self.summary:
+                return None
+            return {"role": "system", "content": SUMMARY_HEADER + self.summary, "id": SUMMARY_MESSAGE_ID}
+
+    def fold_async(self, messages, model=None):
+        """
+        Queues evicted messages to be folded into the summary; returns immediately.
+
+        Args:
+            messages (list): Message dicts with an "id", oldest first. Already summarized or queued ones are ignored.
+            model (str): Chat model to use when no summary model is configured.
+
+        Returns:
+            int: Number of messages queued.
+        """
+        with self._lock:
+            covered = set(self.summarized_ids) | self._pending_ids
+            new_messages = [message for message in messages if message.get("id") and message["id"] not in covered]
+            if not new_messages:
+                return 0
+            self._pending_ids.update(message["id"] for message in new_messages)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="conversation-summarizer", daemon=True)
+                self._worker.start()
+        self._queue.put((new_messages, model))
+        print(f"[ConversationSummarizer] Queued {len(new_messages)} evicted message(s) for summarization")
+        return len(new_messages)
+
+    def wait(self):
+        """Blocks until every queued fold has finished (used before saving and in tests)."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            messages, model = self._queue.get()
+            try:
+                self._fold(messages, model)
+            except Exception as e:
+                print(f"[ConversationSummarizer] Summarization failed: {e}")
+                with self._lock:
+                    self._pending_ids.difference_update(message["id"] for message in messages)
+            finally:
+                self._queue.task_done()
+
+    def build_request(self, previous_summary, messages, model):
+        """Chat completion request that folds `messages` into `previous_summary`."""
+        turns = []
+        for message in messages:
+            content = message.get("content", "")
+            if len(content) > self.MAX_MESSAGE_CHARS:
+                content = content[:self.MAX_MESSAGE_CHARS] + " [...]"
+            turns.append(f"{message.get('role', 'user')}: {content}")
+        prompt = f"Resumo existente:\n{previous_summary or '(nenhum)'}\n\nNovas mensagens:\n" + "\n\n".join(turns)
+        return {
+            "model": self.model or model,
+            "messages": [
+                {"role": "system", "content": SUMMARY_INSTRUCTIONS.format(max_words=self.MAX_SUMMARY_WORDS)},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": self.temperature,
+            "max_tokens": self.MAX_SUMMARY_WORDS * 3,
+            "stream": False
+        }
+
+    def _fold(self, messages, model):
+        with self._lock:
+            previous_summary = self.summary
+            generation = self._generation
+        summary = self.api_handler.chat_completion_generate(self.build_request(previous_summary, messages, model))
+        ids = [message["id"] for message in messages]
+        with self._lock:
+            if generation != self._generation:
+                return  # the session was cleared or replaced meanwhile
+            self._pending_ids.difference_update(ids)
+            if not summary or not isinstance(summary, str) or summary.startswith("Error:"):
+                print(f"[ConversationSummarizer] No summary returned, {len(ids)} message(s) will be queued again on the next eviction")
+                return
+            self.summary = summary.strip()[:self.MAX_SUMMARY_CHARS]
+            self.summarized_ids.extend(ids)
+        print(f"[ConversationSummarizer] Summary now covers {len(self.summarized_ids)} message(s) in {len(self.summary)} chars")
+
+    def to_dict(self):
+        """Serializable state, saved with the session."""
+        with self._lock:
+            return {"summary": self.summary, "summarized_ids": list(self.summarized_ids)}
+
+    def load(self, data):
+        """Restores the state saved by to_dict() (None or {} clears it)."""
+        with self._lock:
+            data = data or {}
+            self.summary = data.get("summary", "")
+            self.summarized_ids = list(data.get("summarized_ids", []))
+            self._pending_ids = set()
+            self._generation += 1
+
+    def clear(self):
+        self.load(None)
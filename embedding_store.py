@@ -0,0 +1,207 @@
+import glob
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+class EmbeddingStore:
+    """
+    Persistent embedding cache keyed by (model, sha256(text)), shared between sessions and processes.
+
+    Vectors are appended as float16 rows to one flat file per dimension and read back through a
+    memory map; a SQLite table maps every key to its row (the offset index). Writes only ever append,
+    so readers never see a row change. Rows of evicted or replaced vectors become dead space, and once
+    they are more than `compact_ratio` of a file the live rows are copied to a new file generation and
+    the index is switched to it in one transaction (the old file is removed when no longer mapped).
+    """
+    DTYPE = np.dtype("<f2")
+
+    def __init__(self, db_path="embedding_cache.db", max_vectors=200000, compact_ratio=0.5, compact_every=500):
+        """
+        Initialize the store.
+
+        Args:
+            db_path (str): SQLite index; vector files are written next to it. Use ":memory:" for a throwaway index (files go to the working directory).
+            max_vectors (int): Vectors kept, the least recently used are evicted past this.
+            compact_ratio (float): Fraction of dead rows in a file that triggers compaction.
+            compact_every (int): Stored vectors between two compaction checks.
+        """
+        self.db_path = db_path
+        self.max_vectors = max_vectors
+        self.compact_ratio = compact_ratio
+        self.compact_every = compact_every
+        self._writes_since_check = 0
+        self._maps = {}  # (dim, generation) -> np.memmap
+        self._lock = threading.Lock()  # the connection is shared between threads
+
+        base = os.path.abspath(db_path) if db_path != ":memory:" else os.path.abspath("embedding_cache")
+        self._vector_prefix = os.path.splitext(base)[0]
+        os.makedirs(os.path.dirname(self._vector_prefix), exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    digest TEXT NOT NULL,
+                    dim INTEGER NOT NULL,
+                    row INTEGER NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (model, digest)
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)")
+            # Current file generation and row count of every dimension's vector file
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS vector_files (
+                    dim INTEGER PRIMARY KEY,
+                    generation INTEGER NOT NULL,
+                    rows INTEGER NOT NULL
+                )"""
+            )
+
+    @staticmethod
+    def digest(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _file_path(self, dim, generation):
+        return f"{self._vector_prefix}.{dim}d.{generation}.f16"
+
+    def _matrix(self, dim, generation, rows):
+        """Memory map of the first `rows` rows of a vector file (remapped when the file has grown)."""
+        key = (dim, generation)
+        mapped = self._maps.get(key)
+        if mapped is None or mapped.shape[0] < rows:
+            mapped = np.memmap(self._file_path(dim, generation), dtype=self.DTYPE, mode="r", shape=(rows, dim))
+            self._maps = {k: v for k, v in self._maps.items() if k[0] != dim}  # older generations are not read again
+            self._maps[key] = mapped
+        return mapped
+
+    def get_many(self, model, texts):
+        """
+        Cached vectors of the texts.
+
+        Returns:
+            list: One float32 array per text, None where the text is not cached.
+        """
+        digests = [self.digest(text) for text in texts]
+        found = {}
+        with self._lock:
+            for start in range(0, len(digests), 500):
+                batch = digests[start:start + 500]
+                rows = self._conn.execute(
+                    f"""SELECT e.digest, e.dim, e.row, f.generation, f.rows FROM embeddings e JOIN vector_files f ON f.dim = e.dim
+                        WHERE e.model = ? AND e.digest IN ({','.join('?' * len(batch))})""",
+                    [model] + batch
+                ).fetchall()
+                for digest, dim, row, generation, file_rows in rows:
+                    found[digest] = (dim, row, generation, file_rows)
+            vectors = []
+            for digest in digests:
+                location = found.get(digest)
+                if location is None:
+                    vectors.append(None)
+                    continue
+                dim, row, generation, file_rows = location
+                try:
+                    vectors.append(np.array(self._matrix(dim, generation, file_rows)[row], dtype=np.float32))
+                except (OSError, ValueError) as e:
+                    print(f"[EmbeddingStore] Could not read vector file {self._file_path(dim, generation)}: {e}")
+                    vectors.append(None)
+            if found:
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_access = ? WHERE model = ? AND digest = ?",
+                        [(time.time(), model, digest) for digest in found]
+                    )
+        return vectors
+
+    def put_many(self, model, texts, vectors):
+        """Stores the vectors of the texts (appended to the vector file of their dimension)."""
+        by_dim = {}
+        for text, vector in zip(texts, vectors):
+            vector = np.asarray(vector, dtype=self.DTYPE).ravel()
+            by_dim.setdefault(vector.shape[0], {})[self.digest(text)] = vector
+        now = time.time()
+        with self._lock:
+            for dim, items in by_dim.items():
+                # The write transaction serializes appends between processes
+                with self._conn:
+                    self._conn.execute("BEGIN IMMEDIATE")
+                    state = self._conn.execute("SELECT generation, rows FROM vector_files WHERE dim = ?", (dim,)).fetchone()
+                    generation, rows = state if state else (0, 0)
+                    path = self._file_path(dim, generation)
+                    with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                        # Written right after the committed rows, over any partial write left by a crashed process.
+                        # The file is never shrunk: it may be memory-mapped (here or by another process), and
+                        # resizing a mapped file fails on Windows; readers only map the committed row count anyway
+                        f.seek(rows * dim * self.DTYPE.itemsize)
+                        f.write(np.stack(list(items.values())).tobytes())
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO embeddings (model, digest, dim, row, last_access) VALUES (?, ?, ?, ?, ?)",
+                        [(model, digest, dim, rows + offset, now) for offset, digest in enumerate(items)]
+                    )
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO vector_files (dim, generation, rows) VALUES (?, ?, ?)",
+                        (dim, generation, rows + len(items))
+                    )
+            self._writes_since_check += len(texts)
+            if self._writes_since_check >= self.compact_every:
+                self._writes_since_check = 0
+                self._evict_locked()
+                self._compact_locked()
+
+    def _evict_locked(self):
+        with self._conn:
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_vectors:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                    (count - self.max_vectors,)
+                )
+                print(f"[EmbeddingStore] Evicted {count - self.max_vectors} least recently used vector(s)")
+
+    def compact(self, force=False):
+        """Rewrites the vector files whose dead rows exceed compact_ratio (every file with force=True)."""
+        with self._lock:
+            self._compact_locked(force)
+
+    def _compact_locked(self, force=False):
+        for dim, generation, rows in self._conn.execute("SELECT dim, generation, rows FROM vector_files").fetchall():
+            live = self._conn.execute("SELECT COUNT(*) FROM embeddings WHERE dim = ?", (dim,)).fetchone()[0]
+            if rows == 0 or (not force and (rows - live) / rows <= self.compact_ratio):
+                continue
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                state = self._conn.execute("SELECT generation, rows FROM vector_files WHERE dim = ?", (dim,)).fetchone()
+                if state != (generation, rows):
+                    continue  # another process wrote or compacted meanwhile, check again next time
+                entries = self._conn.execute("SELECT rowid, row FROM embeddings WHERE dim = ? ORDER BY row", (dim,)).fetchall()
+                old = np.memmap(self._file_path(dim, generation), dtype=self.DTYPE, mode="r", shape=(rows, dim)) if entries else None
+                new_path = self._file_path(dim, generation + 1)
+                with open(new_path, "wb") as f:
+                    if entries:
+                        f.write(np.ascontiguousarray(old[[row for _, row in entries]]).tobytes())
+                del old
+                self._conn.executemany("UPDATE embeddings SET row = ? WHERE rowid = ?", [(new_row, rowid) for new_row, (rowid, _) in enumerate(entries)])
+                self._conn.execute("UPDATE vector_files SET generation = ?, rows = ? WHERE dim = ?", (generation + 1, len(entries), dim))
+            self._maps.pop((dim, generation), None)
+            for path in glob.glob(f"{self._vector_prefix}.{dim}d.*.f16"):
+                if path != new_path:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass  # still mapped by another process (Windows), removed by a later compaction
+            print(f"[EmbeddingStore] Compacted {dim}-d vectors: {rows} -> {len(entries)} row(s)")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._maps.clear()
+            self._conn.close()
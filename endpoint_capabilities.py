@@ -0,0 +1,90 @@
+import json
+import os
+import threading
+import time
+
+class EndpointCapabilities:
+    """
+    Remembers which optional endpoints an API provider supports, per BASE_URL.
+
+    Results are kept on disk with a TTL, so a restart does not probe again, and for the rest of the
+    process once detected, so an endpoint that answered 404 is never called again until the app restarts.
+
+    Capabilities used by the app:
+        "v1_layout": True if the provider serves /v1/... paths, False for the flat layout (e.g. Gemini's OAI path)
+        "token_counter": /utils/token_counter exists
+        "embeddings": the embeddings endpoint exists
+    """
+    def __init__(self, path="api_capabilities.json", ttl_seconds=24 * 3600):
+        """
+        Initialize the registry.
+
+        Args:
+            path (str): JSON file used to persist detected capabilities (None to keep them in memory only).
+            ttl_seconds (float): How long a capability read from disk is trusted.
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._stored = {}  # base_url -> capability -> {"supported": bool, "checked_at": float}
+        self._process = {}  # (base_url, capability) -> bool, detected during this run
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self._stored = data
+        except (OSError, ValueError) as e:
+            print(f"[EndpointCapabilities] Could not read {self.path}: {e}")
+
+    def _save_locked(self):
+        if not self.path:
+            return
+        try:
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self._stored, f, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"[EndpointCapabilities] Could not save {self.path}: {e}")
+
+    def get(self, base_url, capability):
+        """
+        Returns True/False if the capability is known, None if it was never checked or the stored result expired.
+        """
+        with self._lock:
+            if (base_url, capability) in self._process:
+                return self._process[(base_url, capability)]
+            entry = self._stored.get(base_url, {}).get(capability)
+            if not entry:
+                return None
+            if self.ttl_seconds is not None and time.time() - entry.get("checked_at", 0) > self.ttl_seconds:
+                return None
+            return bool(entry.get("supported"))
+
+    def set(self, base_url, capability, supported):
+        """Records a detected capability for this process and on disk."""
+        with self._lock:
+            supported = bool(supported)
+            known = self._process.get((base_url, capability))
+            self._process[(base_url, capability)] = supported
+            if known == supported:
+                return  # already recorded this run, no need to rewrite the file
+            self._stored.setdefault(base_url, {})[capability] = {"supported": supported, "checked_at": time.time()}
+            self._save_locked()
+        print(f"[EndpointCapabilities] {base_url}: {capability} = {supported}")
+
+    def forget(self, base_url, capability=None):
+        """Drops a capability (or every capability of base_url) so it is detected again."""
+        with self._lock:
+            if capability is None:
+                self._stored.pop(base_url, None)
+                self._process = {key: value for key, value in self._process.items() if key[0] != base_url}
+            else:
+                self._stored.get(base_url, {}).pop(capability, None)
+                self._process.pop((base_url, capability), None)
+            self._save_locked()
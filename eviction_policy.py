@@ -0,0 +1,116 @@
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+class EvictionPolicy:
+    """
+    Decides which chat turns are worth keeping when the history does not fit in the context window.
+
+    A policy gives every message a score in [0, 1]; the context packer evicts the user/assistant pair with
+    the lowest score first (a pair is worth as much as its best message) and, with the greedy strategy,
+    offers the transcripts of the highest scored videos first. The system prompt is never scored nor evicted.
+    """
+    def score_messages(self, texts, roles, query=None, anchored=()):
+        """
+        Scores every message.
+
+        Args:
+            texts (list): Text representing each message (YouTube messages include their video titles and summaries).
+            roles (list): Role of each message.
+            query (str): The pending user input, None if unknown.
+            anchored (iterable): Indices of the messages that carry a YouTube video.
+
+        Returns:
+            list: One float per message, higher is more valuable.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def recency(count):
+        """0 for the oldest message up to 1 for the newest."""
+        if count <= 1:
+            return np.ones(count)
+        return np.arange(count) / (count - 1)
+
+class RecencyPolicy(EvictionPolicy):
+    """Oldest first, whatever the question is about (the behaviour before relevance scoring)."""
+    def score_messages(self, texts, roles, query=None, anchored=()):
+        return list(self.recency(len(texts)))
+
+class RelevancePolicy(EvictionPolicy):
+    """
+    Weighted mix of recency, similarity to the pending user input and whether the message anchors a video.
+    Subclasses provide the similarity, rescaled to [0, 1] over the history; without a query only recency and anchors count.
+    """
+    def __init__(self, recency_weight=0.4, relevance_weight=0.45, anchor_weight=0.15):
+        """
+        Initialize the policy.
+
+        Args:
+            recency_weight (float): Weight of the message position (newer is better).
+            relevance_weight (float): Weight of the similarity to the pending user input.
+            anchor_weight (float): Bonus of the messages carrying a YouTube video.
+        """
+        self.recency_weight = recency_weight
+        self.relevance_weight = relevance_weight
+        self.anchor_weight = anchor_weight
+
+    def similarities(self, texts, query):
+        """Similarity in [0, 1] of every text to the query."""
+        raise NotImplementedError
+
+    def score_messages(self, texts, roles, query=None, anchored=()):
+        scores = self.recency_weight * self.recency(len(texts))
+        if query and query.strip() and texts:
+            similarities = np.clip(np.asarray(self.similarities(texts, query), dtype=float), 0.0, 1.0)
+            spread = similarities.max() - similarities.min() if similarities.size else 0.0
+            if similarities.size == len(texts) and spread > 0:
+                # Relative relevance: the closest message gets the whole weight, the farthest none
+                scores = scores + self.relevance_weight * (similarities - similarities.min()) / spread
+        anchors = np.zeros(len(texts))
+        anchors[[index for index in anchored if index < len(texts)]] = 1.0
+        return list(scores + self.anchor_weight * anchors)
+
+class LexicalRelevancePolicy(RelevancePolicy):
+    """Relevance from TF-IDF cosine similarity, computed locally (no network call). The default policy."""
+    def similarities(self, texts, query):
+        try:
+            matrix = TfidfVectorizer(sublinear_tf=True).fit_transform(list(texts) + [query])
+        except ValueError:
+            return np.zeros(len(texts))  # empty vocabulary
+        # Rows are L2-normalized, so the dot product is the cosine similarity
+        return np.asarray((matrix[:-1] @ matrix[-1].T).todense()).ravel()
+
+class EmbeddingRelevancePolicy(RelevancePolicy):
+    """
+    Relevance from embedding cosine similarity (opt-in: one embeddings request per packing).
+    Falls back to the lexical scorer when no embeddings can be obtained.
+    """
+    MAX_TEXT_CHARS = 2000  # texts are cut to this before being embedded
+
+    def __init__(self, rag_manager, **weights):
+        """
+        Initialize the policy.
+
+        Args:
+            rag_manager (RAGManager): Source of the embeddings (its _get_embeddings).
+            **weights: recency_weight, relevance_weight and anchor_weight, as in RelevancePolicy.
+        """
+        super().__init__(**weights)
+        self.rag_manager = rag_manager
+        self.fallback = LexicalRelevancePolicy(**weights)
+
+    def similarities(self, texts, query):
+        embeddings = None
+        if getattr(self.rag_manager, "model", None) is not None:
+            try:
+                embeddings = self.rag_manager._get_embeddings([query] + [text[:self.MAX_TEXT_CHARS] for text in texts])
+            except Exception as e:
+                print(f"[EvictionPolicy] Embeddings request failed: {e}")
+        if not embeddings or len(embeddings) != len(texts) + 1:
+            print("[EvictionPolicy] Embeddings unavailable, using lexical relevance")
+            return self.fallback.similarities(texts, query)
+        vectors = np.asarray(embeddings, dtype=float)
+        norms = np.linalg.norm(vectors, axis=1)
+        norms[norms == 0] = 1.0
+        vectors /= norms[:, None]
+        return vectors[1:] @ vectors[0]
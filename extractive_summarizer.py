@@ -0,0 +1,96 @@
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+SENTENCE_END = re.compile(r'(?<=[.!?…])\s+')
+
+class ExtractiveSummarizer:
+    """
+    Local extractive summaries of transcripts: no LLM call, only TF-IDF sentence ranking.
+
+    The transcript is split into sentences (or into fixed-size word chunks when auto-generated captions
+    have no punctuation). Each sentence is scored by its cosine similarity to the TF-IDF centroid of the
+    whole transcript, i.e. how well it represents the main topics. The best sentences are kept, in
+    their original order, up to a fraction of the transcript length.
+    """
+    def __init__(self, ratio=0.15, max_chars=6000, min_chars=1500, words_per_chunk=30, cache_size=64):
+        """
+        Initialize the summarizer.
+
+        Args:
+            ratio (float): Target summary length as a fraction of the transcript.
+            max_chars (int): Upper bound on the summary length.
+            min_chars (int): Transcripts shorter than this are not summarized (the transcript itself is small enough).
+            words_per_chunk (int): Words per pseudo-sentence when the text has no sentence punctuation.
+            cache_size (int): Summaries kept in memory, keyed by transcript.
+        """
+        self.ratio = ratio
+        self.max_chars = max_chars
+        self.min_chars = min_chars
+        self.words_per_chunk = words_per_chunk
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # hash(transcript) -> summary
+        self._lock = threading.Lock()
+
+    def split_sentences(self, text):
+        """Sentences of `text`; unpunctuated captions are cut into chunks of `words_per_chunk` words."""
+        sentences = [sentence.strip() for sentence in SENTENCE_END.split(text) if sentence.strip()]
+        words = text.split()
+        # Fewer sentence breaks than one every 3 chunks: treat it as unpunctuated captions
+        if len(sentences) < len(words) / (3 * self.words_per_chunk):
+            sentences = [" ".join(words[i:i + self.words_per_chunk]) for i in range(0, len(words), self.words_per_chunk)]
+        return sentences
+
+    def rank_sentences(self, sentences):
+        """TF-IDF centrality score of every sentence (higher is more representative)."""
+        try:
+            matrix = TfidfVectorizer(sublinear_tf=True).fit_transform(sentences)
+        except ValueError:
+            return np.zeros(len(sentences))  # empty vocabulary (only stop words or symbols)
+        centroid = np.asarray(matrix.mean(axis=0)).ravel()
+        norm = np.linalg.norm(centroid)
+        if norm == 0:
+            return np.zeros(len(sentences))
+        scores = matrix @ (centroid / norm)
+        # Very short sentences carry little content even when they match the topic words
+        lengths = np.array([len(sentence.split()) for sentence in sentences])
+        return np.asarray(scores).ravel() * np.minimum(1.0, lengths / 8.0)
+
+    def summarize(self, text):
+        """
+        Extractive summary of `text`.
+
+        Returns:
+            str: The selected sentences in their original order, or "" if the text is too short to need one.
+        """
+        if not text or len(text) < self.min_chars:
+            return ""
+        key = hash(text)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        sentences = self.split_sentences(text)
+        budget = min(self.max_chars, int(len(text) * self.ratio))
+        summary = ""
+        if len(sentences) > 1:
+            scores = self.rank_sentences(sentences)
+            chosen = []
+            used = 0
+            for index in np.argsort(-scores, kind="stable"):
+                length = len(sentences[index]) + 1
+                if used + length > budget:
+                    continue
+                chosen.append(index)
+                used += length
+            summary = "\n".join(sentences[index] for index in sorted(chosen))
+
+        with self._lock:
+            self._cache[key] = summary
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return summary
@@ -0,0 +1,76 @@
+class HistoryView:
+    """
+    Copy-on-write view over a chat history.
+
+    The view shares the original message dicts and only records what differs for one request:
+    the content substituted at an index (a transcript instead of a link, or the other way around)
+    and the indices dropped from the context. Nothing is copied until materialize() builds the final
+    list of messages, and even then the message texts themselves are shared, not duplicated.
+    """
+    def __init__(self, messages):
+        """
+        Initialize the view.
+
+        Args:
+            messages (list): The chat history to view (never modified).
+        """
+        self._messages = messages
+        self._contents = {}  # index -> content substituted for this request
+        self._dropped = set()
+        self._inserted = {}  # index -> messages placed right after it (-1: before the first message)
+
+    def __len__(self):
+        return len(self._messages) - len(self._dropped) + sum(len(messages) for messages in self._inserted.values())
+
+    def role(self, index):
+        return self._messages[index]["role"]
+
+    def content(self, index):
+        """Content at `index` as the request will see it."""
+        if index in self._contents:
+            return self._contents[index]
+        return self._messages[index]["content"]
+
+    def original_content(self, index):
+        return self._messages[index]["content"]
+
+    def set_content(self, index, content):
+        """Substitutes the content at `index` (the original message is left as is)."""
+        if content is self._messages[index]["content"] or content == self._messages[index]["content"]:
+            self._contents.pop(index, None)
+        else:
+            self._contents[index] = content
+
+    def drop(self, index):
+        """Leaves the message at `index` out of the materialized history."""
+        self._dropped.add(index)
+
+    def insert_after(self, index, message):
+        """Adds a message that only exists in this view right after the original message at `index` (-1: first)."""
+        self._inserted.setdefault(index, []).append(message)
+
+    def is_dropped(self, index):
+        return index in self._dropped
+
+    def indices(self):
+        """Original indices of the messages that stay in the history, in order."""
+        return [index for index in range(len(self._messages)) if index not in self._dropped]
+
+    @property
+    def substitutions(self):
+        """{index: content} of every substituted message."""
+        return dict(self._contents)
+
+    def materialize(self):
+        """
+        Builds the list of message dicts for the API call.
+        Each message is a new dict (so callers can change it freely) whose strings are shared with the original history.
+        """
+        materialized = [dict(inserted) for inserted in self._inserted.get(-1, [])]
+        for index in self.indices():
+            message = dict(self._messages[index])
+            if index in self._contents:
+                message["content"] = self._contents[index]
+            materialized.append(message)
+            materialized.extend(dict(inserted) for inserted in self._inserted.get(index, []))
+        return materialized
@@ -0,0 +1,119 @@
+import threading
+import weakref
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+class HttpClient:
+    """
+    Shared HTTP layer with keep-alive connection pools.
+
+    Every component (APIHandler, RAGManager, YouTubeTranscriptDownloader) goes through the same
+    mounted HTTPAdapters, so repeated calls to the same host reuse an open TCP/TLS connection instead
+    of paying a new handshake each time. requests.Session is not thread-safe, so each thread gets its
+    own session; the sessions are thin and all share the adapters (and their thread-safe pools). Hosts that see many parallel requests can get a bigger
+    pool, and every request gets separate connect/read timeouts unless the caller passes its own.
+
+    requests/urllib3 do not support HTTP/1.1 pipelining; concurrency comes from the pool instead
+    (one kept-alive connection per in-flight request, up to the pool size).
+    """
+    DEFAULT_TIMEOUT = (10, 60)  # (connect, read) seconds
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, host_pool_sizes=None, timeout=DEFAULT_TIMEOUT):
+        """
+        Initialize the client.
+
+        Args:
+            pool_connections (int): Number of hosts whose pools are kept open at the same time.
+            pool_maxsize (int): Connections kept alive per host (default for hosts without their own size).
+            host_pool_sizes (dict): {"host": size} for hosts that need a different pool size.
+            timeout (tuple): Default (connect, read) timeout for requests that do not pass one.
+        """
+        self.timeout = timeout
+        self._default_adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self._host_adapters = {}  # "https://host" -> HTTPAdapter
+        self._sessions = weakref.WeakSet()  # live sessions, to mount adapters added later; dropped with their last user
+        self._local = threading.local()  # this thread's session
+        self._lock = threading.Lock()
+        for host, size in (host_pool_sizes or {}).items():
+            self.set_host_pool_size(host, size)
+
+    @property
+    def session(self):
+        """The calling thread's session, created on first use."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self.new_session()
+        return session
+
+    def new_session(self):
+        """
+        Creates an extra requests.Session that shares this client's connection pools (the same adapter objects).
+        Useful for libraries that modify the session they are given (headers, cookies). The client only keeps
+        a weak reference: the session goes away with its last user (e.g. when a worker thread ends).
+        """
+        session = requests.Session()
+        session.mount("http://", self._default_adapter)
+        session.mount("https://", self._default_adapter)
+        with self._lock:
+            for prefix, adapter in self._host_adapters.items():
+                session.mount(prefix, adapter)
+            self._sessions.add(session)
+        return session
+
+    def set_host_pool_size(self, host_or_url, size):
+        """
+        Gives a host its own connection pool with `size` kept-alive connections.
+
+        Args:
+            host_or_url (str): A host name ("www.youtube.com") or any URL on that host.
+            size (int): Maximum connections kept alive for the host.
+        """
+        host = urlparse(host_or_url).hostname if "://" in host_or_url else host_or_url
+        if not host:
+            return
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size)
+        with self._lock:
+            for scheme in ("http", "https"):
+                prefix = f"{scheme}://{host}"
+                self._host_adapters[prefix] = adapter
+                for session in self._sessions:
+                    session.mount(prefix, adapter)
+
+    def request(self, method, url, **kwargs):
+        """Sends a request through the pooled session, applying the default timeout if none is given."""
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        kwargs.setdefault("allow_redirects", False)
+        return self.request("HEAD", url, **kwargs)
+
+    def close(self):
+        """Closes every session and the pooled connections."""
+        with self._lock:
+            for session in list(self._sessions):
+                session.close()
+            self._sessions = weakref.WeakSet()
+            self._local = threading.local()
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+# YouTube gets one connection per concurrent title/transcript/redirect request
+YOUTUBE_POOL_SIZES = {"www.youtube.com": 16, "youtube.com": 4, "youtu.be": 4}
+
+def get_shared_client():
+    """Returns the process-wide HttpClient, creating it on first use."""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = HttpClient(host_pool_sizes=YOUTUBE_POOL_SIZES)
+        return _shared_client
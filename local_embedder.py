@@ -0,0 +1,57 @@
+import numpy as np
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, HashingVectorizer
+
+# Frequent Portuguese function words (the English ones come from scikit-learn); without IDF they would dominate the vectors
+PORTUGUESE_STOP_WORDS = frozenset("""
+a ao aos as com como da das de dela dele deles do dos e ela elas ele eles em entre era essa esse esta este eu foi
+isso isto ja la lhe mais mas me mesmo meu minha muito na nas nao no nos nossa nosso num numa o os ou para pela
+pelas pelo pelos por qual quando que quem se sem ser seu sua tambem te tem ter um uma umas uns voce voces
+""".split())
+STOP_WORDS = ENGLISH_STOP_WORDS | PORTUGUESE_STOP_WORDS
+
+class LocalEmbedder:
+    """
+    Embeddings computed locally with scikit-learn, used by RAGManager when the provider has no embedding model.
+
+    Words and bigrams are hashed straight into `dim` signed buckets (the hashing trick: no vocabulary to
+    fit, and with the alternating signs collisions cancel out on average, so cosine similarities stay close
+    to those of the full bag of words). Nothing is fitted on the texts, so a text always gets the same
+    vector: vectors of different videos and sessions stay comparable, and results are deterministic.
+    """
+    # Cosine similarities of bag-of-words vectors are much lower than those of neural embeddings;
+    # this is the raw range RAGManager.normalize_score maps to [0, 1]
+    SCORE_RANGE = (0.0, 0.3)
+
+    def __init__(self, dim=1024):
+        """
+        Initialize the embedder.
+
+        Args:
+            dim (int): Dimensions of the returned vectors (more dimensions, fewer hash collisions).
+        """
+        self.dim = dim
+        self.name = f"local-hashing-{dim}"
+        self.vectorizer = HashingVectorizer(
+            n_features=dim,
+            ngram_range=(1, 2),
+            strip_accents="unicode",
+            stop_words=list(STOP_WORDS),
+            norm=None
+        )
+
+    def embed(self, texts):
+        """
+        Embeds the texts.
+
+        Returns:
+            list: One L2-normalized float32 array of `dim` values per text (zeros for texts without words).
+        """
+        if not texts:
+            return []
+        counts = self.vectorizer.transform(texts)
+        counts.eliminate_zeros()  # buckets where opposite-signed collisions cancelled out
+        counts.data = np.sign(counts.data) * (1.0 + np.log(np.abs(counts.data)))  # sublinear term frequency
+        vectors = counts.toarray().astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return list(vectors / norms)
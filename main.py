@@ -11,7 +11,14 @@ from AI_Generator import ChatbotAPI, APIHandler
 from user_input_validator import UserInputValidator
 from memory_manager import MemoryManager
 from youtube_transcript_module import YouTubeTranscriptDownloader
+from transcript_cache import TranscriptCache
+from http_client import get_shared_client
 from context_menu import ContextMenu
+from message_ids import new_message_id
+from conversation_summarizer import ConversationSummarizer
+from eviction_policy import LexicalRelevancePolicy, EmbeddingRelevancePolicy, RecencyPolicy
+from transcript_window import TranscriptWindow
+from RAG_Manager import RAGManager
 
 class AITubeChanApp:
     def __init__(self):
@@ -20,12 +27,25 @@ class AITubeChanApp:
         self.root.title("AI Tube Chan")
         self.root.geometry("1000x700")
 
-        # Initialize components
+        # Initialize components (all HTTP traffic shares one pool of kept-alive connections)
+        self.http_client = get_shared_client()
+        APIHandler.set_http_client(self.http_client)
         self.chatbot_api = ChatbotAPI()
-        self.youtube_downloader = YouTubeTranscriptDownloader()
-        self.user_input_validator = UserInputValidator(self.youtube_downloader)
+        self.transcript_cache = TranscriptCache()
+        self.youtube_downloader = YouTubeTranscriptDownloader(cache=self.transcript_cache, http_client=self.http_client)
+        self.user_input_validator = UserInputValidator(self.youtube_downloader, self.transcript_cache)
         self.api_handler = APIHandler()
-        self.memory_manager = MemoryManager(self.api_handler, user_input_validator=self.user_input_validator)
+        # Pairs evicted from the context are summarized in the background (SUMMARY_MODEL in config.json, or the chat model)
+        self.summarizer = ConversationSummarizer(APIHandler, model=APIHandler.SUMMARY_MODEL)
+        # Embeddings (when the provider has an embedding model) rank the chunks of transcripts too long for the context
+        self.rag_manager = RAGManager(api_handler=self.api_handler)
+        self.memory_manager = MemoryManager(
+            self.api_handler,
+            user_input_validator=self.user_input_validator,
+            summarizer=self.summarizer,
+            eviction_policy=self.create_eviction_policy(),
+            transcript_window=TranscriptWindow(self.rag_manager)
+        )
 
         # Threading setup
         self.response_queue = queue.Queue()
@@ -34,6 +54,7 @@ class AITubeChanApp:
         # App state
         self.current_character = None
         self.user_name = "User"
+        self.message_bubbles = {}  # message id -> bubble label
         self.auto_save_file = "autosave_session.json"
 
         # Register auto-save on exit
@@ -47,6 +68,14 @@ class AITubeChanApp:
         # Start checking for AI responses
         self.check_ai_response()
 
+    def create_eviction_policy(self):
+        """Eviction policy picked in config.json (EVICTION_POLICY): lexical by default, embeddings only when asked for"""
+        if APIHandler.EVICTION_POLICY == "recency":
+            return RecencyPolicy()
+        if APIHandler.EVICTION_POLICY == "embedding":
+            return EmbeddingRelevancePolicy(self.rag_manager)
+        return LexicalRelevancePolicy()
+
     def setup_ui(self):
         # Main container
         main_frame = ctk.CTkFrame(self.root)
@@ -143,7 +172,7 @@ class AITubeChanApp:
                 message["content"] = new_text
                 break
 
-    def add_message_bubble(self, message, is_user=True):
+    def add_message_bubble(self, message, is_user=True, message_id=None):
         # Create bubble frame
         bubble_frame = ctk.CTkFrame(self.chat_scroll)
 
@@ -165,9 +194,11 @@ class AITubeChanApp:
             font=ctk.CTkFont(size=14)
         )
         message_label.pack(padx=15, pady=10)
+        if message_id:
+            self.message_bubbles[message_id] = message_label
 
         # Create context menu
-        context_menu = ContextMenu(self.root, message_label, self)
+        context_menu = ContextMenu(self.root, message_label, self, message_id=message_id)
 
         # Bind right-click event
         message_label.bind("<3>", lambda e: context_menu.show(e.x_root, e.y_root))
@@ -208,6 +239,7 @@ class AITubeChanApp:
 
             # Reset chat with new character
             self.chatbot_api.reset_chat()
+            self.summarizer.clear()
 
             # Use the new set_sys_prompt method to handle all replacements
             self.chatbot_api.set_sys_prompt(character_sheet, self.user_name)
@@ -334,8 +366,9 @@ class AITubeChanApp:
         if not message or self.is_processing:
             return
 
-        # Add user message bubble immediately
-        self.add_message_bubble(message, is_user=True)
+        # Add user message bubble immediately (the stored message gets the same ID)
+        message_id = new_message_id()
+        self.add_message_bubble(message, is_user=True, message_id=message_id)
 
         # Clear input
         self.message_entry.delete("1.0", "end")
@@ -346,41 +379,33 @@ class AITubeChanApp:
         self.message_entry.configure(state="disabled")
 
         # Start AI processing in a separate thread
-        thread = threading.Thread(target=self.process_ai_message, args=(message,), daemon=True)
+        thread = threading.Thread(target=self.process_ai_message, args=(message, message_id), daemon=True)
         thread.start()
 
-    def process_ai_message(self, message):
+    def process_ai_message(self, message, message_id=None):
         """Process AI message in a separate thread"""
         try:
-            # Process message (handle YouTube links)
-            message_to_store, message_to_send, youtube_metadata = self.user_input_validator.process_message_with_link(message)
-
-            if youtube_metadata:
-                # Register with memory manager
-                message_index = len(self.chatbot_api.chat_history)
-                self.memory_manager.register_youtube_message(
-                    message_index,
-                    youtube_metadata["link_version"],
-                    youtube_metadata["transcript_version"],
-                    youtube_metadata["video_title"]
-                )
+            # Process message (handle YouTube links), registered with the memory manager under the message's ID
+            message_id = message_id or new_message_id()
+            message_to_store, message_to_send, youtube_metadata = self.memory_manager.process_youtube_message(message_id, message)
 
-            # Prepare messages for API
-            optimized_history = self.memory_manager.prepare_messages_for_api(self.chatbot_api.chat_history)
-
-            # Add current message to optimized history
-            optimized_history.append({"role": "user", "content": message_to_send or message_to_store})
+            # Prepare messages for API (token counts and summaries follow the selected model)
+            self.memory_manager.model = self.chatbot_api.current_model
+            # The current message is packed last: a transcript too long for the context is cut to the chunks relevant to the question
+            pending_message = {"role": "user", "content": message_to_send or message_to_store, "id": message_id}
+            optimized_history = self.memory_manager.prepare_messages_for_api(self.chatbot_api.chat_history, query=message, pending_message=pending_message)
 
             # Send to API
             response = self.chatbot_api.send_message(
                 message_to_send or message,
                 store_message=message_to_store,
-                custom_history=optimized_history
+                custom_history=optimized_history,
+                message_id=message_id
             )
 
             # Put result in queue for main thread to process
             if response:
-                self.response_queue.put(("success", response))
+                self.response_queue.put(("success", (response, self.chatbot_api.chat_history[-1].get("id"))))
             else:
                 self.response_queue.put(("error", "Failed to get response from AI"))
 
@@ -395,7 +420,8 @@ class AITubeChanApp:
 
                 if response_type == "success":
                     # Add AI response bubble
-                    self.add_message_bubble(response_data, is_user=False)
+                    response, response_id = response_data
+                    self.add_message_bubble(response, is_user=False, message_id=response_id)
                     # Auto-save session after successful message
                     self.auto_save_session()
                 elif response_type == "error":
@@ -417,6 +443,7 @@ class AITubeChanApp:
         # Clear existing messages
         for widget in self.chat_scroll.winfo_children():
             widget.destroy()
+        self.message_bubbles = {}
 
         # Display non-system messages with message bubbles
         for message in self.chatbot_api.get_all_non_system_messages():
@@ -424,9 +451,9 @@ class AITubeChanApp:
             content = message["content"]
 
             if role == "user":
-                self.add_message_bubble(content, is_user=True)
+                self.add_message_bubble(content, is_user=True, message_id=message.get("id"))
             elif role == "assistant":
-                self.add_message_bubble(content, is_user=False)
+                self.add_message_bubble(content, is_user=False, message_id=message.get("id"))
 
     def auto_save_session(self):
         """Auto-save current session"""
@@ -440,6 +467,7 @@ class AITubeChanApp:
                 "creativity_mode": self.creativity_dropdown.get(),
                 "chat_history": self.chatbot_api.chat_history,
                 "youtube_messages": self.memory_manager.get_youtube_messages(),
+                "conversation_summary": self.summarizer.to_dict(),
                 "version": "1.0"  # For future compatibility
             }
 
@@ -501,8 +529,9 @@ class AITubeChanApp:
                 self.creativity_dropdown.configure(state="disabled")
 
         # Restore memory manager state
+        # JSON turns every key into a string: digits are positions from sessions saved before message IDs
         youtube_messages = save_data.get("youtube_messages", {})
-        self.memory_manager.youtube_messages = {int(k): v for k, v in youtube_messages.items()}
+        self.memory_manager.youtube_messages = {(int(k) if str(k).isdigit() else k): v for k, v in youtube_messages.items()}
 
         # Restore chat history
         self.chatbot_api.chat_history = save_data["chat_history"]
@@ -514,7 +543,11 @@ class AITubeChanApp:
             # Reload character (resets chat and updates system prompt)
             self.load_character(self.current_character)
             # Restore non-system messages
-            self.chatbot_api.chat_history.extend(non_system_messages)
+            self.chatbot_api.extend_messages(non_system_messages)
+
+        # Older sessions registered YouTube messages by position, key them by message ID from now on
+        self.memory_manager.migrate_positional_keys(self.chatbot_api.chat_history)
+        self.summarizer.load(save_data.get("conversation_summary"))
 
         self.update_chat_display()
 
@@ -537,6 +570,7 @@ class AITubeChanApp:
                     "creativity_mode": self.creativity_dropdown.get(),
                     "chat_history": self.chatbot_api.chat_history,
                     "youtube_messages": self.memory_manager.get_youtube_messages(),
+                    "conversation_summary": self.summarizer.to_dict(),
                     "version": "1.0"
                 }
 
@@ -573,6 +607,7 @@ class AITubeChanApp:
         if messagebox.askyesno("Confirm", "Are you sure you want to clear the chat?"):
             self.chatbot_api.reset_chat()
             self.memory_manager.clear_youtube_messages()
+            self.summarizer.clear()
 
             # Reload character to restore system prompt
             if self.current_character:
@@ -1,12 +1,23 @@
-import json
+import hashlib
 import re
+from collections import OrderedDict, deque
+from context_packer import ContextPacker
+from eviction_policy import LexicalRelevancePolicy
+from transcript_window import TranscriptWindow
+from history_view import HistoryView
+from message_ids import MESSAGE_ID_KEY, MessageIndex, ensure_message_ids
+from token_estimator import TokenEstimator
 
 class MemoryManager:
     """
     Manages chat message memory to optimize context window usage.
     Dynamically compresses/expands YouTube transcript messages based on available tokens.
     """
-    def __init__(self, api_handler, max_tokens=30000, user_input_validator=None):
+    TOKEN_CACHE_SIZE = 4096  # per-message token counts kept in memory
+    MESSAGE_SEPARATOR = "\n\n"  # how messages are joined when the whole history is counted
+    PACKING_STRATEGY = "greedy"  # ContextPacker strategy: "greedy" (newest transcripts first) or "knapsack"
+
+    def __init__(self, api_handler, max_tokens=30000, user_input_validator=None, local_estimation=True, verify_every=20, summarizer=None, eviction_policy=None, transcript_window=None):
         """
         Initialize the memory manager.
 
@@ -14,21 +25,54 @@ class MemoryManager:
             api_handler: The API handler class used to count tokens
             max_tokens: Maximum tokens to target (default 30k to leave some headroom)
             user_input_validator: Optional UserInputValidator instance to process YouTube links
+            local_estimation: Count tokens with the local TokenEstimator (False: always ask the API counter)
+            verify_every: With local estimation, every Nth count is checked against the API counter to calibrate it
+            summarizer: Optional ConversationSummarizer that folds evicted pairs into a summary appended to the system prompt
+            eviction_policy: EvictionPolicy deciding which pairs go first when the history does not fit
+                (default: LexicalRelevancePolicy, local; RecencyPolicy evicts strictly by age)
+            transcript_window: TranscriptWindow that sends only the chunks relevant to the question of a transcript
+                that does not fit (default: one ranking the chunks lexically; None disables the windowing)
         """
         self.api_handler = api_handler
         self.max_tokens = max_tokens
         self.model = "Sao10K-70B-L3.3-Cirrus-x1"  # Default model
-        self.youtube_messages = {}  # message_index -> {"link": link, "transcript": transcript}
+        self.youtube_messages = {}  # message id (or legacy list position) -> {"link_version", "transcript_version", ...}
+        self._message_index = MessageIndex()  # message id -> position in the chat history being prepared
+        self._ready_summaries = deque()  # (entry, summary) finished by summary workers, stored by _apply_ready_summaries
         self.user_input_validator = user_input_validator
+        self.summarizer = summarizer
+        self.eviction_policy = eviction_policy if eviction_policy is not None else LexicalRelevancePolicy()
+        self.transcript_window = transcript_window if transcript_window is not None else TranscriptWindow()
+        # Token counts per message: (model, content hash) -> tokens, so only new or edited messages hit the counter
+        self._token_cache = OrderedDict()
+        # (model, message id) -> (content, tokens): messages with an ID skip hashing while their content is unchanged
+        self._token_cache_by_id = OrderedDict()
+        # model -> (tokens the counter adds to every call, tokens of one MESSAGE_SEPARATOR)
+        self._token_overheads = {}
+        # Local estimator, calibrated from completion usage and the occasional remote count
+        self.token_estimator = TokenEstimator() if local_estimation else None
+        self.verify_every = verify_every
+        self.last_packing_plan = None  # plan of the last packed history, for logging and tests
+        self._counts_since_verification = verify_every  # the first count of a session is verified
+        register_usage_callback = getattr(api_handler, "register_usage_callback", None)
+        if self.token_estimator is not None and callable(register_usage_callback):
+            register_usage_callback(self.token_estimator.observe_usage)
         print(f"[MemoryManager] Initialized with max_tokens={max_tokens}")
 
-    def process_youtube_message(self, message_index, user_input):
+    def _apply_ready_summaries(self):
+        """Stores the extractive summaries finished since the last call in their entries."""
+        while self._ready_summaries:
+            entry, summary = self._ready_summaries.popleft()
+            entry["summary_version"] = summary
+            print(f"[MemoryManager] Summary ready for '{entry.get('video_title')}' (~{len(summary) // 4} tokens)")
+
+    def process_youtube_message(self, message_id, user_input):
         """
         Detects and processes YouTube links in user input.
         Uses UserInputValidator to properly retrieve and process transcripts.
 
         Args:
-            message_index: Index of the message in the chat history
+            message_id: ID of the message in the chat history (the stored message must get the same ID)
             user_input: The user input message to process
 
         Returns:
@@ -36,46 +80,87 @@ class MemoryManager:
         """
         if not self.user_input_validator:
             # No validator available, just return original input
-            return user_input, None
+            return user_input, user_input, None
+
+        self._apply_ready_summaries()
 
         # Use the validator to process the message with potential YouTube links
         message_to_store, message_to_send, youtube_metadata = self.user_input_validator.process_message_with_link(user_input)
 
         if not youtube_metadata:
             # No YouTube content found
-            return user_input, None
-
-        # Extract information from metadata
-        video_title = youtube_metadata.get('video_title', 'Unknown Video')
-        link_version = youtube_metadata.get('link_version')
-        transcript_version = youtube_metadata.get('transcript_version')
-
-        # Register the YouTube message for memory management
-        self.register_youtube_message(
-            message_index,
-            link_version,
-            transcript_version,
-            video_title
-        )
+            return message_to_store, message_to_send, None
+
+        # Register the YouTube message for memory management (one registration per video for multi-link messages)
+        take_summary = getattr(self.user_input_validator, "take_summary", None)
+        for video in youtube_metadata.get('videos') or [youtube_metadata]:
+            self.register_youtube_message(
+                message_id,
+                video.get('link_version'),
+                video.get('transcript_version'),
+                video.get('video_title', 'Unknown Video'),
+                video_id=video.get('video_id'),
+                summary_version=take_summary(video.get('transcript_version')) if take_summary else None,
+                transcript_span=video.get('transcript_span')
+            )
 
-        print(f"[MemoryManager] Registered YouTube content: '{video_title}'")
-        return link_version, video_title
+        print(f"[MemoryManager] Registered YouTube content: '{youtube_metadata.get('video_title', 'Unknown Video')}'")
+        return message_to_store, message_to_send, youtube_metadata
 
-    def register_youtube_message(self, message_index, link_version, transcript_version, video_title=None):
+    def register_youtube_message(self, message_index, link_version, transcript_version, video_title=None, video_id=None, summary_version=None, transcript_span=None):
         """
         Register a message containing a YouTube transcript.
 
+        When a message carries several videos, call this once per video with that video's section strings
+        and its video_id. The entry then keeps every video under "videos" and compression/expansion swaps
+        one section at a time, so videos can be dropped individually.
+
         Args:
-            message_index: Index of the message in the chat history
-            link_version: Message with just "Source: link"
-            transcript_version: Message with full transcript
+            message_index: ID of the message (its "id" key), or its position in the chat history for histories without IDs
+            link_version: Message with just "Source: link" (or the video's link section)
+            transcript_version: Message with full transcript (or the video's transcript section)
             video_title: Title of the YouTube video
+            video_id: YouTube video ID (optional, required to register several videos on one message)
+            summary_version: Message (or section) with only the most representative transcript excerpts, or a
+                Future resolving to it while the summary is still being computed; None if there is no summary
+            transcript_span: (start, end) of the bare transcript inside transcript_version, needed to send only
+                the relevant chunks of a transcript that does not fit
         """
-        self.youtube_messages[message_index] = {
+        entry = {
             "link_version": link_version,
             "transcript_version": transcript_version,
             "video_title": video_title
         }
+        if video_id is not None:
+            entry["video_id"] = video_id
+        if transcript_span is not None:
+            entry["transcript_span"] = list(transcript_span)
+            if self.transcript_window is not None:
+                # The chunks are indexed now (BM25, and embeddings in the background), so later questions only score the query
+                start, end = transcript_span
+                self.transcript_window.index_transcript(video_id, transcript_version[start:end])
+        if isinstance(summary_version, str):
+            entry["summary_version"] = summary_version
+        elif summary_version is not None:
+            # Computed at ingest in a worker thread: the entry gets the summary tier once it is ready. The worker
+            # only queues it, the entry itself is updated by the thread preparing the messages (the UI thread may
+            # be saving the entries with json.dump at any time)
+            def queue_summary(future, entry=entry):
+                if not future.cancelled() and future.exception() is None and future.result():
+                    self._ready_summaries.append((entry, future.result()))
+            summary_version.add_done_callback(queue_summary)
+
+        existing = self.youtube_messages.get(message_index)
+        existing_ids = [part.get("video_id") for part in self._entry_parts(existing)] if existing else []
+        if video_id is not None and existing_ids and None not in existing_ids and video_id not in existing_ids:
+            # Another video on the same message: keep each one as a separately compressible section
+            parts = self._entry_parts(existing) + [entry]
+            self.youtube_messages[message_index] = {
+                "video_title": " | ".join(str(part.get("video_title")) for part in parts),
+                "videos": parts
+            }
+        else:
+            self.youtube_messages[message_index] = entry
 
         # Calculate approximate token difference between versions
         link_tokens = len(link_version) // 4  # Rough estimate
@@ -89,221 +174,464 @@ class MemoryManager:
         print(f"[MemoryManager] Token difference: ~{token_diff} tokens")
 
     def count_tokens(self, messages):
-        """Count tokens for a list of messages."""
-        # Prepare chat history for token counting
-        chat_history_text = "\n\n".join(message['content'] for message in messages)
+        """
+        Count tokens for a list of messages.
 
-        # Count tokens using the API Handler
-        token_data = self.api_handler.count_tokens(self.model, chat_history_text)
+        With local estimation (the default) the count is computed locally, and only every `verify_every`th
+        count goes to the API counter, whose answer calibrates the estimator.
 
-        if token_data and 'total_tokens' in token_data:
-            token_count = token_data['total_tokens']
-            print(f"[MemoryManager] Token count from API: {token_count} tokens")
+        Remote counts are made once per message per model and remembered by content hash; the history total
+        is the sum of the cached parts plus the separators between them, so only new or edited messages reach the API.
+        """
+        contents = [message['content'] for message in messages]
+
+        if self.token_estimator is not None and self._counts_since_verification < self.verify_every:
+            self._counts_since_verification += 1
+            token_count = self.token_estimator.count(self.model, contents, self.MESSAGE_SEPARATOR)
+            print(f"[MemoryManager] Estimated token count: {token_count} tokens")
+            print(f"[MemoryManager] Current token count: {token_count}/{self.max_tokens} tokens ({(token_count/self.max_tokens)*100:.1f}%)")
+            return token_count
+
+        self._counts_since_verification = 0
+        token_count, counted = self._count_tokens_cached(contents)
+
+        if token_count is not None:
+            print(f"[MemoryManager] Token count from API: {token_count} tokens ({counted} new message(s) counted, {len(contents) - counted} cached)")
+            if self.token_estimator is not None and counted:
+                self.token_estimator.calibrate(self.model, self.MESSAGE_SEPARATOR.join(contents), token_count)
+        elif self.token_estimator is not None:
+            token_count = self.token_estimator.count(self.model, contents, self.MESSAGE_SEPARATOR)
+            print(f"[MemoryManager] WARNING: API token count failed, using the local estimate: {token_count} tokens")
         else:
-            # Fallback: estimate tokens using a simple rule (about 4 chars per token)
-            token_count = len(chat_history_text) // 4
+            # Fallback: estimate tokens using a simple rule (about 4 chars per token) on the joined history
+            separators = len(self.MESSAGE_SEPARATOR) * max(0, len(contents) - 1)
+            token_count = (sum(len(content) for content in contents) + separators) // 4
             print(f"[MemoryManager] WARNING: API token count failed, using fallback method")
             print(f"[MemoryManager] Fallback token count: {token_count} tokens")
 
         print(f"[MemoryManager] Current token count: {token_count}/{self.max_tokens} tokens ({(token_count/self.max_tokens)*100:.1f}%)")
         return token_count
 
-    def optimize_context(self, chat_history):
+    def _api_token_count(self, text):
+        """Counts tokens of a text with the API, None if the counter is unavailable."""
+        token_data = self.api_handler.count_tokens(self.model, text)
+        if token_data and 'total_tokens' in token_data:
+            return token_data['total_tokens']
+        return None
+
+    def _count_tokens_cached(self, contents):
         """
-        Optimize the context window by compressing YouTube messages if needed.
-        Returns an optimized copy of the chat history.
+        Sums per-message token counts, counting only messages not seen before for the current model.
 
         Returns:
-            list: The optimized chat history.
+            tuple: (total tokens or None if the API could not count, number of messages sent to the API)
         """
-        print(f"\n[MemoryManager] Starting context optimization...")
-        print(f"[MemoryManager] YouTube messages tracked: {len(self.youtube_messages)}")
-
-        # Make a deep copy of chat history to avoid modifying the original
-        optimized_history = json.loads(json.dumps(chat_history))
-
-        # Calculate current token count
-        current_tokens = self.count_tokens(optimized_history)
-        original_tokens = current_tokens
-
-        # If we're already under the limit, return the chat history as is
-        if current_tokens <= self.max_tokens:
-            print(f"[MemoryManager] Context already optimized: {current_tokens}/{self.max_tokens} tokens")
-            return optimized_history
-
-        print(f"[MemoryManager] Context needs optimization: {current_tokens}/{self.max_tokens} tokens")
-
-        # Sort YouTube messages from oldest to newest
-        message_indices = sorted(self.youtube_messages.keys())
-        number_of_youtube_messages = len(message_indices)
-        # Check optimized history for how many youtube messages are present uncompressed
-        uncompressed_youtube_messages_count = sum(1 for idx in message_indices if idx < len(optimized_history) and "transcript_version" in self.youtube_messages[idx])
-        print(f"[MemoryManager] Uncompressed YouTube messages count: {uncompressed_youtube_messages_count}")
-
-        # Prioritize single-link compression in small chats
-        if len(optimized_history) <= 4 and len(self.youtube_messages) == 1:
-            print("[MemoryManager] Small chat detected (4 messages) with 1 YouTube link - prioritizing compression")
-            message_index = next(iter(self.youtube_messages.keys()))
-            if message_index < len(optimized_history):
-                link_version = self.youtube_messages[message_index]["link_version"]
-                optimized_history[message_index]["content"] = link_version
-                current_tokens = self.count_tokens(optimized_history)
-                if current_tokens <= self.max_tokens:
-                    print(f"[MemoryManager] Single link compressed successfully ({original_tokens} → {current_tokens} tokens)")
-                    return optimized_history
-
-        # if its just one message or less and chat_history has at least 8 messages, we go straight to removing the two oldest messages until we are under the limit or under 8 messages
-        if number_of_youtube_messages <= 1 and len(optimized_history) >= 8:
-            print(f"[MemoryManager] One or less Youtube messages detected, prioritizing removal of oldest messages")
-            while True:
-                optimized_history = self.remove_oldest_message_pair(optimized_history)
-                current_tokens = self.count_tokens(optimized_history)
-                print(f"[MemoryManager] Current token count after removal: {current_tokens}/{self.max_tokens} tokens")
-                if current_tokens <= self.max_tokens:
-                    print(f"[MemoryManager] Context optimized successfully after removing messages")
-                    print(f"[MemoryManager] Tokens reduced: {original_tokens} → {current_tokens} (saved {original_tokens - current_tokens} tokens)")
-                    return optimized_history
-
-        # otherwise, we just try to compress youtube messages until we are under the limit or we have just one (non-compressed) message left
-        while current_tokens > self.max_tokens:
-            print(f"[MemoryManager] More than one YouTube message detected, attempting compression")
-            # Compress messages starting with the oldest until we're under the limit
-            compressed_count = 0
-            # Find the newest valid YouTube message
-            last_valid_youtube_index = max(
-                (idx for idx in message_indices if idx < len(optimized_history) and "transcript_version" in self.youtube_messages[idx]),
-                default=-1
-            )
-            for idx in message_indices:
-                # If its the last youtube message we go straight to removing the two oldest messages until we are under the limit
-                # This is to avoid removing the last youtube link as it may be relevant to the conversation
-                if idx == last_valid_youtube_index:
-                    print(f"[MemoryManager] Last YouTube message detected, prioritizing removal of oldest messages")
-                    while True:
-                        optimized_history = self.remove_oldest_message_pair(optimized_history)
-                        current_tokens = self.count_tokens(optimized_history)
-                        print(f"[MemoryManager] Current token count after removal: {current_tokens}/{self.max_tokens} tokens")
-                        if current_tokens <= self.max_tokens:
-                            print(f"[MemoryManager] Context optimized successfully after removing messages")
-                            print(f"[MemoryManager] Tokens reduced: {original_tokens} → {current_tokens} (saved {original_tokens - current_tokens} tokens)")
-                            return optimized_history
-
-                if idx >= len(optimized_history):
-                    continue  # Skip if index is out of bounds
-
-                # Replace transcript version with link version if this message is tracked
-                if "link_version" in self.youtube_messages[idx] and idx < len(optimized_history):
-                    # Check if the current content is the transcript version or contains substantial parts of it
-                    current_content = optimized_history[idx]["content"]
-                    transcript_version = self.youtube_messages[idx]["transcript_version"]
-                    link_version = self.youtube_messages[idx]["link_version"]
-
-                    # Only compress if it's not already the link version
-                    if current_content != link_version:
-                        video_title = self.youtube_messages[idx].get("video_title", "Unknown Video")
-                        print(f"[MemoryManager] Compressing message {idx} ('{video_title}')")
-
-                        optimized_history[idx]["content"] = link_version
-                        compressed_count += 1
-
-                        # Recalculate token count
-                        current_tokens = self.count_tokens(optimized_history)
-                        if current_tokens <= self.max_tokens:
-                            print(f"[MemoryManager] Context optimized successfully after compressing {compressed_count} messages")
-                            print(f"[MemoryManager] Tokens reduced: {original_tokens} → {current_tokens} (saved {original_tokens - current_tokens} tokens)")
-                            break # Exit loop immediately after reaching the token limit
-                    else:
-                        print(f"[MemoryManager] Message {idx} already compressed, skipping")
-                else:
-                    print(f"[MemoryManager] Message {idx} not tracked, skipping")
-
-
-        if current_tokens > self.max_tokens:
-            print(f"[MemoryManager] WARNING: Context still exceeds token limit after optimization!")
-            print(f"[MemoryManager] Current: {current_tokens}/{self.max_tokens} tokens (still {current_tokens - self.max_tokens} tokens over)")
-
-        return optimized_history
+        counts = self._message_tokens_remote(contents)
+        if counts is None:
+            return None, 0
+        call_overhead, separator_tokens, tokens, counted = counts
+        return call_overhead + separator_tokens * max(0, len(contents) - 1) + sum(tokens), counted
 
-    def expand_context(self, chat_history):
+    def _message_tokens_remote(self, contents, message_ids=None):
         """
-        Expand the context by including full transcripts where possible.
-        Returns an expanded copy of the chat history.
+        Per-message token counts from the API counter, cached by content hash.
+        Texts with a message ID are looked up by ID first, so unchanged messages are not hashed again.
+
+        Returns:
+            tuple: (call overhead, separator tokens, tokens per message, messages sent to the API), or None if the API could not count
         """
-        print(f"\n[MemoryManager] Starting context expansion...")
-        print(f"[MemoryManager] YouTube messages tracked: {len(self.youtube_messages)}")
+        overheads = self._token_overheads.get(self.model)
+        if overheads is None:
+            call_overhead = self._api_token_count("")
+            if call_overhead is None:
+                return None
+            separator = self._api_token_count(self.MESSAGE_SEPARATOR)
+            if separator is None:
+                return None
+            overheads = (call_overhead, max(0, separator - call_overhead))
+            self._token_overheads[self.model] = overheads
+        call_overhead, separator_tokens = overheads
+
+        message_tokens = []
+        counted = 0
+        for content, message_id in zip(contents, message_ids or [None] * len(contents)):
+            id_key = (self.model, message_id)
+            by_id = self._token_cache_by_id.get(id_key) if message_id else None
+            if by_id is not None and by_id[0] is content:
+                self._token_cache_by_id.move_to_end(id_key)
+                message_tokens.append(by_id[1])
+                continue
+            key = (self.model, hashlib.sha1(content.encode("utf-8")).hexdigest())
+            tokens = self._token_cache.get(key)
+            if tokens is None:
+                tokens = self._api_token_count(content)
+                if tokens is None:
+                    return None
+                tokens = max(0, tokens - call_overhead)
+                counted += 1
+                self._token_cache[key] = tokens
+                if len(self._token_cache) > self.TOKEN_CACHE_SIZE:
+                    self._token_cache.popitem(last=False)
+            else:
+                self._token_cache.move_to_end(key)
+            if message_id:
+                self._token_cache_by_id[id_key] = (content, tokens)
+                if len(self._token_cache_by_id) > self.TOKEN_CACHE_SIZE:
+                    self._token_cache_by_id.popitem(last=False)
+            message_tokens.append(tokens)
+        return call_overhead, separator_tokens, message_tokens, counted
+
+    def _message_costs(self, contents, message_ids=None):
+        """
+        Token cost of each text on its own, measured up front for the context packer.
+        Uses the local estimator when enabled, otherwise the cached API counts, otherwise the 4 chars per token rule.
 
-        # Make a deep copy of chat history
-        expanded_history = json.loads(json.dumps(chat_history))
+        Returns:
+            tuple: (call overhead, separator tokens, tokens per text)
+        """
+        if self.token_estimator is not None:
+            tokens, separator_tokens = self.token_estimator.costs(self.model, contents, self.MESSAGE_SEPARATOR)
+            return 0, separator_tokens, tokens
+        counts = self._message_tokens_remote(contents, message_ids)
+        if counts is not None:
+            call_overhead, separator_tokens, tokens, counted = counts
+            print(f"[MemoryManager] Token costs from API: {counted} new text(s) counted, {len(contents) - counted} cached")
+            return call_overhead, separator_tokens, tokens
+        print(f"[MemoryManager] WARNING: API token count failed, using fallback method for the token costs")
+        return 0, len(self.MESSAGE_SEPARATOR) / 4, [len(content) / 4 for content in contents]
+
+    def clear_token_cache(self):
+        """Forgets every cached per-message token count."""
+        self._token_cache.clear()
+        self._token_cache_by_id.clear()
+        self._token_overheads.clear()
+
+    @staticmethod
+    def _entry_parts(entry):
+        """Returns the per-video parts of a YouTube entry (the entry itself for single-video messages)."""
+        return list(entry["videos"]) if "videos" in entry else [entry]
+
+    @staticmethod
+    def _is_expandable(entry):
+        """True if the entry has a transcript version that can be swapped in."""
+        return "videos" in entry or "transcript_version" in entry
+
+    @staticmethod
+    def _compress_content(content, entry, part):
+        """
+        Returns the content with one video compressed to its link version.
+        Single-video entries replace the whole message, multi-video entries swap only that video's section.
+        """
+        if "videos" not in entry:
+            return entry["link_version"]
+        if part.get("summary_version") and part["summary_version"] in content:
+            return content.replace(part["summary_version"], part["link_version"], 1)
+        return content.replace(part["transcript_version"], part["link_version"], 1)
+
+    @staticmethod
+    def _summarize_content(content, entry, part):
+        """
+        Returns the content with one video (currently a link) shown as its extractive summary.
+        Single-video entries replace the whole message, multi-video entries swap only that video's section.
+        """
+        if "videos" not in entry:
+            return entry["summary_version"]
+        return content.replace(part["link_version"], part["summary_version"], 1)
 
-        # Calculate current token count
-        current_tokens = self.count_tokens(expanded_history)
-        original_tokens = current_tokens
+    @staticmethod
+    def _expand_content(content, entry, part):
+        """
+        Returns the content with one video expanded to its transcript version.
+        Single-video entries replace the whole message, multi-video entries swap only that video's section.
+        """
+        if "videos" not in entry:
+            return entry["transcript_version"]
+        if part["transcript_version"] in content:
+            return content
+        return content.replace(part["link_version"], part["transcript_version"], 1)
+
+    @staticmethod
+    def _window_content(content, entry, part, window_version):
+        """
+        Returns the content with one video (currently a link or a summary) shown as a window of its transcript.
+        Single-video entries replace the whole message, multi-video entries swap only that video's section.
+        """
+        if "videos" not in entry:
+            return window_version
+        if part.get("summary_version") and part["summary_version"] in content:
+            return content.replace(part["summary_version"], window_version, 1)
+        return content.replace(part["link_version"], window_version, 1)
+
+    def _transcript_segments(self, part):
+        """Caption timings of a video's transcript (for the window timestamps), None when unknown."""
+        get_segments = getattr(self.user_input_validator, "get_transcript_segments", None)
+        if not get_segments or not part.get("video_id"):
+            return None
+        try:
+            return get_segments(part["video_id"])
+        except Exception as e:
+            print(f"[MemoryManager] Could not read the transcript timings of {part['video_id']}: {e}")
+            return None
 
-        # Sort YouTube messages from newest to oldest
-        message_indices = sorted(self.youtube_messages.keys(), reverse=True)
-        expanded_count = 0
+    def _window_transcripts(self, history, entries, options, plan, priorities, query):
+        """
+        Fills the budget the plan left with the chunks most relevant to `query` of the transcripts that did not fit
+        (typically a single video longer than the whole budget). The most relevant videos are windowed first.
+        """
+        kept = set(plan["kept"])
+        candidates = [
+            position for position, option in enumerate(options)
+            if position not in plan["expanded"] and option["message_index"] in kept and option["part"].get("transcript_span")
+        ]
+        candidates.sort(key=lambda position: (priorities[options[position]["message_index"]] if priorities else 0, options[position]["message_index"]), reverse=True)
+
+        def costs_of(texts):
+            _, separator_tokens, tokens = self._message_costs(texts)
+            return tokens, separator_tokens
+
+        for position in candidates:
+            left = self.max_tokens - plan["total_tokens"]
+            option = options[position]
+            idx, part = option["message_index"], option["part"]
+            start, end = part["transcript_span"]
+            frame_start, frame_end = part["transcript_version"][:start], part["transcript_version"][end:]
+            current = history.content(idx)
+            before, frame = costs_of([current, self._window_content(current, entries[idx], part, frame_start + frame_end)])[0]
+            window = self.transcript_window.build(
+                part["transcript_version"][start:end], query, left - (frame - before), costs_of,
+                self._transcript_segments(part), video_id=part.get("video_id")
+            )
+            if not window:
+                continue
+            windowed = self._window_content(current, entries[idx], part, frame_start + window + frame_end)
+            history.set_content(idx, windowed)
+            plan["total_tokens"] += int(costs_of([windowed])[0][0] - before)
+            plan["windowed"].append(position)
+            if position in plan["summarized"]:
+                plan["summarized"].remove(position)
+            print(f"[MemoryManager] '{option['title']}' does not fit whole, sending the chunks relevant to the question")
+
+    def _is_expanded(self, content, entry, part):
+        """True if the part currently shows its transcript in the message content."""
+        if "videos" not in entry:
+            return content == entry["transcript_version"]
+        return part["transcript_version"] in content
+
+    def _message_priorities(self, chat_history, entries, query):
+        """
+        Scores every message with the eviction policy. YouTube messages are scored on their video titles
+        and summaries as well, so a question about a video keeps the turn that brought it in.
+        """
+        texts = []
+        for idx, message in enumerate(chat_history):
+            text = message["content"]
+            if idx in entries:
+                parts = self._entry_parts(entries[idx])
+                text = " ".join([text] + [str(part.get("video_title") or "") for part in parts] + [part["summary_version"] for part in parts if isinstance(part.get("summary_version"), str)])
+            texts.append(text)
+        return self.eviction_policy.score_messages(texts, [message["role"] for message in chat_history], query, anchored=entries.keys())
+
+    def _pack_context(self, chat_history, expand=True, compress=True, query=None, pending=None):
+        """
+        Packs the history into the token budget in one pass with ContextPacker.
 
-        # Try to expand each message, starting with the newest
-        for idx in message_indices:
-            if idx >= len(expanded_history):
-                continue  # Skip if index is out of bounds
+        The token costs of every message (YouTube messages with all videos as links) and of every video's
+        transcript and extractive summary are measured once up front; the packer then picks per video the
+        transcript, the summary or the link and, if the links alone do not fit, the oldest pairs to drop,
+        without counting again.
 
-            # Check if this message can be expanded
-            if "transcript_version" in self.youtube_messages[idx]:
-                video_title = self.youtube_messages[idx].get("video_title", "Unknown Video")
-                print(f"[MemoryManager] Attempting to expand message {idx} ('{video_title}')")
+        Args:
+            chat_history (list): The history to pack (not modified, unchanged messages share their text with it).
+            expand (bool): Transcripts currently shown as links may be expanded.
+            compress (bool): Transcripts currently expanded may be compressed and old pairs removed.
+            query (str): The pending user input the eviction policy scores the history against.
+            pending (dict): The message being sent, packed after the history and never dropped.
 
-                # Temporarily expand this message
-                original_content = expanded_history[idx]["content"]
-                expanded_history[idx]["content"] = self.youtube_messages[idx]["transcript_version"]
+        Returns:
+            list: The packed copy of the chat history.
+        """
+        self._apply_ready_summaries()
+        entries = self._entries_by_position(chat_history)
+        protected = []
+        if pending is not None:
+            pending_entry = self.youtube_messages.get(pending.get(MESSAGE_ID_KEY))
+            if pending_entry and self._is_expandable(pending_entry):
+                entries[len(chat_history)] = pending_entry
+            protected = [len(chat_history)]
+            chat_history = chat_history + [pending]
+        # The view shares the original messages; only the substituted contents and dropped indices are recorded
+        history = HistoryView(chat_history)
+        tracked = sorted(entries)
+
+        base_contents = [message["content"] for message in chat_history]
+        options = []  # one per video: {"message_index", "part", "title", "content" (message with only that video expanded), "summary_content"}
+        currently_expanded = []
+        for idx in tracked:
+            entry = entries[idx]
+            content = history.content(idx)
+            compressed = content
+            for part in self._entry_parts(entry):
+                compressed = self._compress_content(compressed, entry, part)
+            base_contents[idx] = compressed
+            for part in self._entry_parts(entry):
+                option = {
+                    "message_index": idx,
+                    "part": part,
+                    "title": part.get("video_title", "Unknown Video"),
+                    "content": self._expand_content(compressed, entry, part)
+                }
+                if isinstance(part.get("summary_version"), str):
+                    option["summary_content"] = self._summarize_content(compressed, entry, part)
+                options.append(option)
+                currently_expanded.append(self._is_expanded(content, entry, part))
+
+        # Turns already folded into the conversation summary stay out, the summary goes into the system prompt instead
+        summary_message = None
+        summarized = set()
+        if compress and self.summarizer is not None:
+            summary_message = self.summarizer.summary_message()
+            covered_ids = self.summarizer.covered_ids() if summary_message else set()
+            summarized = {idx for idx, message in enumerate(chat_history) if idx > 0 and message.get(MESSAGE_ID_KEY) in covered_ids}
+
+        # Every token count happens here, before packing (unchanged messages are counted under their ID)
+        text_ids = {}
+        for message, content in zip(chat_history, base_contents):
+            if content is message["content"] and message.get(MESSAGE_ID_KEY):
+                text_ids.setdefault(content, message[MESSAGE_ID_KEY])
+        extra_texts = [summary_message["content"]] if summary_message else []
+        summary_texts = [option["summary_content"] for option in options if "summary_content" in option]
+        texts = list(dict.fromkeys(base_contents + [option["content"] for option in options] + summary_texts + extra_texts))
+        call_overhead, separator_tokens, tokens = self._message_costs(texts, [text_ids.get(text) for text in texts])
+        cost_of = dict(zip(texts, tokens))
+        if summary_message:
+            call_overhead += cost_of[summary_message["content"]] + separator_tokens  # the summary is always sent
+        costs = [cost_of[content] for content in base_contents]
+        for option in options:
+            option["tokens"] = max(0, cost_of[option["content"]] - costs[option["message_index"]])
+            if "summary_content" in option:
+                option["summary_tokens"] = max(0, cost_of[option["summary_content"]] - costs[option["message_index"]])
+
+        if not expand:
+            # Compressing only: videos shown as links are not candidates
+            options = [option for option, expanded in zip(options, currently_expanded) if expanded]
+            currently_expanded = [True] * len(options)
+        pinned = set()
+        if not compress:
+            pinned = {position for position, expanded in enumerate(currently_expanded) if expanded}
+        elif tracked and not (len(chat_history) <= 4 and len(tracked) == 1):
+            # The newest video stays expanded, dropping the oldest pairs first (small single-link chats compress it instead)
+            pinned = {position for position, option in enumerate(options) if option["message_index"] == tracked[-1] and currently_expanded[position]}
+
+        priorities = self._message_priorities(chat_history, entries, query) if self.eviction_policy is not None else None
+        packer = ContextPacker(self.max_tokens, call_overhead, separator_tokens, strategy=self.PACKING_STRATEGY)
+        plan = packer.pack([message["role"] for message in chat_history], costs, options, pinned, remove_pairs=compress, dropped=summarized, priorities=priorities, protected=protected)
+
+        for idx in tracked:
+            history.set_content(idx, base_contents[idx])
+        for position in plan["expanded"]:
+            option = options[position]
+            idx = option["message_index"]
+            history.set_content(idx, self._expand_content(history.content(idx), entries[idx], option["part"]))
+        for position in plan["summarized"]:
+            option = options[position]
+            idx = option["message_index"]
+            history.set_content(idx, self._summarize_content(history.content(idx), entries[idx], option["part"]))
+        for idx in plan["removed"]:
+            history.drop(idx)
+        plan["windowed"] = []
+        if query and self.transcript_window is not None and compress:
+            self._window_transcripts(history, entries, options, plan, priorities, query)
+        if summary_message and chat_history:
+            # Merged into the system prompt: several OpenAI-compatible backends reject or ignore a second system message
+            if chat_history[0]["role"] == "system" and not history.is_dropped(0):
+                history.set_content(0, history.content(0) + "\n\n" + summary_message["content"])
+            else:
+                history.insert_after(-1, summary_message)
 
-                # Check if we're still under the token limit
-                new_tokens = self.count_tokens(expanded_history)
+        # Newly evicted pairs are summarized in the background, the request goes out without waiting
+        evicted = [chat_history[idx] for idx in plan["removed"] if idx not in summarized]
+        if evicted and self.summarizer is not None:
+            self.summarizer.fold_async(evicted, self.model)
 
-                if new_tokens > self.max_tokens:
-                    # Revert the expansion
-                    print(f"[MemoryManager] Cannot expand message {idx} - would exceed token limit ({new_tokens} tokens)")
-                    expanded_history[idx]["content"] = original_content
-                else:
-                    # Keep the expansion
-                    expanded_count += 1
-                    print(f"[MemoryManager] Successfully expanded message {idx} ({current_tokens} → {new_tokens} tokens)")
-                    current_tokens = new_tokens
+        if plan["total_tokens"] > self.max_tokens:
+            print(f"[MemoryManager] WARNING: Context still exceeds token limit after packing!")
+            print(f"[MemoryManager] Current: {plan['total_tokens']}/{self.max_tokens} tokens (still {plan['total_tokens'] - self.max_tokens} tokens over)")
+        self.last_packing_plan = plan
+        return history.materialize()
 
-        print(f"[MemoryManager] Expansion complete: {expanded_count} messages expanded")
-        print(f"[MemoryManager] Token count: {original_tokens} → {current_tokens} (+{current_tokens - original_tokens} tokens)")
+    def _entries_by_position(self, chat_history):
+        """
+        Resolves the tracked YouTube entries to their positions in `chat_history`.
+        ID keys go through the incrementally maintained message index; integer keys are legacy positions.
+        """
+        self._message_index.attach(chat_history)
+        entries = {}
+        for key, entry in self.youtube_messages.items():
+            position = key if isinstance(key, int) else self._message_index.position(key)
+            if position is not None and position < len(chat_history) and self._is_expandable(entry):
+                entries[position] = entry
+        return entries
+
+    def migrate_positional_keys(self, chat_history):
+        """
+        Re-keys entries registered by list position (older sessions) with the ID of the message at that position,
+        giving an ID to the messages that have none. Positions past the end of the history are dropped.
 
-        return expanded_history
+        Args:
+            chat_history: The history the positions refer to
+        """
+        ensure_message_ids(chat_history)
+        for position in [key for key in self.youtube_messages if isinstance(key, int)]:
+            entry = self.youtube_messages.pop(position)
+            if position < len(chat_history):
+                self.youtube_messages[chat_history[position][MESSAGE_ID_KEY]] = entry
 
-    def prepare_messages_for_api(self, chat_history):
+    def optimize_context(self, chat_history, query=None):
         """
-        Prepare messages to be sent to the API by optimizing context.
-        First tries to expand transcripts, then compresses if needed.
+        Optimize the context window by compressing YouTube messages if needed (never expands).
+        Returns an optimized copy of the chat history.
+
+        Args:
+            query (str): The pending user input; the pairs least related to it are evicted first.
 
         Returns:
-            list: The prepared messages for the API call.
+            list: The optimized chat history.
         """
-        print(f"\n[MemoryManager] Preparing messages for API call...")
+        print(f"\n[MemoryManager] Starting context optimization...")
+        return self._pack_context(chat_history, expand=False, query=query)
+
+    def expand_context(self, chat_history):
+        """
+        Expand the context by including full transcripts where possible (never compresses or removes).
+        Returns an expanded copy of the chat history.
+        """
+        print(f"\n[MemoryManager] Starting context expansion...")
+        return self._pack_context(chat_history, compress=False)
 
-        # First try to expand messages with full transcripts
-        expanded = self.expand_context(chat_history)
-        expanded_tokens = self.count_tokens(expanded)
+    def prepare_messages_for_api(self, chat_history, query=None, pending_message=None):
+        """
+        Prepare messages to be sent to the API by packing the context in a single pass:
+        transcripts are expanded while they fit and pairs are dropped only when the links alone do not fit,
+        both in the order given by the eviction policy (most valuable first).
 
-        # Then optimize if we're over the limit
-        if expanded_tokens > self.max_tokens:
-            print(f"[MemoryManager] Expanded context exceeds token limit, compressing...")
-            optimized = self.optimize_context(expanded)
-            final_tokens = self.count_tokens(optimized)
-            print(f"[MemoryManager] Final context: {final_tokens}/{self.max_tokens} tokens ({(final_tokens/self.max_tokens)*100:.1f}%)")
-            print(f"[MemoryManager] YouTube transcripts: {sum(1 for msg in optimized if any(transcript in msg.get('content', '') for transcript in ['transcrição completa do vídeo', 'responda a mensagem do usuário considerando o conteúdo do vídeo']))} included")
-            print(f"[MemoryManager] YouTube links only: {sum(1 for msg in optimized if 'Source:' in msg.get('content', '') and 'youtube' in msg.get('content', ''))}")
-            return optimized
+        A transcript that does not fit even on its own is sent as a window of the chunks most relevant to `query`.
+
+        Args:
+            query (str): The pending user input the history is scored against.
+            pending_message (dict): The message being sent ({"role", "content", "id"}); it is packed with the
+                history (its video may be compressed or windowed) and returned last, never dropped.
 
-        print(f"[MemoryManager] Final context: {expanded_tokens}/{self.max_tokens} tokens ({(expanded_tokens/self.max_tokens)*100:.1f}%)")
-        print(f"[MemoryManager] YouTube transcripts: {sum(1 for msg in expanded if any(transcript in msg.get('content', '') for transcript in ['transcrição completa do vídeo', 'responda a mensagem do usuário considerando o conteúdo do vídeo']))} included")
-        print(f"[MemoryManager] YouTube links only: {sum(1 for msg in expanded if 'Source:' in msg.get('content', '') and 'youtube' in msg.get('content', ''))}")
+        Returns:
+            list: The prepared messages for the API call.
+        """
+        print(f"\n[MemoryManager] Preparing messages for API call...")
+        prepared = self._pack_context(chat_history, query=query, pending=pending_message)
 
-        return expanded
+        final_tokens = self.last_packing_plan["total_tokens"]
+        print(f"[MemoryManager] Final context: {final_tokens}/{self.max_tokens} tokens ({(final_tokens/self.max_tokens)*100:.1f}%)")
+        print(f"[MemoryManager] YouTube transcripts: {sum(1 for msg in prepared if any(transcript in msg.get('content', '') for transcript in ['transcrição completa do vídeo', 'responda a mensagem do usuário considerando o conteúdo do vídeo']))} included")
+        print(f"[MemoryManager] YouTube links only: {sum(1 for msg in prepared if 'Source:' in msg.get('content', '') and 'youtube' in msg.get('content', ''))}")
+        return prepared
 
     def extract_youtube_url(self, message):
         """Extract YouTube URL from a message."""
@@ -355,7 +683,7 @@ class MemoryManager:
 
                     # Register this as a YouTube message with both versions
                     self.register_youtube_message(
-                        idx,
+                        message.get(MESSAGE_ID_KEY, idx),
                         link_version,
                         content,
                         video_title
@@ -373,12 +701,15 @@ class MemoryManager:
             list: The updated chat history with the oldest message pair removed.
         """
         try:
+            # Entries must follow their message, not a position that is about to shift
+            self.migrate_positional_keys(chat_history)
             # Find the first user message
             user_message_index = next((i for i, msg in enumerate(chat_history) if msg['role'] == 'user'), None)
             if user_message_index is not None:
                 user_was_saying = chat_history[user_message_index]['content']
-                # Remove the user message
-                chat_history.pop(user_message_index)
+                # Remove the user message (entries keyed by its ID go with it, other IDs stay valid)
+                removed = chat_history.pop(user_message_index)
+                self.youtube_messages.pop(removed.get(MESSAGE_ID_KEY), None)
                 # Find the corresponding assistant message (now at user_message_index)
                 assistant_message_index = next((i for i in range(user_message_index, len(chat_history)) if chat_history[i]['role'] == 'assistant'), None)
                 if assistant_message_index is not None:
@@ -389,49 +720,10 @@ class MemoryManager:
                 print(f"  User: {user_was_saying[:15]}...")
                 print(f"  Assistant: {assistant_was_saying[:15]}...")
 
-                # Update YouTube message indices after removal
-                self.update_youtube_message_indices_offset(user_message_index)
-
         except Exception as e:
             print(f"[MemoryManager] Something went wrong while removing the oldest message pair: {e}")
         return chat_history
 
-    def update_youtube_message_indices_offset(self, removed_index):
-        """Updates the indices of YouTube messages after one is removed by adjusting all their indices.
-        Since messages are removed in pairs, we just subtract 2 from all indices and pop any negative ones.
-        This function is called after removing the oldest message pair.
-        Args:
-            removed_index (int): The index of the removed message.
-        """
-        # Create a list of current indices to avoid modifying the dict while iterating
-        indices = list(self.youtube_messages.keys())
-
-        # Create a list of (old_index, new_index) adjustments
-        adjustments = []
-        for idx in indices:
-            if idx > removed_index:
-                new_index = idx - 2
-                adjustments.append((idx, new_index))
-            elif idx == removed_index:
-                adjustments.append((idx, None))  # Mark for removal
-
-        # Apply adjustments in reverse order to prevent index shifting conflicts
-        for old_idx, new_idx in sorted(adjustments, key=lambda x: -x[0]):
-            if new_idx is not None:
-                if new_idx in self.youtube_messages:
-                    # Handle collision by appending to existing content (merge if needed)
-                    self.youtube_messages[new_idx].update(self.youtube_messages[old_idx])
-                else:
-                    self.youtube_messages[new_idx] = self.youtube_messages.pop(old_idx)
-            else:
-                self.youtube_messages.pop(old_idx, None)
-
-        # Shift all remaining indices down by 2
-        self.youtube_messages = {(k - 2): v for k, v in self.youtube_messages.items()}
-
-        # Remove any invalid indices that might have gone negative
-        self.youtube_messages = {k: v for k, v in self.youtube_messages.items() if k >= 0}
-
     def get_youtube_messages(self):
         """Returns the stored YouTube messages."""
         return self.youtube_messages
@@ -0,0 +1,91 @@
+import uuid
+
+MESSAGE_ID_KEY = "id"  # key of the stable ID inside every chat message dict
+
+def new_message_id():
+    """Returns a new stable message ID."""
+    return uuid.uuid4().hex[:16]
+
+def ensure_message_ids(messages):
+    """Gives an ID to every message that has none (histories saved before IDs existed). Returns the same list."""
+    for message in messages:
+        if not message.get(MESSAGE_ID_KEY):
+            message[MESSAGE_ID_KEY] = new_message_id()
+    return messages
+
+def strip_message_ids(messages):
+    """Returns the messages without their IDs, as the chat completion API expects them."""
+    return [{key: value for key, value in message.items() if key != MESSAGE_ID_KEY} for message in messages]
+
+class MessageIndex:
+    """
+    ID -> position index over a chat history list.
+
+    The index is maintained incrementally: messages appended since the last lookup are indexed on the
+    next one, and a stored position is checked against the message it points to, so removals or inserts
+    are detected and trigger a single rebuild instead of giving a wrong position. IDs a rebuild did not find
+    (e.g. of a message not appended yet, or evicted) are remembered until the list changes, so looking
+    them up again costs no rebuild.
+    """
+    def __init__(self, messages=None):
+        self.messages = None
+        self._positions = {}  # message id -> position
+        self._indexed = 0  # number of messages already indexed
+        self._missing = set()  # ids not found by the last rebuild
+        self._missing_for = None  # (length, last message id) of the list when they were not found
+        if messages is not None:
+            self.attach(messages)
+
+    def attach(self, messages):
+        """Points the index at a history list (a different list resets it)."""
+        if messages is not self.messages:
+            self.messages = messages
+            self._positions = {}
+            self._indexed = 0
+            self._missing = set()
+            self._missing_for = None
+
+    def _index_from(self, start):
+        for position in range(start, len(self.messages)):
+            message_id = self.messages[position].get(MESSAGE_ID_KEY)
+            if message_id:
+                self._positions[message_id] = position
+        self._indexed = len(self.messages)
+
+    def _signature(self):
+        return len(self.messages), self.messages[-1].get(MESSAGE_ID_KEY) if self.messages else None
+
+    def _valid(self, message_id, position):
+        return position is not None and position < len(self.messages) and self.messages[position].get(MESSAGE_ID_KEY) == message_id
+
+    def position(self, message_id):
+        """Position of the message with `message_id`, or None if it is not in the history."""
+        if self.messages is None:
+            return None
+        position = self._positions.get(message_id)
+        if self._valid(message_id, position):
+            return position
+        if self._indexed < len(self.messages) and (position is None or position >= self._indexed):
+            self._index_from(self._indexed)  # only the new messages
+            position = self._positions.get(message_id)
+            if self._valid(message_id, position):
+                return position
+        signature = self._signature()
+        if self._missing_for != signature:
+            self._missing = set()
+            self._missing_for = signature
+        elif message_id in self._missing:
+            return None  # not found by a rebuild of this same list
+        # The list changed under the index (removed or inserted messages): rebuild once
+        self._positions = {}
+        self._index_from(0)
+        position = self._positions.get(message_id)
+        if self._valid(message_id, position):
+            return position
+        self._missing.add(message_id)
+        return None
+
+    def get(self, message_id):
+        """The message dict with `message_id`, or None."""
+        position = self.position(message_id)
+        return None if position is None else self.messages[position]
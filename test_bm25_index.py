@@ -0,0 +1,37 @@
+import unittest
+from bm25_index import BM25Index
+
+class TestBM25Index(unittest.TestCase):
+    def setUp(self):
+        self.index = BM25Index(chunk_words=6)
+        self.text = "Ele falou da placa RTX 5090 hoje. A placa 4090 é mais barata. Obrigado por assistir o vídeo"
+
+    def test_postings_per_term(self):
+        entry = self.index.add("vid", self.text)
+        self.assertEqual([self.text[start:end] for start, end in entry["spans"]][0], "Ele falou da placa RTX 5090")
+        self.assertIn("5090", entry["vocabulary"])
+        self.assertIn("video", entry["vocabulary"])  # accents stripped
+        self.assertNotIn("da", entry["vocabulary"])  # stop word
+        self.assertIs(self.index.add("vid", self.text), entry)
+
+    def test_scores_rank_exact_terms(self):
+        entry = self.index.add("vid", self.text)
+        scores = self.index.scores(entry, "O que ele disse da RTX 5090?")
+        self.assertEqual(int(scores.argmax()), 0)
+        self.assertEqual(float(scores[2]), 0.0)
+        # A word present in every chunk weighs less than a rare one
+        self.assertGreater(self.index.scores(entry, "5090")[0], self.index.scores(entry, "placa")[0])
+        self.assertFalse(self.index.scores(entry, "nada disso").any())
+
+    def test_entries_per_text_and_eviction(self):
+        self.index.max_videos = 1
+        self.index.add("vid", self.text)
+        self.assertIsNone(self.index.get("vid", "outra transcrição"))
+        self.index.add("other", "the of and")
+        self.assertIsNone(self.index.get("vid"))
+        self.assertFalse(self.index.scores(self.index.get("other"), "the").any())
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Run using: pytest .\test_bm25_index.py -v
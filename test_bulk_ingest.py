@@ -0,0 +1,118 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+import requests
+from bulk_ingest import BulkIngestWorker, StubTranscriptProvider, TokenBucket, expand_source, main, read_video_ids_file
+from transcript_cache import TranscriptCache
+
+VIDEO_IDS = [f"vid{i:08d}" for i in range(6)]
+
+class TestBulkIngest(unittest.TestCase):
+    def setUp(self):
+        self.cache = TranscriptCache(":memory:")
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.temp_dir.name, "checkpoint.json")
+
+    def tearDown(self):
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+    def test_ingests_into_cache(self):
+        worker = BulkIngestWorker(StubTranscriptProvider(words_per_transcript=10), self.cache, max_workers=3, rate_per_second=1000)
+        stats = worker.run(VIDEO_IDS)
+        self.assertEqual(stats["fetched"], len(VIDEO_IDS))
+        self.assertEqual(stats["failed"], 0)
+        self.assertGreater(stats["chars"], 0)
+        entry = self.cache.get(VIDEO_IDS[0], "stub")
+        self.assertEqual(entry["title"], f"Stub video {VIDEO_IDS[0]}")
+
+    def test_resumes_from_checkpoint(self):
+        provider = StubTranscriptProvider(words_per_transcript=10)
+        BulkIngestWorker(provider, self.cache, rate_per_second=1000, checkpoint_path=self.checkpoint).run(VIDEO_IDS[:3])
+        with open(self.checkpoint, "r", encoding="utf-8") as f:
+            self.assertEqual(sorted(json.load(f)["done"]), VIDEO_IDS[:3])
+
+        with patch.object(provider, "download_transcript", wraps=provider.download_transcript) as download:
+            stats = BulkIngestWorker(provider, self.cache, rate_per_second=1000, checkpoint_path=self.checkpoint).run(VIDEO_IDS)
+        self.assertEqual(stats["skipped"], 3)
+        self.assertEqual(stats["fetched"], 3)
+        self.assertEqual(download.call_count, 3)
+
+    def test_failed_videos_are_retried_on_resume(self):
+        provider = MagicMock(cache_language="stub")
+        provider.download_transcript.return_value = ""
+        stats = BulkIngestWorker(provider, self.cache, rate_per_second=1000, checkpoint_path=self.checkpoint).run(VIDEO_IDS[:2])
+        self.assertEqual(stats["failed"], 2)
+
+        stats = BulkIngestWorker(StubTranscriptProvider(10), self.cache, rate_per_second=1000, checkpoint_path=self.checkpoint).run(VIDEO_IDS[:2])
+        self.assertEqual(stats["fetched"], 2)
+        with open(self.checkpoint, "r", encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["failed"], [])
+
+    def test_already_cached_videos_skip_the_provider(self):
+        self.cache.put(VIDEO_IDS[0], "stub", "cached text", "Cached")
+        provider = MagicMock(cache_language="stub")
+        stats = BulkIngestWorker(provider, self.cache, rate_per_second=1000).run(VIDEO_IDS[:1])
+        self.assertEqual(stats["already_cached"], 1)
+        provider.download_transcript.assert_not_called()
+
+    def test_token_bucket_limits_rate(self):
+        bucket = TokenBucket(rate=20, capacity=1)
+        start = time.monotonic()
+        for _ in range(5):
+            bucket.acquire()
+        # First token is free, the next 4 need 1/20s each
+        self.assertGreaterEqual(time.monotonic() - start, 0.18)
+
+    def test_rate_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=0)
+        with self.assertRaises(SystemExit), patch("sys.stderr"):
+            main(["videos.txt", "--rate", "0"])
+
+    def test_duplicate_ids_counted_once(self):
+        worker = BulkIngestWorker(StubTranscriptProvider(words_per_transcript=10), self.cache, rate_per_second=1000)
+        stats = worker.run(VIDEO_IDS[:2] + VIDEO_IDS[:2])
+        self.assertEqual(stats["total"], 2)
+        self.assertEqual(stats["skipped"], 0)
+        self.assertEqual(stats["fetched"], 2)
+
+    def test_unreachable_source_does_not_stop_the_others(self):
+        path = os.path.join(self.temp_dir.name, "ids.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("dQw4w9WgXcQ\n")
+        client = MagicMock()
+        client.get.side_effect = requests.ConnectionError("connection refused")
+        stats = {"fetched": 1, "already_cached": 0, "skipped": 0, "failed": 0, "elapsed_seconds": 0.1, "videos_per_second": 10.0, "chars_per_second": 100.0}
+        with patch("bulk_ingest.get_shared_client", return_value=client), patch("bulk_ingest.BulkIngestWorker") as worker, patch("sys.stdout"):
+            worker.return_value.run.return_value = stats
+            code = main(["https://www.youtube.com/playlist?list=PL1234567890", path, "--stub", "--cache", ":memory:"])
+        worker.return_value.run.assert_called_once_with(["dQw4w9WgXcQ"])
+        self.assertEqual(code, 2)  # the playlist could not be listed
+
+    def test_read_video_ids_file(self):
+        path = os.path.join(self.temp_dir.name, "ids.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("# my list\ndQw4w9WgXcQ\nhttps://youtu.be/9bZkp7q19f0\n\ndQw4w9WgXcQ\nnot an id\n")
+        self.assertEqual(read_video_ids_file(path), ["dQw4w9WgXcQ", "9bZkp7q19f0"])
+
+    def test_expand_playlist_source(self):
+        session = MagicMock()
+        session.get.return_value.text = '{"videoId":"dQw4w9WgXcQ"},{"videoId":"9bZkp7q19f0"},{"videoId":"dQw4w9WgXcQ"}'
+        video_ids = expand_source("https://www.youtube.com/playlist?list=PL1234567890", session=session)
+        self.assertEqual(video_ids, ["dQw4w9WgXcQ", "9bZkp7q19f0"])
+        session.get.assert_called_once_with("https://www.youtube.com/playlist?list=PL1234567890", timeout=(5, 30))
+
+    def test_expand_channel_source(self):
+        session = MagicMock()
+        session.get.return_value.text = '"videoId":"dQw4w9WgXcQ"'
+        self.assertEqual(expand_source("https://www.youtube.com/@somechannel/featured", session=session), ["dQw4w9WgXcQ"])
+        self.assertEqual(session.get.call_args[0][0], "https://www.youtube.com/@somechannel/videos")
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Run using: pytest .\test_bulk_ingest.py -v
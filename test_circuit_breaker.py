@@ -0,0 +1,41 @@
+import unittest
+from unittest.mock import patch
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow_request())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+
+    def test_half_open_allows_single_trial(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10)
+        with patch("circuit_breaker.time.monotonic", return_value=100.0):
+            breaker.record_failure()
+        with patch("circuit_breaker.time.monotonic", return_value=111.0):
+            self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+            self.assertTrue(breaker.allow_request())
+            self.assertFalse(breaker.allow_request())  # only one trial call at a time
+            breaker.record_success()
+            self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_trial_reopens(self):
+        breaker = CircuitBreaker("test", failure_threshold=5, reset_timeout=10)
+        with patch("circuit_breaker.time.monotonic", return_value=100.0):
+            breaker.trip()
+        with patch("circuit_breaker.time.monotonic", return_value=111.0):
+            self.assertTrue(breaker.allow_request())
+            breaker.record_failure()
+            self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_call_fails_fast_when_open(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+        with self.assertRaises(ValueError):
+            breaker.call(lambda: (_ for _ in ()).throw(ValueError("boom")))
+        with self.assertRaises(CircuitOpenError):
+            breaker.call(lambda: "never called")
+
+# Run using: pytest .\test_circuit_breaker.py -v
@@ -0,0 +1,113 @@
+import unittest
+from context_packer import ContextPacker
+
+class TestContextPacker(unittest.TestCase):
+    def setUp(self):
+        # user (video A) / assistant / user (video B) / assistant, every base message costs 10 tokens
+        self.roles = ["user", "assistant", "user", "assistant"]
+        self.costs = [10, 10, 10, 10]
+        self.options = [
+            {"message_index": 0, "tokens": 50, "title": "A"},
+            {"message_index": 2, "tokens": 40, "title": "B"}
+        ]
+
+    def test_greedy_expands_newest_first_and_skips_what_does_not_fit(self):
+        plan = ContextPacker(max_tokens=85).pack(self.roles, self.costs, self.options)
+        self.assertEqual(plan["expanded"], [1])  # B fits (80), A would not
+        self.assertEqual(plan["total_tokens"], 80)
+        self.assertEqual(plan["kept"], [0, 1, 2, 3])
+
+        self.options[1]["tokens"] = 60
+        plan = ContextPacker(max_tokens=95).pack(self.roles, self.costs, self.options)
+        self.assertEqual(plan["expanded"], [0])  # B no longer fits, the older A still does
+        self.assertEqual(plan["total_tokens"], 90)
+
+    def test_knapsack_fills_the_budget(self):
+        options = self.options + [{"message_index": 2, "tokens": 30, "title": "C"}]
+        greedy = ContextPacker(max_tokens=120).pack(self.roles, self.costs, options)
+        knapsack = ContextPacker(max_tokens=120, strategy="knapsack").pack(self.roles, self.costs, options)
+        self.assertEqual(greedy["expanded"], [1, 2])  # C then B: 110 tokens, A no longer fits
+        self.assertEqual(knapsack["expanded"], [0, 2])  # A and C use the whole budget
+        self.assertEqual(knapsack["total_tokens"], 120)
+
+    def test_separators_and_call_overhead_are_counted(self):
+        packer = ContextPacker(max_tokens=100, call_overhead=1, separator_tokens=0.5)
+        self.assertEqual(packer.total(self.costs, [0, 1, 2, 3], self.options, []), 42)
+
+    def test_oldest_pairs_removed_before_pinned_transcript(self):
+        roles = ["system", "user", "assistant", "user", "assistant"]
+        costs = [5, 20, 20, 10, 10]
+        options = [{"message_index": 3, "tokens": 40, "title": "B"}]
+        plan = ContextPacker(max_tokens=70).pack(roles, costs, options, pinned=[0])
+        self.assertEqual(plan["removed"], [1, 2])
+        self.assertEqual(plan["kept"], [0, 3, 4])
+        self.assertEqual(plan["expanded"], [0])
+
+    def test_pinned_transcript_compressed_before_its_message_is_removed(self):
+        plan = ContextPacker(max_tokens=45).pack(self.roles, self.costs, self.options, pinned=[0])
+        self.assertEqual(plan["removed"], [])
+        self.assertEqual(plan["expanded"], [])
+        self.assertEqual(plan["total_tokens"], 40)
+
+    def test_history_kept_when_a_protected_pin_cannot_fit(self):
+        roles = ["system", "user", "assistant", "user", "assistant", "user"]
+        costs = [5, 10, 10, 10, 10, 10]
+        options = [{"message_index": 5, "tokens": 500, "title": "Long"}]
+        plan = ContextPacker(max_tokens=50).pack(roles, costs, options, pinned=[0], protected=[5])
+        self.assertEqual(plan["expanded"], [])
+        self.assertEqual(plan["removed"], [1, 2])  # only the pairs that do not fit beside the compressed transcript
+        self.assertEqual(plan["kept"], [0, 3, 4, 5])
+
+    def test_without_removal_pins_are_kept(self):
+        plan = ContextPacker(max_tokens=45).pack(self.roles, self.costs, self.options, pinned=[0], remove_pairs=False)
+        self.assertEqual(plan["expanded"], [0])
+        self.assertEqual(plan["total_tokens"], 90)
+
+    def test_greedy_falls_back_to_summaries(self):
+        self.options[0]["summary_tokens"] = 15
+        self.options[1]["summary_tokens"] = 10
+        plan = ContextPacker(max_tokens=95).pack(self.roles, self.costs, self.options)
+        self.assertEqual(plan["expanded"], [1])  # B as transcript (80)
+        self.assertEqual(plan["summarized"], [0])  # A does not fit as transcript, its summary does (95)
+        self.assertEqual(plan["total_tokens"], 95)
+
+        plan = ContextPacker(max_tokens=60).pack(self.roles, self.costs, self.options)
+        self.assertEqual(plan["expanded"], [])
+        self.assertEqual(plan["summarized"], [1])  # only the newest summary fits, A stays a link
+        self.assertEqual(plan["total_tokens"], 50)
+
+    def test_knapsack_chooses_one_tier_per_video(self):
+        self.options[0]["summary_tokens"] = 15
+        self.options[1]["summary_tokens"] = 10
+        plan = ContextPacker(max_tokens=100, strategy="knapsack").pack(self.roles, self.costs, self.options)
+        self.assertEqual(plan["expanded"], [0])  # A as transcript and B as summary fill the budget
+        self.assertEqual(plan["summarized"], [1])
+        self.assertEqual(plan["total_tokens"], 100)
+
+    def test_priorities_choose_the_pair_to_evict(self):
+        roles = ["system", "user", "assistant", "user", "assistant", "user", "assistant"]
+        costs = [5, 10, 10, 10, 10, 10, 10]
+        plan = ContextPacker(max_tokens=50).pack(roles, costs, [], priorities=[1, 0.9, 0.1, 0.2, 0.3, 0.8, 0.5])
+        self.assertEqual(plan["removed"], [3, 4])  # the middle pair scores lowest
+        plan = ContextPacker(max_tokens=50).pack(roles, costs, [])
+        self.assertEqual(plan["removed"], [1, 2])  # without priorities the oldest pair goes
+
+    def test_priorities_order_the_transcripts(self):
+        plan = ContextPacker(max_tokens=85).pack(self.roles, self.costs, self.options, priorities=[0.9, 0.5, 0.1, 0.2])
+        self.assertEqual(plan["expanded"], [1])  # A (the relevant one) is offered first but does not fit, B is next
+        plan = ContextPacker(max_tokens=90).pack(self.roles, self.costs, self.options, priorities=[0.9, 0.5, 0.1, 0.2])
+        self.assertEqual(plan["expanded"], [0])
+
+    def test_protected_messages_are_never_removed(self):
+        roles = ["system", "user", "assistant", "user"]
+        plan = ContextPacker(max_tokens=20).pack(roles, [5, 10, 10, 10], [], protected=[3])
+        self.assertEqual(plan["kept"], [0, 3])
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            ContextPacker(100, strategy="random")
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Run using: pytest .\test_context_packer.py -v
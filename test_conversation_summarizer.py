@@ -0,0 +1,60 @@
+import unittest
+from unittest.mock import MagicMock
+from conversation_summarizer import ConversationSummarizer, SUMMARY_MESSAGE_ID
+
+def turns(*ids):
+    return [{"role": "user" if n % 2 == 0 else "assistant", "content": f"message {message_id}", "id": message_id} for n, message_id in enumerate(ids)]
+
+class TestConversationSummarizer(unittest.TestCase):
+    def setUp(self):
+        self.api_handler = MagicMock()
+        self.api_handler.chat_completion_generate.return_value = "O usuário perguntou sobre um vídeo."
+        self.summarizer = ConversationSummarizer(self.api_handler, model="cheap-model")
+
+    def test_fold_in_background_and_pin(self):
+        self.assertIsNone(self.summarizer.summary_message())
+        self.assertEqual(self.summarizer.fold_async(turns("a", "b"), model="chat-model"), 2)
+        self.summarizer.wait()
+
+        message = self.summarizer.summary_message()
+        self.assertEqual(message["id"], SUMMARY_MESSAGE_ID)
+        self.assertIn("O usuário perguntou sobre um vídeo.", message["content"])
+        self.assertEqual(self.summarizer.covered_ids(), {"a", "b"})
+
+        request = self.api_handler.chat_completion_generate.call_args[0][0]
+        self.assertEqual(request["model"], "cheap-model")  # configured summary model wins over the chat model
+        self.assertIn("message a", request["messages"][1]["content"])
+
+    def test_already_covered_messages_are_not_summarized_again(self):
+        self.summarizer.fold_async(turns("a", "b"))
+        self.summarizer.wait()
+        self.assertEqual(self.summarizer.fold_async(turns("a", "b")), 0)
+        self.summarizer.fold_async(turns("a", "b", "c", "d"))
+        self.summarizer.wait()
+        previous_summary_prompt = self.api_handler.chat_completion_generate.call_args[0][0]["messages"][1]["content"]
+        self.assertIn("O usuário perguntou sobre um vídeo.", previous_summary_prompt)  # running summary is folded in
+        self.assertNotIn("message a", previous_summary_prompt)
+        self.assertEqual(self.summarizer.covered_ids(), {"a", "b", "c", "d"})
+
+    def test_failed_summary_leaves_messages_uncovered(self):
+        self.api_handler.chat_completion_generate.return_value = None
+        self.summarizer.fold_async(turns("a", "b"))
+        self.summarizer.wait()
+        self.assertEqual(self.summarizer.covered_ids(), set())
+        self.api_handler.chat_completion_generate.return_value = "Resumo."
+        self.assertEqual(self.summarizer.fold_async(turns("a", "b")), 2)  # retried on the next eviction
+        self.summarizer.wait()
+
+    def test_state_round_trip(self):
+        self.summarizer.fold_async(turns("a", "b"))
+        self.summarizer.wait()
+        restored = ConversationSummarizer(self.api_handler)
+        restored.load(self.summarizer.to_dict())
+        self.assertEqual(restored.covered_ids(), {"a", "b"})
+        restored.clear()
+        self.assertIsNone(restored.summary_message())
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Run using: pytest .\test_conversation_summarizer.py -v
@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+import numpy as np
+from embedding_store import EmbeddingStore
+
+class TestEmbeddingStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.directory, "embeddings.db")
+        self.store = EmbeddingStore(self.db_path)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def vector_files(self):
+        return sorted(name for name in os.listdir(self.directory) if name.endswith(".f16"))
+
+    def test_round_trip_as_float16(self):
+        self.store.put_many("model-a", ["hello", "world"], [[0.5, -1.0, 2.0], [1.0, 0.0, 0.25]])
+        hello, missing, world = self.store.get_many("model-a", ["hello", "unknown", "world"])
+        self.assertIsNone(missing)
+        np.testing.assert_array_equal(hello, [0.5, -1.0, 2.0])
+        np.testing.assert_array_equal(world, [1.0, 0.0, 0.25])
+        self.assertEqual(hello.dtype, np.float32)
+        self.assertEqual(self.store.get_many("model-b", ["hello"]), [None])  # keyed by model too
+        self.assertEqual(os.path.getsize(os.path.join(self.directory, self.vector_files()[0])), 2 * 3 * 2)  # 2 bytes per value
+
+    def test_shared_between_instances(self):
+        self.store.put_many("model-a", ["hello"], [[1.0, 2.0]])
+        other = EmbeddingStore(self.db_path)
+        try:
+            np.testing.assert_array_equal(other.get_many("model-a", ["hello"])[0], [1.0, 2.0])
+            other.put_many("model-a", ["again"], [[3.0, 4.0]])
+            np.testing.assert_array_equal(self.store.get_many("model-a", ["again"])[0], [3.0, 4.0])  # the map grows
+        finally:
+            other.close()
+
+    def test_partial_write_is_overwritten_without_shrinking(self):
+        self.store.put_many("model-a", ["hello"], [[1.0, 2.0]])
+        self.store.get_many("model-a", ["hello"])  # the file is now memory-mapped
+        path = os.path.join(self.directory, self.vector_files()[0])
+        with open(path, "ab") as f:
+            f.write(b"\x01\x02\x03")  # a crashed process left half a row
+        self.store.put_many("model-a", ["again"], [[3.0, 4.0]])
+        np.testing.assert_array_equal(self.store.get_many("model-a", ["again"])[0], [3.0, 4.0])
+        np.testing.assert_array_equal(self.store.get_many("model-a", ["hello"])[0], [1.0, 2.0])
+
+    def test_eviction_and_compaction(self):
+        store = EmbeddingStore(os.path.join(self.directory, "small.db"), max_vectors=2, compact_ratio=0.3, compact_every=1)
+        try:
+            for number in range(4):
+                store.put_many("model-a", [f"text {number}"], [[float(number), 1.0]])
+            self.assertEqual(len(store), 2)
+            self.assertEqual(store.get_many("model-a", ["text 0"]), [None])
+            np.testing.assert_array_equal(store.get_many("model-a", ["text 3"])[0], [3.0, 1.0])
+            files = [name for name in os.listdir(self.directory) if name.startswith("small.") and name.endswith(".f16")]
+            self.assertEqual(len(files), 1)
+            self.assertEqual(os.path.getsize(os.path.join(self.directory, files[0])), 2 * 2 * 2)  # only the live rows are left
+        finally:
+            store.close()
+
+    def test_rag_manager_requests_only_missing_vectors(self):
+        from RAG_Manager import RAGManager
+        api_handler = MagicMock()
+        api_handler.get_embeddings_models.return_value = ["embedder"]
+        api_handler.capabilities = None
+        http = MagicMock()
+        http.post.side_effect = lambda url, headers, json, timeout: MagicMock(status_code=200, json=lambda: {"data": [{"embedding": [float(len(text)), 1.0]} for text in json["input"]]})
+        rag_manager = RAGManager(api_handler=api_handler, http_client=http, embedding_store=self.store)
+
+        first = rag_manager._get_embeddings(["a", "bb"])
+        second = rag_manager._get_embeddings(["bb", "ccc"])
+        self.assertEqual(http.post.call_count, 2)
+        self.assertEqual(http.post.call_args[1]["json"]["input"], ["ccc"])  # "bb" came from the store
+        np.testing.assert_array_equal(second[0], first[1])
+        rag_manager._get_embeddings(["a", "bb", "ccc"])
+        self.assertEqual(http.post.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Run using: pytest .\test_embedding_store.py -v
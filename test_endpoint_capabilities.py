@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+import requests
+from endpoint_capabilities import EndpointCapabilities
+from circuit_breaker import CircuitBreaker
+from AI_Generator import APIHandler
+
+BASE_URL = "https://api.example.com"
+
+class TestEndpointCapabilities(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "capabilities.json")
+        self.capabilities = EndpointCapabilities(self.path, ttl_seconds=60)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_unknown_until_set(self):
+        self.assertIsNone(self.capabilities.get(BASE_URL, "token_counter"))
+        self.capabilities.set(BASE_URL, "token_counter", False)
+        self.assertIs(self.capabilities.get(BASE_URL, "token_counter"), False)
+        self.assertIsNone(self.capabilities.get("https://other.example.com", "token_counter"))
+
+    def test_persisted_per_base_url_with_ttl(self):
+        with patch("endpoint_capabilities.time.time", return_value=1000.0):
+            self.capabilities.set(BASE_URL, "v1_layout", False)
+        with patch("endpoint_capabilities.time.time", return_value=1030.0):
+            self.assertIs(EndpointCapabilities(self.path, ttl_seconds=60).get(BASE_URL, "v1_layout"), False)
+        with patch("endpoint_capabilities.time.time", return_value=1100.0):
+            self.assertIsNone(EndpointCapabilities(self.path, ttl_seconds=60).get(BASE_URL, "v1_layout"))
+            # ...but a result detected during this run holds for the rest of the process
+            self.assertIs(self.capabilities.get(BASE_URL, "v1_layout"), False)
+
+    def test_forget(self):
+        self.capabilities.set(BASE_URL, "embeddings", True)
+        self.capabilities.forget(BASE_URL, "embeddings")
+        self.assertIsNone(self.capabilities.get(BASE_URL, "embeddings"))
+
+class TestAPIHandlerCapabilities(unittest.TestCase):
+    def setUp(self):
+        self.patches = [
+            patch.object(APIHandler, "BASE_URL", BASE_URL),
+            patch.object(APIHandler, "USES_V1", True),
+            patch.object(APIHandler, "capabilities", EndpointCapabilities(path=None)),
+            patch.object(APIHandler, "token_counter_breaker", CircuitBreaker("test", failure_threshold=2)),
+            patch.object(APIHandler, "http", MagicMock()),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_missing_token_counter_is_called_once(self):
+        APIHandler.http.post.return_value = MagicMock(status_code=404)
+        self.assertIsNone(APIHandler.count_tokens("model", "hello"))
+        self.assertIsNone(APIHandler.count_tokens("model", "hello"))
+        APIHandler.http.post.assert_called_once()
+        self.assertIs(APIHandler.capabilities.get(BASE_URL, "token_counter"), False)
+
+    def test_token_counter_breaker_opens_on_connection_errors(self):
+        APIHandler.http.post.side_effect = requests.ConnectionError("refused")
+        for _ in range(4):
+            self.assertIsNone(APIHandler.count_tokens("model", "hello"))
+        self.assertEqual(APIHandler.http.post.call_count, 2)
+        self.assertIsNone(APIHandler.capabilities.get(BASE_URL, "token_counter"))  # unreachable is not unsupported
+
+    def test_fetch_models_remembers_layout(self):
+        def get(url, **kwargs):
+            response = MagicMock()
+            if "/v1/" in url:
+                response.raise_for_status.side_effect = requests.HTTPError("404")
+            else:
+                response.json.return_value = {"data": [{"id": "chat-model"}, {"id": "text-embedding-3"}]}
+            return response
+        APIHandler.http.get.side_effect = get
+
+        self.assertEqual(APIHandler.fetch_models(), ["chat-model"])
+        self.assertFalse(APIHandler.USES_V1)
+        self.assertEqual(APIHandler.http.get.call_count, 2)
+
+        self.assertEqual(APIHandler.fetch_models(), ["chat-model"])
+        self.assertEqual(APIHandler.http.get.call_count, 3)  # known layout: no failed /v1 request first
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Run using: pytest .\test_endpoint_capabilities.py -v
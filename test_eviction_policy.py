@@ -0,0 +1,39 @@
+import unittest
+from unittest.mock import MagicMock
+from eviction_policy import RecencyPolicy, LexicalRelevancePolicy, EmbeddingRelevancePolicy
+
+class TestEvictionPolicy(unittest.TestCase):
+    def setUp(self):
+        self.texts = ["You are a helpful assistant.", "How do I bake sourdough bread?", "Feed the starter and bake hot.", "What is the weather today?", "Sunny and warm."]
+        self.roles = ["system", "user", "assistant", "user", "assistant"]
+
+    def test_recency_policy_scores_by_position(self):
+        self.assertEqual(RecencyPolicy().score_messages(self.texts, self.roles, "bread"), [0.0, 0.25, 0.5, 0.75, 1.0])
+
+    def test_lexical_relevance_beats_recency(self):
+        scores = LexicalRelevancePolicy().score_messages(self.texts, self.roles, "Tell me more about sourdough bread")
+        self.assertGreater(scores[1], scores[3])
+
+    def test_without_query_recency_and_anchors_count(self):
+        scores = LexicalRelevancePolicy().score_messages(self.texts, self.roles, None, anchored=[1])
+        self.assertGreater(scores[1], scores[2])  # the video anchor outweighs one step of recency
+        self.assertLess(scores[2], scores[3])
+
+    def test_embedding_policy_uses_cosine_similarity(self):
+        rag_manager = MagicMock()
+        rag_manager._get_embeddings.return_value = [[1, 0], [0, 1], [1, 0], [0, 1], [1, 1]]
+        scores = EmbeddingRelevancePolicy(rag_manager, recency_weight=0, anchor_weight=0, relevance_weight=1).score_messages(self.texts[1:], self.roles[1:], "query")
+        self.assertAlmostEqual(scores[0], 0.0)
+        self.assertAlmostEqual(scores[1], 1.0)
+        self.assertAlmostEqual(scores[3], 2 ** -0.5)
+
+    def test_embedding_policy_falls_back_to_lexical(self):
+        rag_manager = MagicMock()
+        rag_manager._get_embeddings.return_value = []
+        policy = EmbeddingRelevancePolicy(rag_manager)
+        self.assertEqual(policy.score_messages(self.texts, self.roles, "sourdough bread"), policy.fallback.score_messages(self.texts, self.roles, "sourdough bread"))
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Run using: pytest .\test_eviction_policy.py -v
@@ -0,0 +1,45 @@
+import unittest
+from extractive_summarizer import ExtractiveSummarizer
+
+class TestExtractiveSummarizer(unittest.TestCase):
+    def setUp(self):
+        self.summarizer = ExtractiveSummarizer(ratio=0.3, min_chars=200)
+        topic = [
+            "Python lists keep items in order and grow as needed.",
+            "Python dictionaries map keys to values with fast lookups.",
+            "Lists and dictionaries are the core Python data structures.",
+            "Choosing between lists and dictionaries depends on the lookups you need."
+        ]
+        filler = ["Thanks for watching.", "Hello everyone.", "Please subscribe to the channel for more."]
+        self.sentences = topic + filler
+        self.text = " ".join(sentence for pair in zip(topic, filler + [""]) for sentence in pair if sentence)
+
+    def test_short_text_is_not_summarized(self):
+        self.assertEqual(self.summarizer.summarize("Too short to need a summary."), "")
+
+    def test_topic_sentences_rank_above_filler(self):
+        sentences = self.summarizer.split_sentences(self.text)
+        scores = dict(zip(sentences, self.summarizer.rank_sentences(sentences)))
+        self.assertGreater(min(scores[sentence] for sentence in self.sentences[:4]), max(scores[sentence] for sentence in self.sentences[4:]))
+
+    def test_summary_fits_the_ratio_and_keeps_the_order(self):
+        summary = self.summarizer.summarize(self.text)
+        self.assertLessEqual(len(summary), int(len(self.text) * 0.3))
+        lines = summary.split("\n")
+        self.assertIn("Lists and dictionaries are the core Python data structures.", lines)  # the most central sentence
+        self.assertEqual(lines, sorted(lines, key=self.text.index))
+
+    def test_unpunctuated_captions_are_chunked(self):
+        captions = " ".join(f"word{number % 50}" for number in range(300))
+        chunks = self.summarizer.split_sentences(captions)
+        self.assertEqual(len(chunks), 10)
+        self.assertTrue(all(len(chunk.split()) == 30 for chunk in chunks))
+
+    def test_summaries_are_cached(self):
+        summary = self.summarizer.summarize(self.text)
+        self.assertIs(self.summarizer.summarize(self.text), summary)
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Run using: pytest .\test_extractive_summarizer.py -v
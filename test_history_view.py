@@ -0,0 +1,54 @@
+import unittest
+from history_view import HistoryView
+
+class TestHistoryView(unittest.TestCase):
+    def setUp(self):
+        self.transcript = "a long transcript " * 1000
+        self.history = [
+            {"role": "system", "content": "sys"},
+            {"role": "user", "content": "Source: https://youtu.be/AAAAAAAAAAA"},
+            {"role": "assistant", "content": "About it..."},
+            {"role": "user", "content": "Another question"},
+            {"role": "assistant", "content": "Another answer"}
+        ]
+
+    def test_substitutions_do_not_touch_the_original(self):
+        view = HistoryView(self.history)
+        view.set_content(1, self.transcript)
+        self.assertEqual(view.content(1), self.transcript)
+        self.assertEqual(view.original_content(1), "Source: https://youtu.be/AAAAAAAAAAA")
+        self.assertEqual(self.history[1]["content"], "Source: https://youtu.be/AAAAAAAAAAA")
+        self.assertEqual(view.substitutions, {1: self.transcript})
+
+        view.set_content(1, "Source: https://youtu.be/AAAAAAAAAAA")  # back to the original: nothing recorded
+        self.assertEqual(view.substitutions, {})
+
+    def test_materialize_shares_the_texts(self):
+        view = HistoryView(self.history)
+        view.set_content(1, self.transcript)
+        view.drop(3)
+        view.drop(4)
+        messages = view.materialize()
+
+        self.assertEqual([message["role"] for message in messages], ["system", "user", "assistant"])
+        self.assertIs(messages[1]["content"], self.transcript)
+        self.assertIs(messages[2]["content"], self.history[2]["content"])
+        self.assertEqual(len(view), 3)
+        self.assertEqual(view.indices(), [0, 1, 2])
+        self.assertTrue(view.is_dropped(3))
+
+        messages[2]["content"] = "changed by the caller"
+        self.assertEqual(self.history[2]["content"], "About it...")
+
+    def test_inserted_messages(self):
+        view = HistoryView(self.history[1:])
+        view.insert_after(-1, {"role": "system", "content": "summary"})
+        view.insert_after(0, {"role": "assistant", "content": "extra"})
+        messages = view.materialize()
+        self.assertEqual([message["content"] for message in messages[:3]], ["summary", "Source: https://youtu.be/AAAAAAAAAAA", "extra"])
+        self.assertEqual(len(view), len(messages))
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Run using: pytest .\test_history_view.py -v
@@ -0,0 +1,62 @@
+import unittest
+from unittest.mock import patch
+from http_client import HttpClient, get_shared_client
+
+class TestHttpClient(unittest.TestCase):
+    def setUp(self):
+        self.client = HttpClient(pool_maxsize=4, host_pool_sizes={"www.youtube.com": 8}, timeout=(3, 30))
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_default_timeout_applied(self):
+        with patch.object(self.client.session, "request") as request:
+            self.client.get("https://example.com/a")
+            self.client.post("https://example.com/b", json={}, timeout=(1, 2))
+        self.assertEqual(request.call_args_list[0].kwargs["timeout"], (3, 30))
+        self.assertEqual(request.call_args_list[1].kwargs["timeout"], (1, 2))
+
+    def test_head_does_not_follow_redirects_by_default(self):
+        with patch.object(self.client.session, "request") as request:
+            self.client.head("https://bit.ly/abc")
+        self.assertFalse(request.call_args.kwargs["allow_redirects"])
+
+    def test_host_gets_its_own_pool(self):
+        youtube_adapter = self.client.session.get_adapter("https://www.youtube.com/watch?v=x")
+        default_adapter = self.client.session.get_adapter("https://example.com/")
+        self.assertIsNot(youtube_adapter, default_adapter)
+        self.assertEqual(youtube_adapter._pool_maxsize, 8)
+        self.assertEqual(default_adapter._pool_maxsize, 4)
+
+    def test_new_sessions_share_the_pools(self):
+        other = self.client.new_session()
+        self.client.set_host_pool_size("https://api.example.com/v1", 2)
+        for url in ("https://www.youtube.com/", "https://api.example.com/v1/models", "https://example.com/"):
+            with self.subTest(url=url):
+                self.assertIs(other.get_adapter(url), self.client.session.get_adapter(url))
+
+    def test_one_session_per_thread_and_unused_sessions_are_dropped(self):
+        import gc
+        import threading
+        sessions = []
+        threads = [threading.Thread(target=lambda: sessions.append(self.client.session)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+            thread.join()
+        self.assertIsNot(sessions[0], sessions[1])
+        self.assertIs(self.client.session, self.client.session)
+        self.assertIs(sessions[0].get_adapter("https://example.com/"), self.client.session.get_adapter("https://example.com/"))
+
+        sessions.clear()
+        for _ in range(5):
+            self.client.new_session()
+        gc.collect()
+        self.assertEqual(len(self.client._sessions), 1)  # only this thread's session is still referenced
+
+    def test_shared_client_is_a_singleton(self):
+        self.assertIs(get_shared_client(), get_shared_client())
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Run using: pytest .\test_http_client.py -v
@@ -0,0 +1,35 @@
+import unittest
+import numpy as np
+from local_embedder import LocalEmbedder
+
+class TestLocalEmbedder(unittest.TestCase):
+    def setUp(self):
+        self.embedder = LocalEmbedder(dim=512)
+
+    def test_vectors_are_normalized_and_deterministic(self):
+        vectors = self.embedder.embed(["Paris is the capital of France.", "Ele falou da placa de vídeo"])
+        self.assertEqual(len(vectors), 2)
+        self.assertEqual(vectors[0].shape, (512,))
+        self.assertEqual(vectors[0].dtype, np.float32)
+        self.assertAlmostEqual(float(np.linalg.norm(vectors[0])), 1.0, places=5)
+        # Nothing is fitted: another instance gives the same vectors
+        np.testing.assert_array_equal(LocalEmbedder(dim=512).embed(["Ele falou da placa de vídeo"])[0], vectors[1])
+
+    def test_shared_words_are_closer(self):
+        query, related, unrelated = self.embedder.embed([
+            "What did he say about the RTX 5090?",
+            "He said the RTX 5090 is too expensive and runs hot.",
+            "Today we are cooking a chocolate cake."
+        ])
+        self.assertGreater(float(query @ related), float(query @ unrelated))
+        self.assertGreater(float(query @ related), LocalEmbedder.SCORE_RANGE[0])
+
+    def test_texts_without_words(self):
+        self.assertEqual(self.embedder.embed([]), [])
+        vector = self.embedder.embed(["the of and"])[0]  # stop words only
+        self.assertFalse(np.any(vector))
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Run using: pytest .\test_local_embedder.py -v
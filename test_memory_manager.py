@@ -15,7 +15,8 @@ class TestMemoryManager(unittest.TestCase):
 
     def setUp(self):
         self.api_handler = APIHandler()
-        self.memory_manager = MemoryManager(self.api_handler, max_tokens=1000)
+        # Counts asserted in these tests come from the remote counter (or its len // 4 fallback)
+        self.memory_manager = MemoryManager(self.api_handler, max_tokens=1000, local_estimation=False)
         self.memory_manager.youtube_messages = {}  # Explicitly reset the YouTube messages
 
         # Open a file for logging print statements in append mode
@@ -125,11 +126,48 @@ class TestMemoryManager(unittest.TestCase):
         tokens = self.memory_manager.count_tokens(messages)
         self.assertEqual(tokens, expected_tokens_api)
 
-        # Test fallback when API returns no token_count
+        # Test fallback when API returns no token_count (cached counts would otherwise be reused)
+        self.memory_manager.clear_token_cache()
         with patch.object(self.api_handler, 'count_tokens', return_value={}):
             tokens = self.memory_manager.count_tokens(messages)
             self.assertEqual(tokens, expected_tokens_fallback)
 
+    def test_count_tokens_only_counts_new_messages(self):
+        """Per-message counts are cached, so a longer history only sends the new message to the counter"""
+        def fake_counter(model, prompt):
+            # one token per word plus a start token on every call, the separator counts as one token
+            return {"total_tokens": 1 + len(prompt.split()) + prompt.count("\n\n")}
+
+        messages = [
+            {"role": "user", "content": "Hello, how are you?"},
+            {"role": "assistant", "content": "I'm fine, thank you!"}
+        ]
+        with patch.object(self.api_handler, 'count_tokens', side_effect=fake_counter) as counter:
+            expected = fake_counter(None, "\n\n".join(message["content"] for message in messages))["total_tokens"]
+            self.assertEqual(self.memory_manager.count_tokens(messages), expected)
+            calls_after_first_count = counter.call_count
+
+            self.assertEqual(self.memory_manager.count_tokens(messages), expected)
+            self.assertEqual(counter.call_count, calls_after_first_count)  # served from the cache
+
+            messages.append({"role": "user", "content": "What can you do?"})
+            expected = fake_counter(None, "\n\n".join(message["content"] for message in messages))["total_tokens"]
+            self.assertEqual(self.memory_manager.count_tokens(messages), expected)
+            self.assertEqual(counter.call_count, calls_after_first_count + 1)  # only the new message
+
+    def test_local_estimation_verifies_occasionally(self):
+        """With local estimation only every verify_every-th count reaches the API, and it calibrates the estimator"""
+        memory_manager = MemoryManager(self.api_handler, max_tokens=1000, verify_every=3)
+        memory_manager.token_estimator.calibration_path = None
+        messages = [{"role": "user", "content": "Uma mensagem em português que não é muito curta, para calibrar a estimativa. " * 5}]
+        with patch.object(self.api_handler, 'count_tokens', return_value={"total_tokens": 50}) as counter:
+            memory_manager.count_tokens(messages)  # first count is verified against the API
+            calls_after_verification = counter.call_count
+            for _ in range(3):
+                memory_manager.count_tokens(messages)
+            self.assertEqual(counter.call_count, calls_after_verification)  # local estimates only
+        self.assertIn(f"{memory_manager.model}|pt", memory_manager.token_estimator.ratios)
+
     def test_optimize_context_under_limit(self):
         """Test optimize_context when we know the full transcript fits inside context window"""
 
@@ -371,8 +409,8 @@ class TestMemoryManager(unittest.TestCase):
         # It should now take less space
         self.assertLess(final_token_count, initial_token_count)
 
-    def test_update_youtube_message_indices_offset(self):
-        """Test updating YouTube message indices after removing a message pair"""
+    def test_positional_entries_follow_their_messages(self):
+        """Entries registered by position are keyed by message ID before a pair is removed, so nothing shifts"""
         self.memory_manager = MemoryManager(self.api_handler, max_tokens=2048)
 
         # Register some YouTube messages
@@ -380,10 +418,6 @@ class TestMemoryManager(unittest.TestCase):
         self.memory_manager.register_youtube_message(2, "Source: https://youtube.com/watch?v=456", "Transcript 2", "Video2")
         self.memory_manager.register_youtube_message(4, "Source: https://youtube.com/watch?v=789", "Transcript 3", "Video3")
 
-        youtube_messages_before_removal = self.memory_manager.get_youtube_messages()
-        # assert the 3 indices are 0, 2 and 4
-        self.assertEqual(sorted(list(youtube_messages_before_removal.keys())), [0, 2, 4])
-
         chat_history = [
             {"role": "user", "content": "Message 1 Source: https://youtube.com/watch?v=123"},
             {"role": "assistant", "content": "Response to Message 1"},
@@ -396,11 +430,11 @@ class TestMemoryManager(unittest.TestCase):
         # Remove the oldest message pair
         updated_chat_history = self.memory_manager.remove_oldest_message_pair(chat_history)
 
-        # It should go from 3 to 2 youtube messages
-        self.assertEqual(self.memory_manager.get_youtube_messages_count(), 2)
-        # Check if the indices were correctly shifted from 2 to 0 and 4 to 2
+        # It should go from 3 to 2 youtube messages, now keyed by the IDs of the remaining messages
         youtube_messages = self.memory_manager.get_youtube_messages()
-        self.assertEqual(sorted(youtube_messages.keys()), [0, 2])
+        self.assertEqual(len(youtube_messages), 2)
+        self.assertEqual(youtube_messages[updated_chat_history[0]["id"]]["video_title"], "Video2")
+        self.assertEqual(youtube_messages[updated_chat_history[2]["id"]]["video_title"], "Video3")
 
     def test_9_messages_single_youtube_link(self):
         """
@@ -453,6 +487,218 @@ class TestMemoryManager(unittest.TestCase):
         # Verify token count is now at 283 or less
         self.assertLessEqual(self.memory_manager.count_tokens(optimized), 283)
 
+    def test_multi_video_message_compresses_one_video_at_a_time(self):
+        """Videos registered on the same message are compressed individually, oldest section first"""
+        prefix = "compare these"
+        link_a, link_b = " Fonte: https://youtu.be/AAAAAAAAAAA", " Fonte: https://youtu.be/BBBBBBBBBBB"
+        transcript_a = "\n\n[Vídeo 1/2] " + "alpha words here. " * 40
+        transcript_b = "\n\n[Vídeo 2/2] " + "beta words here. " * 40
+
+        self.memory_manager.register_youtube_message(0, link_a, transcript_a, "Video A", video_id="AAAAAAAAAAA")
+        self.memory_manager.register_youtube_message(0, link_b, transcript_b, "Video B", video_id="BBBBBBBBBBB")
+        entry = self.memory_manager.get_youtube_message(0)
+        self.assertEqual([part["video_id"] for part in entry["videos"]], ["AAAAAAAAAAA", "BBBBBBBBBBB"])
+
+        chat_history = [
+            {"role": "user", "content": prefix + link_a + link_b},
+            {"role": "assistant", "content": "Both are about..."},
+            {"role": "user", "content": "And the second one?"}
+        ]
+
+        with patch.object(self.api_handler, 'count_tokens', return_value={}):
+            # Budget fits one transcript but not both
+            self.memory_manager.max_tokens = (len(prefix + transcript_a + link_b) + 60) // 4
+            prepared = self.memory_manager.prepare_messages_for_api(chat_history)
+
+        # The newest video stays expanded, the oldest is back to its link
+        self.assertEqual(prepared[0]["content"], prefix + link_a + transcript_b)
+        self.assertEqual(chat_history[0]["content"], prefix + link_a + link_b)  # original history untouched
+        self.assertIs(prepared[1]["content"], chat_history[1]["content"])  # unchanged texts are shared, not copied
+
+    def test_prepare_messages_packs_without_counter_calls(self):
+        """The packing plan is built from costs measured up front, local estimation never reaches the API"""
+        memory_manager = MemoryManager(self.api_handler, max_tokens=300)
+        transcripts = ["Transcript number %d of a video. " % number * 20 for number in range(3)]
+        chat_history = []
+        for number, transcript in enumerate(transcripts):
+            link = f"Source: https://youtube.com/watch?v=video{number}"
+            memory_manager.register_youtube_message(len(chat_history), link, transcript, f"Video {number}")
+            chat_history += [{"role": "user", "content": link}, {"role": "assistant", "content": f"About video {number}..."}]
+
+        with patch.object(self.api_handler, 'count_tokens') as counter:
+            prepared = memory_manager.prepare_messages_for_api(chat_history)
+        counter.assert_not_called()
+
+        # Only the newest transcript fits next to the links
+        self.assertEqual([message["content"] for message in prepared[::2]], [chat_history[0]["content"], chat_history[2]["content"], transcripts[2]])
+        self.assertEqual(memory_manager.last_packing_plan["expanded"], [2])
+        self.assertLessEqual(memory_manager.last_packing_plan["total_tokens"], 300)
+
+    def test_older_videos_packed_as_summaries(self):
+        """Transcripts that no longer fit fall back to their extractive summary instead of the bare link"""
+        from concurrent.futures import Future
+        memory_manager = MemoryManager(self.api_handler, max_tokens=300)
+        transcripts = ["Transcript number %d of a video. " % number * 20 for number in range(3)]
+        summaries = [f"Summary {number}. " * 5 for number in range(3)]
+        chat_history = []
+        for number, transcript in enumerate(transcripts):
+            link = f"Source: https://youtube.com/watch?v=video{number}"
+            summary = Future()  # computed at ingest in a worker thread
+            memory_manager.register_youtube_message(len(chat_history), link, transcript, f"Video {number}", summary_version=summary)
+            summary.set_result(summaries[number])
+            chat_history += [{"role": "user", "content": link}, {"role": "assistant", "content": f"About video {number}..."}]
+
+        prepared = memory_manager.prepare_messages_for_api(chat_history)
+        self.assertEqual([message["content"] for message in prepared[::2]], [summaries[0], summaries[1], transcripts[2]])
+        self.assertEqual(memory_manager.last_packing_plan["summarized"], [0, 1])
+        self.assertLessEqual(memory_manager.last_packing_plan["total_tokens"], 300)
+        self.assertEqual(memory_manager.get_youtube_message(0)["summary_version"], summaries[0])
+
+    def test_summary_stored_by_the_preparing_thread(self):
+        """A summary finished in a worker thread does not touch the entry, which may be being saved, until the next preparation"""
+        from concurrent.futures import Future
+        summary = Future()
+        self.memory_manager.register_youtube_message("m1", "Source: link", "transcript", "Video", summary_version=summary)
+        summary.set_result("Summary.")
+        self.assertNotIn("summary_version", self.memory_manager.get_youtube_message("m1"))
+
+        with patch.object(self.api_handler, 'count_tokens', return_value={}):
+            self.memory_manager.prepare_messages_for_api([{"role": "user", "content": "Source: link", "id": "m1"}])
+        self.assertEqual(self.memory_manager.get_youtube_message("m1")["summary_version"], "Summary.")
+
+    def test_eviction_keeps_pairs_related_to_the_question(self):
+        """The default lexical policy evicts the pairs least related to the pending input, RecencyPolicy the oldest"""
+        from eviction_policy import RecencyPolicy
+        topics = ["sourdough bread starter", "football match results", "guitar chord progressions", "tax return deadlines"]
+        chat_history = [{"role": "system", "content": "System message", "id": "sys"}]
+        for number, topic in enumerate(topics):
+            chat_history.append({"role": "user", "content": f"Tell me about {topic}, please.", "id": f"q{number}"})
+            chat_history.append({"role": "assistant", "content": f"Here is what I know about {topic}.", "id": f"a{number}"})
+        query = "Back to the sourdough starter: how often should I feed it?"
+
+        memory_manager = MemoryManager(self.api_handler, max_tokens=50)
+        prepared = memory_manager.prepare_messages_for_api(chat_history, query=query)
+        self.assertIn("q0", [message["id"] for message in prepared])
+        self.assertLessEqual(memory_manager.last_packing_plan["total_tokens"], 50)
+
+        memory_manager = MemoryManager(self.api_handler, max_tokens=50, eviction_policy=RecencyPolicy())
+        prepared = memory_manager.prepare_messages_for_api(chat_history, query=query)
+        self.assertNotIn("q0", [message["id"] for message in prepared])
+
+    def test_oversized_transcript_sent_as_relevant_window(self):
+        """A pending transcript bigger than the whole budget is cut to the chunks relevant to the question"""
+        filler = " ".join(f"Segment {number} talks about cooking pasta and tomato sauce." for number in range(200))
+        transcript = filler + " Here the speaker explains how black holes bend light near the horizon. " + filler
+        intro = "What do they say about black holes?\n\nTranscrição completa:\n\n"
+        transcript_version = intro + transcript + "\n\n Agora, por favor, responda."
+        link_version = "What do they say about black holes? Fonte: https://youtube.com/watch?v=long"
+        memory_manager = MemoryManager(self.api_handler, max_tokens=600)
+        memory_manager.register_youtube_message("pending", link_version, transcript_version, "Long video", video_id="long", transcript_span=(len(intro), len(intro) + len(transcript)))
+        chat_history = [{"role": "system", "content": "System message", "id": "sys"}, {"role": "user", "content": "Hi", "id": "u1"}, {"role": "assistant", "content": "Hello!", "id": "a1"}]
+
+        pending = {"role": "user", "content": transcript_version, "id": "pending"}
+        prepared = memory_manager.prepare_messages_for_api(chat_history, query="What do they say about black holes?", pending_message=pending)
+        self.assertEqual(prepared[-1]["id"], "pending")
+        self.assertIn("black holes bend light", prepared[-1]["content"])
+        self.assertTrue(prepared[-1]["content"].startswith(intro))
+        self.assertTrue(prepared[-1]["content"].endswith("Agora, por favor, responda."))
+        self.assertLess(len(prepared[-1]["content"]), len(transcript_version) // 4)
+        self.assertEqual(memory_manager.last_packing_plan["windowed"], [0])
+        self.assertLessEqual(memory_manager.last_packing_plan["total_tokens"], 600)
+        self.assertEqual(len(chat_history), 3)  # the history itself is not touched
+
+    def test_history_kept_beside_an_oversized_pending_transcript(self):
+        """The pairs dropped while the pending transcript was pinned come back once it is windowed"""
+        filler = " ".join(f"Segment {number} talks about cooking pasta and tomato sauce." for number in range(200))
+        transcript = filler + " Here the speaker explains how black holes bend light near the horizon. " + filler
+        intro = "What do they say about black holes?\n\nTranscrição completa:\n\n"
+        transcript_version = intro + transcript + "\n\n Agora, por favor, responda."
+        link_version = "What do they say about black holes? Fonte: https://youtube.com/watch?v=long"
+        memory_manager = MemoryManager(self.api_handler, max_tokens=600)
+        memory_manager.register_youtube_message("pending", link_version, transcript_version, "Long video", video_id="long", transcript_span=(len(intro), len(intro) + len(transcript)))
+        chat_history = [{"role": "system", "content": "System message", "id": "sys"}]
+        for number in range(4):
+            chat_history.append({"role": "user", "content": f"Question {number}", "id": f"q{number}"})
+            chat_history.append({"role": "assistant", "content": f"Answer {number}", "id": f"a{number}"})
+
+        pending = {"role": "user", "content": transcript_version, "id": "pending"}
+        prepared = memory_manager.prepare_messages_for_api(chat_history, query="What do they say about black holes?", pending_message=pending)
+        self.assertEqual([message["id"] for message in prepared], [message["id"] for message in chat_history] + ["pending"])
+        self.assertIn("black holes bend light", prepared[-1]["content"])
+        self.assertEqual(memory_manager.last_packing_plan["windowed"], [0])
+        self.assertLessEqual(memory_manager.last_packing_plan["total_tokens"], 600)
+
+    def test_youtube_messages_keyed_by_message_id(self):
+        """Entries registered under a message ID follow the message when older pairs are removed"""
+        transcript = "A transcript that fits. " * 10
+        chat_history = [
+            {"role": "system", "content": "System message", "id": "sys"},
+            {"role": "user", "content": "Message 1", "id": "m1"},
+            {"role": "assistant", "content": "Response 1", "id": "r1"},
+            {"role": "user", "content": "Source: https://youtube.com/watch?v=123", "id": "m2"},
+            {"role": "assistant", "content": "Response 2", "id": "r2"}
+        ]
+        self.memory_manager.register_youtube_message("m2", chat_history[3]["content"], transcript, "Video")
+
+        self.memory_manager.remove_oldest_message_pair(chat_history)
+        self.assertEqual(list(self.memory_manager.get_youtube_messages()), ["m2"])  # no offset to fix
+
+        with patch.object(self.api_handler, 'count_tokens', return_value={}):
+            prepared = self.memory_manager.prepare_messages_for_api(chat_history)
+        self.assertEqual(prepared[1]["content"], transcript)
+        self.assertEqual(prepared[1]["id"], "m2")
+
+    def test_process_youtube_message_registers_every_video_by_id(self):
+        validator = MagicMock()
+        metadata = {
+            "video_title": "A | B",
+            "videos": [
+                {"video_id": "AAAAAAAAAAA", "video_title": "A", "link_version": " Fonte: a", "transcript_version": "\n\ntranscript A"},
+                {"video_id": "BBBBBBBBBBB", "video_title": "B", "link_version": " Fonte: b", "transcript_version": "\n\ntranscript B"}
+            ]
+        }
+        validator.process_message_with_link.return_value = ("compare Fonte: a Fonte: b", "compare\n\ntranscript A\n\ntranscript B", metadata)
+        validator.take_summary.return_value = None
+        memory_manager = MemoryManager(self.api_handler, user_input_validator=validator)
+
+        message_to_store, message_to_send, youtube_metadata = memory_manager.process_youtube_message("m1", "compare a b")
+        self.assertEqual(message_to_store, "compare Fonte: a Fonte: b")
+        self.assertIs(youtube_metadata, metadata)
+        self.assertEqual([entry["video_id"] for entry in memory_manager.get_youtube_message("m1")["videos"]], ["AAAAAAAAAAA", "BBBBBBBBBBB"])
+
+    def test_migrate_positional_keys(self):
+        chat_history = [{"role": "system", "content": "sys", "id": "sys"}, {"role": "user", "content": "link", "id": "m1"}]
+        self.memory_manager.register_youtube_message(1, "link", "transcript", "Video")
+        self.memory_manager.migrate_positional_keys(chat_history)
+        self.assertEqual(list(self.memory_manager.get_youtube_messages()), ["m1"])
+
+    def test_evicted_pairs_are_replaced_by_the_summary(self):
+        """Pairs dropped to fit are summarized off the send path, then left out in favour of the summary in the system prompt"""
+        from conversation_summarizer import ConversationSummarizer
+        summarizer_api = MagicMock()
+        summarizer_api.chat_completion_generate.return_value = "Resumo curto."
+        memory_manager = MemoryManager(self.api_handler, max_tokens=60, summarizer=ConversationSummarizer(summarizer_api))
+        chat_history = [{"role": "system", "content": "System message", "id": "sys"}]
+        for number in range(4):
+            chat_history.append({"role": "user", "content": f"Question {number} " * 10, "id": f"q{number}"})
+            chat_history.append({"role": "assistant", "content": f"Answer {number} " * 10, "id": f"a{number}"})
+
+        prepared = memory_manager.prepare_messages_for_api(chat_history)
+        evicted = [message["id"] for message in chat_history if message["id"] not in {m["id"] for m in prepared}]
+        self.assertTrue(evicted)
+        memory_manager.summarizer.wait()
+        self.assertEqual(memory_manager.summarizer.covered_ids(), set(evicted))
+
+        prepared = memory_manager.prepare_messages_for_api(chat_history)
+        self.assertEqual(prepared[0]["id"], "sys")
+        self.assertTrue(prepared[0]["content"].startswith("System message"))
+        self.assertIn("Resumo curto.", prepared[0]["content"])  # merged: a single system message
+        self.assertEqual([message["role"] for message in prepared].count("system"), 1)
+        self.assertEqual(chat_history[0]["content"], "System message")
+        self.assertFalse(set(evicted) & {message["id"] for message in prepared})
+        self.assertLessEqual(memory_manager.last_packing_plan["total_tokens"], 60)
+        self.assertEqual(summarizer_api.chat_completion_generate.call_count, 1)  # nothing new to summarize
+
 # Run using: pytest .\test_memory_manager.py -v
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
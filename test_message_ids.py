@@ -0,0 +1,63 @@
+import unittest
+from unittest.mock import patch
+from message_ids import MessageIndex, ensure_message_ids, new_message_id, strip_message_ids
+
+class TestMessageIds(unittest.TestCase):
+    def setUp(self):
+        self.history = ensure_message_ids([
+            {"role": "system", "content": "sys"},
+            {"role": "user", "content": "same text"},
+            {"role": "assistant", "content": "answer"},
+            {"role": "user", "content": "same text"}
+        ])
+
+    def test_ids_are_unique_and_kept(self):
+        ids = [message["id"] for message in self.history]
+        self.assertEqual(len(set(ids)), 4)
+        ensure_message_ids(self.history)
+        self.assertEqual([message["id"] for message in self.history], ids)
+        self.assertNotEqual(new_message_id(), new_message_id())
+
+    def test_strip_message_ids(self):
+        stripped = strip_message_ids(self.history)
+        self.assertEqual(stripped[1], {"role": "user", "content": "same text"})
+        self.assertIn("id", self.history[1])  # the history keeps them
+
+    def test_index_tracks_appends_and_removals(self):
+        index = MessageIndex(self.history)
+        last_id = self.history[3]["id"]
+        self.assertEqual(index.position(last_id), 3)  # identical texts are told apart
+
+        appended = ensure_message_ids([{"role": "assistant", "content": "new"}])[0]
+        self.history.append(appended)
+        self.assertEqual(index.position(appended["id"]), 4)
+
+        removed = self.history.pop(1)
+        self.history.pop(1)
+        self.assertEqual(index.position(last_id), 1)
+        self.assertEqual(index.position(appended["id"]), 2)
+        self.assertIsNone(index.position(removed["id"]))
+        self.assertIs(index.get(appended["id"]), appended)
+
+    def test_missing_ids_rebuild_once_per_list_change(self):
+        index = MessageIndex(self.history)
+        index.position(self.history[0]["id"])  # indexes the history
+        with patch.object(index, "_index_from", wraps=index._index_from) as rebuild:
+            self.assertIsNone(index.position("not-appended-yet"))
+            self.assertIsNone(index.position("not-appended-yet"))
+            self.assertEqual(rebuild.call_count, 1)
+
+            self.history.append({"role": "user", "content": "pending", "id": "not-appended-yet"})
+            self.assertEqual(index.position("not-appended-yet"), 4)
+
+    def test_attach_to_another_history(self):
+        index = MessageIndex(self.history)
+        other = ensure_message_ids([{"role": "system", "content": "other"}])
+        index.attach(other)
+        self.assertEqual(index.position(other[0]["id"]), 0)
+        self.assertIsNone(index.position(self.history[0]["id"]))
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Run using: pytest .\test_message_ids.py -v
@@ -0,0 +1,143 @@
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+import numpy as np
+import requests
+from RAG_Manager import RAGManager
+
+class TestRAGManagerScoring(unittest.TestCase):
+    def setUp(self):
+        api_handler = MagicMock()
+        api_handler.get_embeddings_models.return_value = ["embedder"]
+        api_handler.capabilities = None
+        self.rag_manager = RAGManager(api_handler=api_handler, http_client=MagicMock(), embedding_store=MagicMock())
+        self.rag_manager.debug = False
+        # "cats" chunks point along the query, "dogs" chunks are close to it, the rest orthogonal
+        vectors = {"cats": [3.0, 0.0], "dogs": [0.9, 0.1]}
+        self.rag_manager._get_embeddings = MagicMock(side_effect=lambda texts: [
+            np.asarray(next((vector for word, vector in vectors.items() if word in text), [0.0, 1.0]), dtype=np.float32) for text in texts
+        ])
+
+    def test_normalize_score_scalar_and_array(self):
+        self.assertIsInstance(self.rag_manager.normalize_score(0.85), float)
+        self.assertAlmostEqual(self.rag_manager.normalize_score(0.85), 0.5, places=5)
+        np.testing.assert_allclose(self.rag_manager.normalize_score(np.array([0.5, 0.85, 1.2])), [0.0, 0.5, 1.0], atol=1e-6)
+
+    def test_top_k_threshold_and_order(self):
+        scores = np.array([0.2, 0.9, 0.5, 0.95, 0.4], dtype=np.float32)
+        self.assertEqual(list(RAGManager.top_k(scores, 0.4)), [3, 1, 2, 4])
+        self.assertEqual(list(RAGManager.top_k(scores, 0.4, k=2)), [3, 1])
+        self.assertEqual(list(RAGManager.top_k(scores, 0.99)), [])
+
+    def test_relevant_context_best_chunks_first(self):
+        contexts = ["birds sing", "dogs bark", "cats purr"]
+        context = self.rag_manager.get_relevant_context("cats", contexts)
+        self.assertLess(context.index("cats purr"), context.index("dogs bark"))
+        self.assertNotIn("birds sing", context)
+        self.assertEqual(self.rag_manager._get_embeddings.call_count, 2)  # the chunks in one request, then the query
+
+        limited = self.rag_manager.get_relevant_context("cats", contexts, top_k=1)
+        self.assertIn("cats purr", limited)
+        self.assertNotIn("dogs bark", limited)
+
+class TestRAGManagerHybrid(unittest.TestCase):
+    def setUp(self):
+        api_handler = MagicMock()
+        api_handler.get_embeddings_models.return_value = ["embedder"]
+        api_handler.capabilities = None
+        self.rag_manager = RAGManager(api_handler=api_handler, http_client=MagicMock(), embedding_store=MagicMock())
+        self.rag_manager.vector_index.chunk_words = self.rag_manager.bm25_index.chunk_words = 10
+        # The embeddings only know about graphics cards in general, not which one
+        self.rag_manager._get_embeddings = MagicMock(side_effect=lambda texts: [
+            np.asarray([1.0, 0.0] if any(word in text for word in ("rtx", "RTX", "cards")) else [0.0, 1.0], dtype=np.float32) for text in texts
+        ])
+        self.transcript = (
+            "today we talk about the new graphics cards from nvidia "
+            "the rtx 4090 was fast but very expensive last year "
+            "the rtx 5090 is hot and even more expensive now "
+            "thanks for watching and see you next time"
+        )
+
+    def test_exact_terms_break_embedding_ties(self):
+        self.rag_manager.index_transcript("vid", self.transcript).result()
+        spans, scores = self.rag_manager.rank_chunks("vid", self.transcript, "what about the RTX 5090?")
+        self.assertEqual(len(spans), 4)
+        self.assertEqual(int(np.argmax(scores)), 2)
+        self.assertTrue(np.all((scores >= 0) & (scores <= 1)))
+        context = self.rag_manager.get_relevant_context("what about the RTX 5090?", [self.transcript], video_id="vid", top_k=1)
+        self.assertIn("rtx 5090", context)
+
+    def test_bm25_alone_while_embeddings_are_missing_or_slow(self):
+        spans, scores = self.rag_manager.rank_chunks("vid", self.transcript, "5090")
+        self.assertEqual(list(scores), [0.0, 0.0, 1.0, 0.0])  # not indexed at ingest: lexical only, embeddings started
+        self.assertIsNotNone(self.rag_manager.vector_index.add("vid", self.transcript))  # waits for that indexing
+
+        embed = self.rag_manager._get_embeddings.side_effect
+        self.rag_manager._get_embeddings.side_effect = lambda texts: time.sleep(0.5) or embed(texts)
+        self.rag_manager.QUERY_EMBEDDING_TIMEOUT = 0.05
+        spans, scores = self.rag_manager.rank_chunks("vid", self.transcript, "5090")
+        self.assertEqual(list(scores), [0.0, 0.0, 1.0, 0.0])
+
+    def test_bm25_alone_when_the_embedding_request_fails(self):
+        self.rag_manager.index_transcript("vid", self.transcript).result()
+        self.rag_manager.embedding_store.get_many.side_effect = lambda model, texts: [None] * len(texts)
+        del self.rag_manager._get_embeddings  # the real request for the query
+        self.rag_manager.http.post.side_effect = requests.ConnectionError("connection refused")
+        spans, scores = self.rag_manager.rank_chunks("vid", self.transcript, "5090")
+        self.assertEqual(list(scores), [0.0, 0.0, 1.0, 0.0])
+        self.assertEqual(self.rag_manager.model, "embedder")  # a network error is not a reason to switch models
+
+        self.rag_manager.vector_index.scores = MagicMock(side_effect=requests.Timeout("read timed out"))
+        spans, scores = self.rag_manager.rank_chunks("vid", self.transcript, "5090")
+        self.assertEqual(list(scores), [0.0, 0.0, 1.0, 0.0])
+
+class TestRAGManagerOffline(unittest.TestCase):
+    def setUp(self):
+        api_handler = MagicMock()
+        api_handler.get_embeddings_models.return_value = []
+        api_handler.capabilities = None
+        self.http = MagicMock()
+        self.rag_manager = RAGManager(api_handler=api_handler, http_client=self.http, embedding_store=MagicMock())
+
+    def test_local_embedder_without_embedding_model(self):
+        self.assertEqual(self.rag_manager.model, self.rag_manager.local_embedder.name)
+        self.assertTrue(self.rag_manager.vector_index.available())
+        context = self.rag_manager.get_relevant_context("capital of France", [
+            "Paris is the capital of France.",
+            "I love pudim!!"
+        ])
+        self.assertIn("Paris is the capital of France.", context)
+        self.assertNotIn("pudim", context)
+        self.http.post.assert_not_called()
+        self.rag_manager.embedding_store.put_many.assert_not_called()
+
+    def test_missing_endpoint_switches_to_local_embedder(self):
+        api_handler = MagicMock()
+        api_handler.get_embeddings_models.return_value = ["embedder"]
+        api_handler.capabilities = None
+        self.http.post.return_value = MagicMock(status_code=404, text="not found")
+        store = MagicMock()
+        store.get_many.side_effect = lambda model, texts: [None] * len(texts)
+        rag_manager = RAGManager(api_handler=api_handler, http_client=self.http, embedding_store=store)
+        self.assertEqual(rag_manager.model, "embedder")
+
+        vectors = rag_manager._get_embeddings(["some text"])
+        self.assertEqual(rag_manager.model, rag_manager.local_embedder.name)
+        np.testing.assert_array_equal(vectors[0], rag_manager.local_embedder.embed(["some text"])[0])
+
+    def test_embedding_store_opened_on_first_use(self):
+        api_handler = MagicMock()
+        api_handler.get_embeddings_models.return_value = ["embedder"]
+        api_handler.capabilities = None
+        with patch("RAG_Manager.EmbeddingStore") as store_class:
+            rag_manager = RAGManager(api_handler=api_handler, http_client=self.http)
+            store_class.assert_not_called()  # no embedding_cache.db just for starting the app
+            store_class.return_value.get_many.side_effect = lambda model, texts: [np.ones(2, dtype=np.float32)] * len(texts)
+            rag_manager._get_embeddings(["some text"])
+            rag_manager._get_embeddings(["other text"])
+        store_class.assert_called_once_with()
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Run using: pytest .\test_rag_manager.py -v
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+from token_estimator import TokenEstimator, detect_language
+
+ENGLISH_TEXT = "This is what you have to know about the thing that they would say with you. " * 10
+PORTUGUESE_TEXT = "Você não sabe como isso está ficando mais difícil para uma pessoa que também trabalha. " * 10
+
+class TestTokenEstimator(unittest.TestCase):
+    def setUp(self):
+        self.estimator = TokenEstimator(calibration_path=None, vocab_path=None)
+
+    def test_uncalibrated_matches_old_fallback(self):
+        texts = ["Hello, how are you?", "I'm fine, thank you!", "What can you do?"]
+        self.assertEqual(self.estimator.count("model", texts), len("\n\n".join(texts)) // 4)
+
+    def test_detect_language(self):
+        self.assertEqual(detect_language(ENGLISH_TEXT), "en")
+        self.assertEqual(detect_language(PORTUGUESE_TEXT), "pt")
+        self.assertEqual(detect_language("12345 !!!"), "other")
+
+    def test_calibrate_learns_ratio_per_model_and_language(self):
+        self.estimator.calibrate("model-a", PORTUGUESE_TEXT, len(PORTUGUESE_TEXT) // 3)
+        self.assertAlmostEqual(self.estimator.chars_per_token("model-a", "pt"), 3.0, places=1)
+        self.assertEqual(self.estimator.chars_per_token("model-a", "en"), 4.0)
+        self.assertEqual(self.estimator.chars_per_token("model-b", "pt"), 4.0)
+        self.assertAlmostEqual(self.estimator.count("model-a", [PORTUGUESE_TEXT]), len(PORTUGUESE_TEXT) / 3, delta=2)
+
+    def test_calibration_is_a_running_average(self):
+        self.estimator.calibrate("model", ENGLISH_TEXT, len(ENGLISH_TEXT) // 2)
+        self.estimator.calibrate("model", ENGLISH_TEXT, len(ENGLISH_TEXT) // 4)
+        ratio = self.estimator.chars_per_token("model", "en")
+        self.assertTrue(2.0 < ratio < 4.0)
+
+    def test_short_samples_are_ignored(self):
+        self.estimator.calibrate("model", "short text", 1)
+        self.assertEqual(self.estimator.ratios, {})
+
+    def test_observe_usage(self):
+        request = {"model": "model", "messages": [{"role": "user", "content": ENGLISH_TEXT}]}
+        self.estimator.observe_usage(request, {"prompt_tokens": len(ENGLISH_TEXT) // 5 + 4, "completion_tokens": 10})
+        self.assertAlmostEqual(self.estimator.chars_per_token("model", "en"), 5.0, places=1)
+
+    def test_calibration_is_persisted(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "calibration.json")
+            TokenEstimator(calibration_path=path, vocab_path=None).calibrate("model", ENGLISH_TEXT, len(ENGLISH_TEXT) // 5)
+            reloaded = TokenEstimator(calibration_path=path, vocab_path=None)
+            self.assertAlmostEqual(reloaded.chars_per_token("model", "en"), 5.0, places=1)
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Run using: pytest .\test_token_estimator.py -v
@@ -0,0 +1,94 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from transcript_cache import TranscriptCache
+
+class TestTranscriptCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = TranscriptCache(":memory:")
+
+    def tearDown(self):
+        self.cache.close()
+
+    def test_put_and_get(self):
+        self.cache.put("abc123def45", "en,pt", "hello world", "Some Title")
+        entry = self.cache.get("abc123def45", "en,pt")
+        self.assertIsNotNone(entry)
+        self.assertEqual(entry["transcript"], "hello world")
+        self.assertEqual(entry["title"], "Some Title")
+
+    def test_miss_on_other_language(self):
+        self.cache.put("abc123def45", "en,pt", "hello world", "Some Title")
+        self.assertIsNone(self.cache.get("abc123def45", "pt"))
+
+    def test_empty_transcript_not_cached(self):
+        self.cache.put("abc123def45", "en,pt", "", "Some Title")
+        self.assertIsNone(self.cache.get("abc123def45", "en,pt"))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_ttl_expiration(self):
+        cache = TranscriptCache(":memory:", ttl_seconds=60)
+        with patch("transcript_cache.time.time", return_value=1000.0):
+            cache.put("abc123def45", "en,pt", "hello world", "Some Title")
+        with patch("transcript_cache.time.time", return_value=1030.0):
+            self.assertIsNotNone(cache.get("abc123def45", "en,pt"))
+        with patch("transcript_cache.time.time", return_value=1100.0):
+            self.assertIsNone(cache.get("abc123def45", "en,pt"))
+        self.assertEqual(len(cache), 0)
+        cache.close()
+
+    def test_lru_eviction_by_size(self):
+        cache = TranscriptCache(":memory:", ttl_seconds=None, max_size_bytes=25)
+        with patch("transcript_cache.time.time", return_value=1000.0):
+            cache.put("video000001", "en", "a" * 10)
+        with patch("transcript_cache.time.time", return_value=1001.0):
+            cache.put("video000002", "en", "b" * 10)
+        # Touch the first video so the second becomes the least recently used
+        with patch("transcript_cache.time.time", return_value=1002.0):
+            self.assertIsNotNone(cache.get("video000001", "en"))
+        with patch("transcript_cache.time.time", return_value=1003.0):
+            cache.put("video000003", "en", "c" * 10)
+
+        self.assertIsNotNone(cache.get("video000001", "en"))
+        self.assertIsNone(cache.get("video000002", "en"))
+        self.assertIsNotNone(cache.get("video000003", "en"))
+        self.assertLessEqual(cache.total_size(), 25)
+        cache.close()
+
+    def test_invalidate(self):
+        self.cache.put("abc123def45", "en", "hello")
+        self.cache.put("abc123def45", "pt", "olá")
+        self.cache.invalidate("abc123def45", "en")
+        self.assertIsNone(self.cache.get("abc123def45", "en"))
+        self.assertIsNotNone(self.cache.get("abc123def45", "pt"))
+        self.cache.invalidate("abc123def45")
+        self.assertEqual(len(self.cache), 0)
+
+    def test_segments_stored_with_transcript(self):
+        self.cache.put("abc123def45", "en", "hello", segments=b"timings")
+        self.assertEqual(self.cache.get("abc123def45", "en")["segments"], b"timings")
+        self.cache.put("abc123def45", "pt", "olá")
+        self.assertIsNone(self.cache.get("abc123def45", "pt")["segments"])
+
+    def test_adds_segments_column_to_old_database(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_path = os.path.join(temp_dir, "old.db")
+            conn = sqlite3.connect(db_path)
+            conn.execute(
+                "CREATE TABLE transcripts (video_id TEXT NOT NULL, language TEXT NOT NULL, title TEXT, transcript TEXT NOT NULL, "
+                "fetched_at REAL NOT NULL, last_access REAL NOT NULL, size INTEGER NOT NULL, PRIMARY KEY (video_id, language))"
+            )
+            conn.execute("INSERT INTO transcripts VALUES ('abc123def45', 'en', 'Old', 'old text', ?, ?, 8)", (time.time(), time.time()))
+            conn.commit()
+            conn.close()
+
+            cache = TranscriptCache(db_path)
+            entry = cache.get("abc123def45", "en")
+            self.assertEqual(entry["transcript"], "old text")
+            self.assertIsNone(entry["segments"])
+            cache.close()
+
+# Run using: pytest .\test_transcript_cache.py -v
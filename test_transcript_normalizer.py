@@ -0,0 +1,57 @@
+import unittest
+from transcript_normalizer import TranscriptNormalizer
+
+def normalize(snippets, **kwargs):
+    normalizer = TranscriptNormalizer(**kwargs)
+    return list(normalizer.normalize(snippets)), normalizer
+
+def snippet(text, start, duration=2.0):
+    return {"text": text, "start": start, "duration": duration}
+
+class TestTranscriptNormalizer(unittest.TestCase):
+    def test_merges_rolling_caption_overlap(self):
+        segments, _ = normalize([snippet("so today we are", 0), snippet("today we are going to", 1), snippet("going to talk.", 2)])
+        self.assertEqual([segment["text"] for segment in segments], ["so today we are going to talk."])
+
+    def test_single_shared_word_is_not_treated_as_overlap(self):
+        segments, _ = normalize([snippet("and I said yes", 0), snippet("yes we can.", 10)])
+        self.assertEqual([segment["text"] for segment in segments], ["and I said yes", "yes we can."])
+
+    def test_drops_noise_markers_and_fillers(self):
+        segments, _ = normalize([snippet("[Music]", 0), snippet("♪ ♪", 1), snippet("uh hello [Applause] there.", 2)])
+        self.assertEqual([segment["text"] for segment in segments], ["hello there."])
+
+    def test_collapses_repeated_phrases(self):
+        segments, _ = normalize([snippet("I mean I mean it is is is is fine.", 0)])
+        self.assertEqual(segments[0]["text"], "I mean it is fine.")
+
+    def test_keeps_legitimate_repeats_and_brackets(self):
+        text = "it was very very good, no no no, bye bye [sic] [2019] [inaudible name] (Música) [ Aplausos ]."
+        segments, _ = normalize([snippet(text, 0)])
+        self.assertEqual(segments[0]["text"], "it was very very good, no no no, bye bye [sic] [2019] [inaudible name] .")
+
+    def test_joins_lines_into_sentences_with_timestamps(self):
+        segments, _ = normalize([snippet("first part", 0), snippet("of a sentence.", 2), snippet("Second one.", 4, 3.0)])
+        self.assertEqual(segments[0], {"text": "first part of a sentence.", "start": 0.0, "duration": 4.0})
+        self.assertEqual(segments[1], {"text": "Second one.", "start": 4.0, "duration": 3.0})
+
+    def test_long_pause_and_size_limit_split_segments(self):
+        segments, _ = normalize([snippet("before the pause", 0), snippet("after the pause", 30)])
+        self.assertEqual(len(segments), 2)
+        lines = [" ".join(f"word{i}x{j}" for j in range(10)) for i in range(5)]
+        segments, _ = normalize([snippet(line, i * 2) for i, line in enumerate(lines)], max_sentence_chars=150)
+        self.assertTrue(all(len(segment["text"]) <= 250 for segment in segments))
+        self.assertGreater(len(segments), 1)
+
+    def test_reports_savings(self):
+        _, normalizer = normalize([snippet("[Music]", 0), snippet("hello there", 1), snippet("hello there friend.", 2)])
+        summary = normalizer.summary()
+        self.assertEqual(summary["segments_in"], 3)
+        self.assertEqual(summary["segments_out"], 1)
+        self.assertGreater(summary["chars_saved"], 0)
+        self.assertEqual(summary["tokens_saved_estimate"], summary["chars_saved"] // 4)
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Run using: pytest .\test_transcript_normalizer.py -v
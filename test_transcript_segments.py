@@ -0,0 +1,56 @@
+import unittest
+from transcript_segments import TranscriptSegments
+
+SNIPPETS = [
+    {"text": "intro music", "start": 0.0, "duration": 4.0},
+    {"text": "welcome back", "start": 4.0, "duration": 3.0},
+    {"text": "today we talk", "start": 600.0, "duration": 5.0},
+    {"text": "about arrays", "start": 605.0, "duration": 5.0},
+    {"text": "thanks for watching", "start": 900.0, "duration": 2.0},
+]
+
+class TestTranscriptSegments(unittest.TestCase):
+    def setUp(self):
+        self.segments = TranscriptSegments.from_snippets(SNIPPETS)
+
+    def test_text_matches_text_formatter_layout(self):
+        self.assertEqual(self.segments.text, "\n".join(snippet["text"] for snippet in SNIPPETS))
+        self.assertEqual(len(self.segments), 5)
+        self.assertEqual(self.segments.segment(2), (600.0, 5.0, "today we talk"))
+        self.assertEqual(self.segments.duration, 902.0)
+
+    def test_slice_by_time(self):
+        window = self.segments.slice_by_time(600, 900)
+        self.assertEqual(window.text, "today we talk\nabout arrays")
+        self.assertEqual(list(window.starts), [600.0, 605.0])
+        self.assertEqual(window.segment(1), (605.0, 5.0, "about arrays"))
+
+    def test_slice_by_time_skips_segment_that_already_ended(self):
+        self.assertEqual(self.segments.slice_by_time(7.5, 601).text, "today we talk")
+        self.assertEqual(self.segments.slice_by_time(5, 6).text, "welcome back")
+        self.assertEqual(len(self.segments.slice_by_time(950, 1000)), 0)
+
+    def test_slice_by_chars_returns_whole_segments(self):
+        start = self.segments.text.index("we talk")
+        window = self.segments.slice_by_chars(start, start + 12)
+        self.assertEqual(window.text, "today we talk\nabout arrays")
+        self.assertEqual(self.segments.time_at_char(start), 600.0)
+        self.assertIsNone(self.segments.time_at_char(len(self.segments.text)))
+
+    def test_clean_is_applied_per_segment(self):
+        segments = TranscriptSegments.from_snippets([{"text": "<b>hi", "start": 0, "duration": 1}], clean=lambda text: text.replace("<b>", ""))
+        self.assertEqual(segments.text, "hi")
+
+    def test_bytes_round_trip(self):
+        restored = TranscriptSegments.from_bytes(self.segments.text, self.segments.to_bytes())
+        self.assertEqual(list(restored), list(self.segments))
+
+    def test_from_bytes_rejects_mismatched_text(self):
+        self.assertIsNone(TranscriptSegments.from_bytes(self.segments.text + "!", self.segments.to_bytes()))
+        self.assertIsNone(TranscriptSegments.from_bytes(self.segments.text, None))
+        self.assertIsNone(TranscriptSegments.from_bytes(self.segments.text, b"garbage"))
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Run using: pytest .\test_transcript_segments.py -v
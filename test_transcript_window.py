@@ -0,0 +1,62 @@
+import unittest
+from unittest.mock import MagicMock
+from transcript_segments import TranscriptSegments
+from transcript_window import TranscriptWindow, format_timestamp, ELISION, WINDOW_HEADER
+from RAG_Manager import RAGManager
+
+def word_costs(texts):
+    """One token per word, one per line break"""
+    return [float(len(text.split())) for text in texts], 1.0
+
+class TestTranscriptWindow(unittest.TestCase):
+    def setUp(self):
+        topics = ["intro music with warm greetings", "the history of roman empire", "how volcanoes erupt with lava", "closing thoughts and final goodbye"]
+        # One 6-word caption per 30 seconds, 4 captions per topic, 2 captions per chunk
+        self.snippets = [{"text": f"{topics[i // 4]} part{i}", "start": 30.0 * i, "duration": 30.0} for i in range(16)]
+        self.segments = TranscriptSegments.from_snippets(self.snippets)
+        self.transcript = self.segments.text
+        self.window = TranscriptWindow(chunk_words=12)
+
+    def test_format_timestamp(self):
+        self.assertEqual(format_timestamp(75), "[1:15]")
+        self.assertEqual(format_timestamp(3725.5), "[1:02:05]")
+
+    def test_chunks_carry_their_timestamps(self):
+        chunks = self.window.chunks(self.transcript, self.segments)
+        self.assertEqual(len(chunks), 8)
+        self.assertEqual([chunk["time"] for chunk in chunks[:3]], [0.0, 60.0, 120.0])
+        self.assertTrue(all(chunk["time"] is None for chunk in self.window.chunks(self.transcript)))
+
+    def test_relevant_chunks_in_chronological_order(self):
+        window = self.window.build(self.transcript, "Why do volcanoes erupt?", 60, word_costs, self.segments)
+        lines = window.split("\n")
+        self.assertEqual(lines[0], WINDOW_HEADER)
+        self.assertEqual(lines[1], ELISION)  # the beginning was left out
+        self.assertTrue(lines[2].startswith("[4:00] how volcanoes erupt"))
+        self.assertTrue(lines[3].startswith("[5:00] how volcanoes erupt"))
+        self.assertEqual(lines[-1], ELISION)
+        self.assertNotIn("roman", window)
+
+    def test_nothing_fits(self):
+        self.assertEqual(self.window.build(self.transcript, "volcanoes", 5, word_costs), "")
+
+    def test_indexed_embeddings_rank_the_chunks(self):
+        api_handler = MagicMock()
+        api_handler.get_embeddings_models.return_value = ["embedder"]
+        api_handler.capabilities = None
+        rag_manager = RAGManager(api_handler=api_handler, http_client=MagicMock(), embedding_store=MagicMock())
+        rag_manager._get_embeddings = MagicMock(side_effect=lambda texts: [[1.0, 0.0] if "roman" in text or text == "anything" else [0.0, 1.0] for text in texts])
+        rag_manager.vector_index.chunk_words = rag_manager.bm25_index.chunk_words = 12
+        window = TranscriptWindow(rag_manager)
+        window.index_transcript("vid", self.transcript).result()  # at ingest
+        for _ in range(2):
+            text = window.build(self.transcript, "anything", 60, word_costs, video_id="vid")
+            self.assertIn("roman", text)
+            self.assertNotIn("volcanoes", text)
+        # Chunks embedded once, then one request per question
+        self.assertEqual(rag_manager._get_embeddings.call_count, 3)
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Run using: pytest .\test_transcript_window.py -v
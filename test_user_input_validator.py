@@ -2,10 +2,12 @@ import pytest
 from pytest_mock import mocker
 import pytest
 from user_input_validator import UserInputValidator
+from transcript_cache import TranscriptCache
 
 @pytest.fixture
 def validator():
-    return UserInputValidator()
+    # In-memory cache: the tests must not write nor read a transcript_cache.db left in the working directory
+    return UserInputValidator(transcript_cache=TranscriptCache(":memory:"))
 
 @pytest.fixture
 def valid_url():
@@ -63,6 +65,114 @@ def test_message_with_url(validator):
     assert "url" in youtube_metadata
     assert "video_id" in youtube_metadata
 
+def test_cached_transcript_skips_network(mocker):
+    from transcript_cache import TranscriptCache
+    cache = TranscriptCache(":memory:")
+    validator = UserInputValidator(transcript_cache=cache)
+    cache.put("Vjm8j0UCqVc", validator.youtube_downloader.cache_language, "cached transcript text", "Cached Title")
+    mocker.patch.object(validator.youtube_downloader, 'get_video_id', return_value="Vjm8j0UCqVc")
+    get_title = mocker.patch.object(validator.youtube_downloader, 'get_video_title')
+    download = mocker.patch.object(validator.youtube_downloader, 'download_transcript')
+
+    message_to_store, message_to_send, youtube_metadata = validator.process_message_with_link("https://www.youtube.com/watch?v=Vjm8j0UCqVc")
+
+    get_title.assert_not_called()
+    download.assert_not_called()
+    assert youtube_metadata["video_title"] == "Cached Title"
+    assert "cached transcript text" in message_to_send
+
+def test_title_and_transcript_fetched_concurrently(mocker):
+    import time
+    from transcript_cache import TranscriptCache
+    validator = UserInputValidator(transcript_cache=TranscriptCache(":memory:"))
+
+    def slow_title(video_id):
+        time.sleep(0.3)
+        return "Slow Title"
+
+    def slow_transcript(video_id):
+        time.sleep(0.3)
+        return "slow transcript text"
+
+    mocker.patch.object(validator.youtube_downloader, 'get_video_title', side_effect=slow_title)
+    mocker.patch.object(validator.youtube_downloader, 'download_transcript', side_effect=slow_transcript)
+
+    start = time.monotonic()
+    _, message_to_send, youtube_metadata = validator.process_message_with_link("https://youtu.be/Vjm8j0UCqVc")
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 0.55  # both fetches overlap instead of adding up
+    assert youtube_metadata["video_title"] == "Slow Title"
+    assert "slow transcript text" in message_to_send
+
+def test_title_failure_does_not_block_transcript(mocker):
+    from transcript_cache import TranscriptCache
+    validator = UserInputValidator(transcript_cache=TranscriptCache(":memory:"), title_timeout=0.2)
+    mocker.patch.object(validator.youtube_downloader, 'get_video_title', side_effect=RuntimeError("boom"))
+    mocker.patch.object(validator.youtube_downloader, 'download_transcript', return_value="transcript text")
+
+    _, message_to_send, youtube_metadata = validator.process_message_with_link("https://youtu.be/Vjm8j0UCqVc")
+
+    assert youtube_metadata is not None
+    assert youtube_metadata["video_title"] == "Desconhecido"
+    assert "transcript text" in message_to_send
+
+def test_message_with_multiple_links(mocker):
+    from transcript_cache import TranscriptCache
+    validator = UserInputValidator(transcript_cache=TranscriptCache(":memory:"), max_concurrent_videos=2)
+    titles = {"AAAAAAAAAAA": "Video A", "BBBBBBBBBBB": "Video B", "CCCCCCCCCCC": "Video C"}
+    mocker.patch.object(validator.youtube_downloader, 'get_video_title', side_effect=lambda video_id: titles[video_id])
+    mocker.patch.object(validator.youtube_downloader, 'download_transcript', side_effect=lambda video_id: f"transcript of {video_id}")
+
+    message = ("compare https://youtu.be/AAAAAAAAAAA with https://www.youtube.com/watch?v=BBBBBBBBBBB "
+               "and https://youtube.com/shorts/CCCCCCCCCCC please, also https://example.com/page")
+    message_to_store, message_to_send, youtube_metadata = validator.process_message_with_link(message)
+
+    videos = youtube_metadata["videos"]
+    assert [video["video_id"] for video in videos] == ["AAAAAAAAAAA", "BBBBBBBBBBB", "CCCCCCCCCCC"]
+    assert message_to_store == youtube_metadata["link_version"]
+    assert message_to_send == youtube_metadata["transcript_version"]
+    for video in videos:
+        assert video["transcript_version"] in message_to_send
+        assert video["link_version"] in message_to_store
+        assert f"transcript of {video['video_id']}" in video["transcript_version"]
+    # Each section can be swapped on its own
+    partially_compressed = message_to_send.replace(videos[0]["transcript_version"], videos[0]["link_version"])
+    assert "transcript of AAAAAAAAAAA" not in partially_compressed
+    assert "transcript of BBBBBBBBBBB" in partially_compressed
+    assert "https://example.com/page" in message_to_store
+
+def test_slow_video_does_not_hold_the_others(mocker):
+    import time
+    validator = UserInputValidator(transcript_cache=TranscriptCache(":memory:"), max_concurrent_videos=2)
+    delays = {"AAAAAAAAAAA": 0.6, "BBBBBBBBBBB": 0.2, "CCCCCCCCCCC": 0.2}
+    mocker.patch.object(validator.youtube_downloader, 'get_video_title', side_effect=lambda video_id: f"Video {video_id[0]}")
+    mocker.patch.object(validator.youtube_downloader, 'download_transcript', side_effect=lambda video_id: time.sleep(delays[video_id]) or f"transcript of {video_id}")
+
+    start = time.monotonic()
+    _, _, youtube_metadata = validator.process_message_with_link(
+        "https://youtu.be/AAAAAAAAAAA https://youtu.be/BBBBBBBBBBB https://youtu.be/CCCCCCCCCCC"
+    )
+    elapsed = time.monotonic() - start
+
+    assert len(youtube_metadata["videos"]) == 3
+    assert elapsed < 0.75  # C starts as soon as B is done instead of waiting for A (batches: 0.6 + 0.2)
+
+def test_summary_kept_out_of_the_metadata(mocker):
+    import json
+    summarizer = mocker.Mock()
+    summarizer.summarize.return_value = "resumo curto"
+    validator = UserInputValidator(transcript_cache=TranscriptCache(":memory:"), extractive_summarizer=summarizer)
+    mocker.patch.object(validator.youtube_downloader, 'get_video_title', return_value="Video")
+    mocker.patch.object(validator.youtube_downloader, 'download_transcript', return_value="transcript text")
+
+    _, _, youtube_metadata = validator.process_message_with_link("https://youtu.be/Vjm8j0UCqVc")
+
+    json.dumps(youtube_metadata)  # only serializable values
+    summary = validator.take_summary(youtube_metadata["transcript_version"])
+    assert "resumo curto" in summary.result(timeout=5)
+    assert validator.take_summary(youtube_metadata["transcript_version"]) is None
+
 # Additional tests for edge cases and negative scenarios
 def test_empty_message(validator):
     empty_message = ""
@@ -0,0 +1,56 @@
+import unittest
+from unittest.mock import MagicMock
+import numpy as np
+from vector_index import VideoVectorIndex
+
+class TestVideoVectorIndex(unittest.TestCase):
+    def setUp(self):
+        self.rag_manager = MagicMock()
+        self.rag_manager.model = "embedder"
+        # Two dimensions: "cats" and everything else
+        self.rag_manager._get_embeddings.side_effect = lambda texts: [[1.0, 0.0] if "cats" in text else [0.0, 2.0] for text in texts]
+        self.index = VideoVectorIndex(self.rag_manager, chunk_words=3, batch_size=2)
+        self.text = "dogs bark loud cats purr softly birds sing songs"
+
+    def test_chunks_embedded_once_in_batches(self):
+        entry = self.index.add("vid", self.text)
+        self.assertEqual(entry["matrix"].shape, (3, 2))
+        self.assertEqual(entry["matrix"].dtype, np.float32)
+        self.assertTrue(entry["matrix"].flags["C_CONTIGUOUS"])
+        self.assertEqual([self.text[start:end] for start, end in entry["spans"]], ["dogs bark loud", "cats purr softly", "birds sing songs"])
+        self.assertEqual(self.rag_manager._get_embeddings.call_count, 2)  # 3 chunks in batches of 2
+
+        self.assertIs(self.index.add("vid", self.text), entry)
+        scores = self.index.scores(entry, "tell me about cats")
+        self.assertEqual(list(np.round(scores, 3)), [0.0, 1.0, 0.0])
+        self.assertEqual(self.rag_manager._get_embeddings.call_count, 3)  # only the query
+
+    def test_entries_are_per_model_and_text(self):
+        self.index.add("vid", self.text)
+        self.assertIsNone(self.index.get("vid", "another transcript"))
+        self.rag_manager.model = "other-embedder"
+        self.assertIsNone(self.index.get("vid"))
+
+    def test_background_indexing_is_shared(self):
+        future = self.index.add_async("vid", self.text)
+        entry = self.index.add("vid", self.text)
+        self.assertIs(future.result(), entry)
+        self.assertEqual(self.rag_manager._get_embeddings.call_count, 2)
+
+    def test_without_embeddings_nothing_is_indexed(self):
+        self.rag_manager._get_embeddings.side_effect = lambda texts: []
+        self.assertIsNone(self.index.add("vid", self.text))
+        self.rag_manager.model = None
+        self.assertFalse(self.index.available())
+
+    def test_least_recently_used_videos_are_dropped(self):
+        self.index.max_videos = 1
+        self.index.add("first", self.text)
+        self.index.add("second", self.text)
+        self.assertIsNone(self.index.get("first"))
+        self.assertIsNotNone(self.index.get("second"))
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Run using: pytest .\test_vector_index.py -v
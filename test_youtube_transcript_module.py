@@ -1,6 +1,9 @@
 import unittest
 from unittest.mock import patch, Mock, MagicMock
 from youtube_transcript_module import YouTubeTranscriptDownloader
+from youtube_transcript_api import TranscriptsDisabled, RequestBlocked
+from transcript_cache import TranscriptCache
+from circuit_breaker import CircuitBreaker
 import requests
 
 class TestYouTubeTranscriptDownloader(unittest.TestCase):
@@ -33,29 +36,86 @@ class TestYouTubeTranscriptDownloader(unittest.TestCase):
             with self.subTest(url=url):
                 self.assertIsNone(self.downloader.get_video_id(url))
 
+    @patch('http_client.HttpClient.head')
+    def test_get_video_id_youtube_shapes_offline(self, mock_head):
+        test_cases = [
+            ("https://m.youtube.com/watch?v=DQmfRx5TD1o", "DQmfRx5TD1o"),
+            ("https://music.youtube.com/watch?v=DQmfRx5TD1o&list=RDAMVM", "DQmfRx5TD1o"),
+            ("https://www.youtube.com/shorts/DQmfRx5TD1o", "DQmfRx5TD1o"),
+            ("https://www.youtube.com/live/DQmfRx5TD1o?si=abc", "DQmfRx5TD1o"),
+            ("https://youtu.be/DQmfRx5TD1o?t=42", "DQmfRx5TD1o"),
+            ("www.youtube.com/watch?v=DQmfRx5TD1o", "DQmfRx5TD1o"),
+            ("https://www.youtube.com/watch?v=", None),
+            ("https://example.com/watch?v=DQmfRx5TD1o", None),
+        ]
+        for url, expected_id in test_cases:
+            with self.subTest(url=url):
+                self.assertEqual(self.downloader.get_video_id(url), expected_id)
+        mock_head.assert_not_called()  # canonical and non-YouTube URLs never touch the network
+
+    @patch('http_client.HttpClient.head')
+    def test_get_video_id_redirect_is_cached(self, mock_head):
+        mock_head.return_value.url = "https://www.youtube.com/watch?v=DQmfRx5TD1o"
+        self.assertEqual(self.downloader.get_video_id("https://bit.ly/abc123"), "DQmfRx5TD1o")
+        self.assertEqual(self.downloader.get_video_id("https://bit.ly/abc123"), "DQmfRx5TD1o")
+        mock_head.assert_called_once()
+
     # Test get_video_title method
-    @patch('requests.get')
+    @patch('http_client.HttpClient.get')
     def test_get_video_title_success(self, mock_get):
         mock_response = Mock()
-        mock_response.text = '<title>Perk Machines and Paychecks The Illusion of Progress in Life - YouTube</title>'
+        mock_response.iter_content.return_value = [b'<title>Perk Machines and Paychecks The Illusion of Progress in Life - YouTube</title>']
         mock_get.return_value = mock_response
         title = self.downloader.get_video_title("-F38ApPZ5q8")
         self.assertEqual(title, "Perk Machines and Paychecks The Illusion of Progress in Life")
 
-    @patch('requests.get')
+    @patch('http_client.HttpClient.get')
     def test_get_video_title_request_exception(self, mock_get):
         mock_get.side_effect = requests.RequestException("Connection error")
         title = self.downloader.get_video_title("invalid_id")
         self.assertEqual(title, "Desconhecido")
 
-    @patch('requests.get')
+    @patch('http_client.HttpClient.get')
     def test_get_video_title_no_title_found(self, mock_get):
         mock_response = Mock()
-        mock_response.text = "<html><body>No title here</body></html>"
+        mock_response.iter_content.return_value = [b"<html><body>No title here</body></html>"]
         mock_get.return_value = mock_response
         title = self.downloader.get_video_title("invalid_id")
         self.assertEqual(title, "Desconhecido")
 
+    @patch('http_client.HttpClient.get')
+    def test_get_video_metadata_stops_reading_early(self, mock_get):
+        chunks = [
+            b'<html><head><title>Some Video - YouTube</title>',
+            b'<meta itemprop="duration" content="PT1H2M3S"><span itemprop="author">',
+            b'<link itemprop="name" content="Some Channel"></span>',
+            b'x' * 1024 * 1024,  # the rest of the page should never be read
+        ]
+        consumed = []
+
+        def iter_content(chunk_size):
+            for chunk in chunks:
+                consumed.append(chunk)
+                yield chunk
+
+        mock_response = Mock()
+        mock_response.iter_content.side_effect = iter_content
+        mock_get.return_value = mock_response
+
+        metadata = self.downloader.get_video_metadata("abcdefghijk")
+        self.assertEqual(metadata, {"title": "Some Video", "channel": "Some Channel", "duration_seconds": 3723})
+        self.assertEqual(len(consumed), 3)
+        mock_response.close.assert_called_once()
+
+    @patch('http_client.HttpClient.get')
+    def test_get_video_metadata_multibyte_split_across_chunks(self, mock_get):
+        page = '<title>Reação à música - YouTube</title>'.encode("utf-8")
+        split = page.index("ç".encode("utf-8")) + 1  # in the middle of the two bytes of "ç"
+        mock_response = Mock()
+        mock_response.iter_content.return_value = [page[:split], page[split:]]
+        mock_get.return_value = mock_response
+        self.assertEqual(self.downloader.get_video_metadata("abcdefghijk")["title"], "Reação à música")
+
     # Test download_transcript method
     def test_download_transcript_en_exists(self):
         transcript = self.downloader.download_transcript("-F38ApPZ5q8")
@@ -65,12 +125,68 @@ class TestYouTubeTranscriptDownloader(unittest.TestCase):
         transcript = self.downloader.download_transcript("DQmfRx5TD1o")
         self.assertTrue(len(transcript) > 100)
 
-    @patch('youtube_transcript_api.YouTubeTranscriptApi.list_transcripts')
+    @patch('youtube_transcript_api.YouTubeTranscriptApi.list')
     def test_download_transcript_no_transcript(self, mock_list_transcripts):
         mock_list_transcripts.side_effect = Exception("No transcript found")
         transcript = self.downloader.download_transcript("invalid_id")
         self.assertEqual(transcript, "")
 
+    @patch('youtube_transcript_api.YouTubeTranscriptApi.list')
+    def test_download_transcript_negative_cache(self, mock_list_transcripts):
+        downloader = YouTubeTranscriptDownloader(cache=TranscriptCache(":memory:"), transcript_breaker=CircuitBreaker("test"))
+        mock_list_transcripts.side_effect = TranscriptsDisabled("abcdefghijk")
+        self.assertEqual(downloader.download_transcript("abcdefghijk"), "")
+        self.assertEqual(downloader.download_transcript("abcdefghijk"), "")
+        mock_list_transcripts.assert_called_once()  # second lookup served by the negative cache
+        self.assertEqual(downloader.cache.get_negative("abcdefghijk", downloader.cache_language), "no_transcript")
+
+    @patch('youtube_transcript_api.YouTubeTranscriptApi.list')
+    def test_download_transcript_rate_limit_opens_breaker(self, mock_list_transcripts):
+        breaker = CircuitBreaker("test", reset_timeout=60)
+        downloader = YouTubeTranscriptDownloader(transcript_breaker=breaker)
+        mock_list_transcripts.side_effect = RequestBlocked("abcdefghijk")
+        self.assertEqual(downloader.download_transcript("abcdefghijk"), "")
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(downloader.download_transcript("zyxwvutsrqp"), "")
+        mock_list_transcripts.assert_called_once()  # fails fast while throttled
+
+    @patch.object(YouTubeTranscriptDownloader._fetch_transcript.retry, 'sleep')
+    @patch('youtube_transcript_api.YouTubeTranscriptApi.list')
+    def test_download_transcript_retries_transient_errors(self, mock_list_transcripts, _):
+        downloader = YouTubeTranscriptDownloader(transcript_breaker=CircuitBreaker("test"))
+        mock_list_transcripts.side_effect = requests.ConnectionError("connection reset")
+        self.assertEqual(downloader.download_transcript("abcdefghijk"), "")
+        self.assertEqual(mock_list_transcripts.call_count, 3)
+
+    @patch('youtube_transcript_api.YouTubeTranscriptApi.list')
+    def test_download_transcript_keeps_segment_timings(self, mock_list_transcripts):
+        downloader = YouTubeTranscriptDownloader(
+            cache=TranscriptCache(":memory:"), transcript_breaker=CircuitBreaker("test"), normalize_transcripts=False
+        )
+        mock_list_transcripts.return_value.find_generated_transcript.return_value.fetch.return_value = [
+            {"text": "<Speaker>hello [00:00:01]", "start": 0.0, "duration": 2.0},
+            {"text": "world", "start": 2.0, "duration": 3.5},
+        ]
+        self.assertEqual(downloader.download_transcript("abcdefghijk"), "hello \nworld")
+
+        segments = downloader.get_transcript_segments("abcdefghijk", allow_download=False)
+        self.assertEqual(list(segments.starts), [0.0, 2.0])
+        self.assertEqual(segments.text_between(2.0, 5.0), "world")
+        mock_list_transcripts.assert_called_once()
+
+    @patch('youtube_transcript_api.YouTubeTranscriptApi.list')
+    def test_download_transcript_normalizes_auto_captions(self, mock_list_transcripts):
+        downloader = YouTubeTranscriptDownloader(transcript_breaker=CircuitBreaker("test"))
+        mock_list_transcripts.return_value.find_generated_transcript.return_value.fetch.return_value = [
+            {"text": "[Music]", "start": 0.0, "duration": 3.0},
+            {"text": "so today we are", "start": 3.0, "duration": 2.0},
+            {"text": "we are going to talk", "start": 4.0, "duration": 2.0},
+            {"text": "about arrays.", "start": 6.0, "duration": 2.0},
+        ]
+        self.assertEqual(downloader.download_transcript("abcdefghijk"), "so today we are going to talk about arrays.")
+        segments = downloader.get_transcript_segments("abcdefghijk", allow_download=False)
+        self.assertEqual(segments.segment(0)[:2], (3.0, 5.0))
+
     # Test save_transcript method
     @patch('youtube_transcript_module.open', new_callable=MagicMock)
     @patch('youtube_transcript_module.YouTubeTranscriptDownloader.get_video_title')
@@ -96,7 +212,7 @@ class TestYouTubeTranscriptDownloader(unittest.TestCase):
         transcript = self.downloader.download_transcript("invalid_id_123")
         self.assertEqual(transcript, "")
 
-    @patch('youtube_transcript_api.YouTubeTranscriptApi.list_transcripts')
+    @patch('youtube_transcript_api.YouTubeTranscriptApi.list')
     def test_download_transcript_language_not_found(self, mock_list_transcripts):
         mock_list_transcripts.return_value.find_generated_transcript.side_effect = Exception("Language not available")
         transcript = self.downloader.download_transcript("test_id")
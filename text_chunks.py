@@ -0,0 +1,12 @@
+import re
+
+def word_chunk_spans(text, max_tokens=512):
+    """
+    Character spans of consecutive runs of `max_tokens` words (one word counted as one token), so callers
+    can map a chunk back to its position in the text (e.g. to a transcript timestamp).
+
+    Returns:
+        list: (start, end) character offsets of every chunk in `text`.
+    """
+    words = [match.span() for match in re.finditer(r'\S+', text)]
+    return [(words[i][0], words[min(i + max_tokens, len(words)) - 1][1]) for i in range(0, len(words), max_tokens)]
@@ -0,0 +1,168 @@
+import json
+import os
+import re
+import threading
+
+try:
+    from tokenizers import Tokenizer  # optional: exact counts from a BPE vocabulary file
+except ImportError:
+    Tokenizer = None
+
+DEFAULT_CHARS_PER_TOKEN = 4.0  # same rule as the old len(text) // 4 fallback
+TEMPLATE_TOKENS_PER_MESSAGE = 4  # role/turn markers the chat template adds to every message
+MIN_CALIBRATION_CHARS = 200  # shorter samples are too noisy to learn from
+CALIBRATION_WEIGHT = 0.2  # weight of a new observation in the running ratio
+
+PORTUGUESE_MARKERS = re.compile(r'\b(?:que|não|uma|para|com|você|está|isso|mais|como|também)\b|ção|ões|[ãõâêç]', re.IGNORECASE)
+ENGLISH_MARKERS = re.compile(r"\b(?:the|and|that|with|you|this|have|what|from|they|would|it's)\b", re.IGNORECASE)
+
+def detect_language(text):
+    """
+    Very small language guess used to pick a chars-per-token ratio ("pt", "en" or "other").
+    Only looks at the first few thousand characters.
+    """
+    sample = text[:4000]
+    portuguese = len(PORTUGUESE_MARKERS.findall(sample))
+    english = len(ENGLISH_MARKERS.findall(sample))
+    if not portuguese and not english:
+        return "other"
+    return "pt" if portuguese >= english else "en"
+
+class BPETokenizer:
+    """Exact token counts from a Hugging Face tokenizer.json (needs the optional `tokenizers` package)."""
+    def __init__(self, vocab_path):
+        self.tokenizer = Tokenizer.from_file(vocab_path)
+
+    def count(self, text):
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+
+class TokenEstimator:
+    """
+    Local token counter, so budgeting the context window does not need a network call.
+
+    Uses a BPE vocabulary file when one is available; otherwise estimates with a chars-per-token ratio
+    learned per model and language. The ratios are calibrated from real counts: the `usage` field of
+    chat completion responses and occasional checks against the remote token counter.
+    """
+    def __init__(self, calibration_path="token_calibration.json", vocab_path="tokenizer.json"):
+        """
+        Initialize the estimator.
+
+        Args:
+            calibration_path (str): JSON file where learned ratios are kept between sessions (None to keep them in memory only).
+            vocab_path (str): tokenizer.json to use for exact counts, if the file exists and `tokenizers` is installed.
+        """
+        self.calibration_path = calibration_path
+        self._lock = threading.Lock()
+        self.ratios = {}  # "model|language" -> chars per token
+        self.samples = {}  # "model|language" -> number of observations
+        self.bpe = None
+
+        if vocab_path and Tokenizer is not None and os.path.exists(vocab_path):
+            try:
+                self.bpe = BPETokenizer(vocab_path)
+                print(f"[TokenEstimator] Using BPE vocabulary from {vocab_path}")
+            except Exception as e:
+                print(f"[TokenEstimator] Could not load {vocab_path}: {e}")
+        self._load()
+
+    def _load(self):
+        if not self.calibration_path or not os.path.exists(self.calibration_path):
+            return
+        try:
+            with open(self.calibration_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.ratios = {key: float(value) for key, value in data.get("ratios", {}).items()}
+            self.samples = {key: int(value) for key, value in data.get("samples", {}).items()}
+        except (OSError, ValueError) as e:
+            print(f"[TokenEstimator] Could not read {self.calibration_path}: {e}")
+
+    def _save_locked(self):
+        if not self.calibration_path:
+            return
+        try:
+            temp_path = f"{self.calibration_path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"ratios": self.ratios, "samples": self.samples}, f, indent=2)
+            os.replace(temp_path, self.calibration_path)
+        except OSError as e:
+            print(f"[TokenEstimator] Could not save {self.calibration_path}: {e}")
+
+    def chars_per_token(self, model, language):
+        """Learned ratio for a model and language, falling back to the default."""
+        return self.ratios.get(f"{model}|{language}", DEFAULT_CHARS_PER_TOKEN)
+
+    def estimate_text(self, model, text):
+        """Estimated tokens of a single text, as a float (callers round the total once)."""
+        if self.bpe is not None:
+            return float(self.bpe.count(text))
+        if not text:
+            return 0.0
+        if not self.ratios:
+            return len(text) / DEFAULT_CHARS_PER_TOKEN  # nothing learned yet, skip the language guess
+        return len(text) / self.chars_per_token(model, detect_language(text))
+
+    def count(self, model, texts, separator="\n\n"):
+        """
+        Estimated tokens of the texts joined by `separator`.
+
+        Args:
+            model (str): Model the ratio was learned for.
+            texts (list): Message contents.
+            separator (str): Joiner the total should account for.
+
+        Returns:
+            int: The estimate.
+        """
+        if self.bpe is not None:
+            return self.bpe.count(separator.join(texts))
+        separators = len(separator) * max(0, len(texts) - 1)
+        return int(sum(self.estimate_text(model, text) for text in texts) + separators / DEFAULT_CHARS_PER_TOKEN)
+
+    def costs(self, model, texts, separator="\n\n"):
+        """
+        Per-text estimates, for callers that add and remove texts without counting the whole list again.
+
+        Returns:
+            tuple: (list of float estimates, tokens of one separator)
+        """
+        if self.bpe is not None:
+            return [float(self.bpe.count(text)) for text in texts], float(self.bpe.count(separator))
+        return [self.estimate_text(model, text) for text in texts], len(separator) / DEFAULT_CHARS_PER_TOKEN
+
+    def calibrate(self, model, text, actual_tokens):
+        """
+        Learns from a real token count of `text` (ignored when a BPE vocabulary gives exact counts).
+
+        Args:
+            model (str): Model that produced the count.
+            text (str): The text that was counted.
+            actual_tokens (int): Tokens reported by the API.
+        """
+        if self.bpe is not None or not text or len(text) < MIN_CALIBRATION_CHARS or not actual_tokens or actual_tokens <= 0:
+            return
+        key = f"{model}|{detect_language(text)}"
+        observed = len(text) / actual_tokens
+        with self._lock:
+            previous = self.ratios.get(key)
+            self.ratios[key] = observed if previous is None else previous + CALIBRATION_WEIGHT * (observed - previous)
+            self.samples[key] = self.samples.get(key, 0) + 1
+            self._save_locked()
+        print(f"[TokenEstimator] {key}: {self.ratios[key]:.2f} chars/token after {self.samples[key]} sample(s)")
+
+    def observe_usage(self, request_data, usage):
+        """
+        Calibrates from a chat completion request and the `usage` block of its response.
+
+        Args:
+            request_data (dict): The request body ({"model", "messages", ...}).
+            usage (dict): The response's usage field ({"prompt_tokens", ...}).
+        """
+        if not isinstance(request_data, dict) or not isinstance(usage, dict):
+            return
+        messages = request_data.get("messages")
+        prompt_tokens = usage.get("prompt_tokens")
+        if not messages or not prompt_tokens:
+            return
+        text = "\n\n".join(str(message.get("content", "")) for message in messages)
+        self.calibrate(request_data.get("model"), text, prompt_tokens - TEMPLATE_TOKENS_PER_MESSAGE * len(messages))
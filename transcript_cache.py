@@ -0,0 +1,218 @@
+import os
+import sqlite3
+import threading
+import time
+
+class TranscriptCache:
+    """
+    Persistent on-disk cache for YouTube transcripts, keyed by (video_id, language).
+    Stores the cleaned transcript text, the video title and the fetch timestamp so the same
+    video pasted again (even in another session) is served from disk instead of YouTube.
+
+    Entries expire after `ttl_seconds` and, once the cache grows past `max_size_bytes`,
+    the least recently used entries are evicted first.
+
+    It also keeps short-lived negative entries ("no transcript", "video unavailable", "rate limited")
+    so lookups that are sure to fail are not repeated against YouTube.
+    """
+    def __init__(self, db_path="transcript_cache.db", ttl_seconds=7 * 24 * 3600, max_size_bytes=256 * 1024 * 1024):
+        """
+        Initialize the transcript cache.
+
+        Args:
+            db_path (str): Path to the SQLite database file. Use ":memory:" for a throwaway cache.
+            ttl_seconds (int): How long an entry stays valid after being fetched (default 7 days).
+            max_size_bytes (int): Maximum total transcript size kept on disk before LRU eviction kicks in.
+        """
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_size_bytes = max_size_bytes
+        self._lock = threading.Lock()  # the connection is shared between the UI thread and worker threads
+
+        db_dir = os.path.dirname(os.path.abspath(db_path)) if db_path != ":memory:" else None
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS transcripts (
+                    video_id TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    title TEXT,
+                    transcript TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    segments BLOB,
+                    PRIMARY KEY (video_id, language)
+                )"""
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(transcripts)")}
+            if "segments" not in columns:
+                # Caches created before segment timings were stored
+                self._conn.execute("ALTER TABLE transcripts ADD COLUMN segments BLOB")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_transcripts_last_access ON transcripts(last_access)")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS negative_entries (
+                    video_id TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    reason TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (video_id, language)
+                )"""
+            )
+
+    def get(self, video_id, language):
+        """
+        Look up a cached transcript.
+
+        Args:
+            video_id (str): The YouTube video ID.
+            language (str): The language key the transcript was stored under.
+
+        Returns:
+            dict or None: {"video_id", "language", "title", "transcript", "fetched_at", "segments"} on a hit
+            ("segments" is the serialized TranscriptSegments timing data, or None), None on a miss or if the entry has expired (expired entries are deleted).
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT title, transcript, fetched_at, segments FROM transcripts WHERE video_id = ? AND language = ?",
+                (video_id, language)
+            ).fetchone()
+            if row is None:
+                return None
+
+            title, transcript, fetched_at, segments = row
+            if self.ttl_seconds is not None and now - fetched_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM transcripts WHERE video_id = ? AND language = ?", (video_id, language))
+                return None
+
+            # Touch the entry so LRU eviction keeps the videos people keep pasting
+            self._conn.execute(
+                "UPDATE transcripts SET last_access = ? WHERE video_id = ? AND language = ?",
+                (now, video_id, language)
+            )
+
+        return {
+            "video_id": video_id,
+            "language": language,
+            "title": title,
+            "transcript": transcript,
+            "fetched_at": fetched_at,
+            "segments": segments
+        }
+
+    def put(self, video_id, language, transcript, title=None, fetched_at=None, segments=None):
+        """
+        Store (or replace) a transcript and evict old entries if the cache is over its size limit.
+
+        Args:
+            video_id (str): The YouTube video ID.
+            language (str): The language key to store the transcript under.
+            transcript (str): The cleaned transcript text.
+            title (str): The video title (optional).
+            fetched_at (float): Fetch timestamp, defaults to now.
+            segments (bytes): Serialized TranscriptSegments timings for the transcript (optional).
+        """
+        if not transcript:
+            return  # never cache empty transcripts, they are failures not content
+
+        now = time.time()
+        fetched_at = fetched_at if fetched_at is not None else now
+        size = len(transcript.encode("utf-8")) + len((title or "").encode("utf-8")) + len(segments or b"")
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO transcripts (video_id, language, title, transcript, fetched_at, last_access, size, segments) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (video_id, language, title, transcript, fetched_at, now, size, segments)
+            )
+            # A successful fetch overrides any earlier failure
+            self._conn.execute("DELETE FROM negative_entries WHERE video_id = ? AND language = ?", (video_id, language))
+            self._evict_locked()
+
+    def _evict_locked(self):
+        """Drops expired entries, then least recently used ones until under max_size_bytes. Caller holds the lock."""
+        now = time.time()
+        self._conn.execute("DELETE FROM negative_entries WHERE expires_at <= ?", (now,))
+        if self.ttl_seconds is not None:
+            self._conn.execute("DELETE FROM transcripts WHERE fetched_at < ?", (now - self.ttl_seconds,))
+
+        if self.max_size_bytes is None:
+            return
+
+        total_size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0]
+        if total_size <= self.max_size_bytes:
+            return
+
+        rows = self._conn.execute("SELECT video_id, language, size FROM transcripts ORDER BY last_access ASC").fetchall()
+        for video_id, language, size in rows:
+            if total_size <= self.max_size_bytes:
+                break
+            self._conn.execute("DELETE FROM transcripts WHERE video_id = ? AND language = ?", (video_id, language))
+            total_size -= size
+            print(f"[TranscriptCache] Evicted {video_id} ({language}) to stay under {self.max_size_bytes} bytes")
+
+    def put_negative(self, video_id, language, reason, ttl_seconds):
+        """
+        Remembers that fetching a transcript failed for a reason that will not change soon.
+
+        Args:
+            video_id (str): The YouTube video ID.
+            language (str): The language key of the failed lookup.
+            reason (str): Why it failed (e.g. "no_transcript", "video_unavailable", "rate_limited").
+            ttl_seconds (float): How long the failure should be remembered.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO negative_entries (video_id, language, reason, expires_at) VALUES (?, ?, ?, ?)",
+                (video_id, language, reason, time.time() + ttl_seconds)
+            )
+
+    def get_negative(self, video_id, language):
+        """
+        Returns the failure reason if a still-valid negative entry exists, None otherwise.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT reason, expires_at FROM negative_entries WHERE video_id = ? AND language = ?",
+                (video_id, language)
+            ).fetchone()
+            if row is None:
+                return None
+            reason, expires_at = row
+            if expires_at <= now:
+                self._conn.execute("DELETE FROM negative_entries WHERE video_id = ? AND language = ?", (video_id, language))
+                return None
+            return reason
+
+    def invalidate(self, video_id, language=None):
+        """Removes a video from the cache (all languages if language is None)."""
+        with self._lock, self._conn:
+            for table in ("transcripts", "negative_entries"):
+                if language is None:
+                    self._conn.execute(f"DELETE FROM {table} WHERE video_id = ?", (video_id,))
+                else:
+                    self._conn.execute(f"DELETE FROM {table} WHERE video_id = ? AND language = ?", (video_id, language))
+
+    def clear(self):
+        """Removes every cached transcript and negative entry."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM transcripts")
+            self._conn.execute("DELETE FROM negative_entries")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+
+    def total_size(self):
+        """Returns the total size in bytes of the cached transcripts, titles and segment timings."""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0]
+
+    def close(self):
+        """Closes the underlying database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,130 @@
+import re
+from collections import deque
+
+# Caption annotations added by YouTube ([Music], [Aplausos], (risos)...); any other bracketed text ([sic], [2019]) is speech and is kept
+NOISE_MARKERS = ("music", "música", "musica", "applause", "aplausos", "laughter", "risos", "risadas", "cheering", "silence", "silêncio")
+NOISE_MARKER_PATTERN = re.compile(
+    r'\[\s*(?:{0})\s*\]|\(\s*(?:{0})\s*\)|[♪♫]+'.format("|".join(NOISE_MARKERS)),
+    re.IGNORECASE
+)
+# English hesitation fillers ("um" is left alone because it means "one" in Portuguese)
+FILLER_WORD_PATTERN = re.compile(r'\b(?:uh+|uhm+|umm+|erm+|hmm+)\b[,.]?', re.IGNORECASE)
+# The same two to four words said several times in a row ("I mean I mean")
+REPEATED_PHRASE_PATTERN = re.compile(r'\b(\w+(?:\s+\w+){1,3})(?:\s+\1\b)+', re.IGNORECASE)
+# A single word only when it comes four or more times in a row: "very very", "no no no" and "bye bye" are speech
+REPEATED_WORD_PATTERN = re.compile(r'\b(\w+)(?:\s+\1\b){3,}', re.IGNORECASE)
+SENTENCE_END_PATTERN = re.compile(r'[.!?…]["\')\]]?$')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+CHARS_PER_TOKEN = 4  # rough average for English/Portuguese text
+
+class TranscriptNormalizer:
+    """
+    Streaming cleanup pass for caption segments, meant for YouTube auto-generated captions.
+
+    - drops noise markers ([Music], [Applause], ♪) and hesitation fillers
+    - removes the words a rolling caption repeats from the previous line
+    - collapses phrases repeated back to back (single words only when stuttered four or more times)
+    - joins the short caption lines into sentence-sized segments, keeping their timestamps
+
+    Segments are consumed and produced one at a time, so a transcript is never held twice in memory.
+    The characters removed are counted in `stats`.
+    """
+    def __init__(self, overlap_window=20, min_overlap_words=2, max_sentence_chars=400, max_pause_seconds=2.5):
+        """
+        Initialize the normalizer.
+
+        Args:
+            overlap_window (int): How many trailing words are compared against the next caption line.
+            min_overlap_words (int): Shortest repeat treated as a rolling caption (a single shared word
+                is usually just speech, e.g. "... that" / "that is ...").
+            max_sentence_chars (int): Joined segments are flushed at this size even without punctuation
+                (auto-captions often have none), to keep timestamps useful.
+            max_pause_seconds (float): A silence longer than this always starts a new segment.
+        """
+        self.overlap_window = overlap_window
+        self.min_overlap_words = min_overlap_words
+        self.max_sentence_chars = max_sentence_chars
+        self.max_pause_seconds = max_pause_seconds
+        self.stats = {"segments_in": 0, "segments_out": 0, "chars_before": 0, "chars_after": 0}
+
+    @property
+    def chars_saved(self):
+        return self.stats["chars_before"] - self.stats["chars_after"]
+
+    @property
+    def tokens_saved_estimate(self):
+        return self.chars_saved // CHARS_PER_TOKEN
+
+    def summary(self):
+        """Returns the stats plus the characters and estimated tokens saved."""
+        return dict(self.stats, chars_saved=self.chars_saved, tokens_saved_estimate=self.tokens_saved_estimate)
+
+    @staticmethod
+    def _clean_line(text):
+        text = NOISE_MARKER_PATTERN.sub(' ', text)
+        text = FILLER_WORD_PATTERN.sub(' ', text)
+        return WHITESPACE_PATTERN.sub(' ', text).strip()
+
+    def _strip_overlap(self, recent_words, words):
+        """Drops the leading words of a caption line that repeat the end of the previous output."""
+        longest = min(len(recent_words), len(words))
+        recent = [word.lower() for word in recent_words]
+        for size in range(longest, self.min_overlap_words - 1, -1):
+            if recent[-size:] == [word.lower() for word in words[:size]]:
+                return words[size:]
+        return words
+
+    def normalize(self, snippets, clean=None):
+        """
+        Normalizes caption segments.
+
+        Args:
+            snippets: Iterable of FetchedTranscriptSnippet objects or {"text", "start", "duration"} dicts, in time order.
+            clean (callable): Optional function applied to each caption line first (e.g. to strip speaker tags).
+
+        Yields:
+            dict: {"text", "start", "duration"} for each joined segment.
+        """
+        recent_words = deque(maxlen=self.overlap_window)
+        words, start, end, length = [], None, None, 0
+
+        def flush():
+            # Stuttered words first, or "is is is is" would be read as the phrase "is is" said twice
+            text = REPEATED_PHRASE_PATTERN.sub(r'\1', REPEATED_WORD_PATTERN.sub(r'\1', " ".join(words)))
+            self.stats["segments_out"] += 1
+            self.stats["chars_after"] += len(text) + 1  # plus the line separator
+            return {"text": text, "start": start, "duration": max(0.0, end - start)}
+
+        for snippet in snippets:
+            if isinstance(snippet, dict):
+                text, seg_start, seg_duration = snippet["text"], snippet["start"], snippet.get("duration", 0.0)
+            else:
+                text, seg_start, seg_duration = snippet.text, snippet.start, snippet.duration
+            seg_start, seg_end = float(seg_start), float(seg_start) + float(seg_duration or 0.0)
+            self.stats["segments_in"] += 1
+            self.stats["chars_before"] += len(text) + 1
+            if clean is not None:
+                text = clean(text)
+
+            new_words = self._strip_overlap(recent_words, self._clean_line(text).split())
+            if not new_words:
+                continue
+
+            if words and seg_start - end > self.max_pause_seconds:
+                yield flush()
+                words, length = [], 0
+            if not words:
+                start = seg_start
+
+            words.extend(new_words)
+            recent_words.extend(new_words)
+            length += sum(len(word) + 1 for word in new_words)
+            end = max(seg_end, end if end is not None else seg_end)
+
+            if SENTENCE_END_PATTERN.search(words[-1]) or length >= self.max_sentence_chars:
+                yield flush()
+                words, length = [], 0
+
+        if words:
+            yield flush()
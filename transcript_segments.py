@@ -0,0 +1,176 @@
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+class TranscriptSegments:
+    """
+    Compact, timestamped view of a transcript.
+
+    The text of every caption segment lives in a single string buffer (segments joined by "\\n",
+    the same layout TextFormatter produces), and three parallel arrays hold each segment's
+    start time, duration and character offset into that buffer. Time and character lookups are
+    binary searches over the arrays, so slicing minutes 10-15 of a two hour video never
+    re-parses or copies the rest of the transcript.
+    """
+    SEPARATOR = "\n"
+    _HEADER = struct.Struct("<4sI")  # magic, segment count
+    _MAGIC = b"TSG1"
+
+    def __init__(self, text="", starts=None, durations=None, offsets=None):
+        """
+        Initialize from already-built parallel arrays. Use from_snippets() to build from the API output.
+
+        Args:
+            text (str): All segment texts joined by SEPARATOR.
+            starts (array): Start time (seconds) of each segment, ascending.
+            durations (array): Duration (seconds) of each segment.
+            offsets (array): Character offset of each segment in `text`, plus a final
+                sentinel equal to len(text) + len(SEPARATOR).
+        """
+        self.text = text
+        self.starts = starts if starts is not None else array("d")
+        self.durations = durations if durations is not None else array("d")
+        self.offsets = offsets if offsets is not None else array("q", [len(text) + len(self.SEPARATOR)])
+
+    @classmethod
+    def from_snippets(cls, snippets, clean=None):
+        """
+        Builds the segment model from youtube_transcript_api output.
+
+        Args:
+            snippets: Iterable of FetchedTranscriptSnippet objects or {"text", "start", "duration"} dicts.
+            clean (callable): Optional function applied to each segment's text (e.g. to strip speaker tags).
+
+        Returns:
+            TranscriptSegments: The segment model.
+        """
+        starts, durations, offsets = array("d"), array("d"), array("q")
+        parts = []
+        position = 0
+        for snippet in snippets:
+            if isinstance(snippet, dict):
+                text, start, duration = snippet["text"], snippet["start"], snippet.get("duration", 0.0)
+            else:
+                text, start, duration = snippet.text, snippet.start, snippet.duration
+            if clean is not None:
+                text = clean(text)
+            starts.append(float(start))
+            durations.append(float(duration or 0.0))
+            offsets.append(position)
+            parts.append(text)
+            position += len(text) + len(cls.SEPARATOR)
+        offsets.append(position)
+        return cls(cls.SEPARATOR.join(parts), starts, durations, offsets)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        """Yields (start, duration, text) for every segment."""
+        for index in range(len(self)):
+            yield self.segment(index)
+
+    @property
+    def duration(self):
+        """End time (seconds) of the last segment, 0.0 if empty."""
+        if not len(self):
+            return 0.0
+        return self.starts[-1] + self.durations[-1]
+
+    def segment(self, index):
+        """Returns (start, duration, text) of the segment at `index`."""
+        return self.starts[index], self.durations[index], self.text[self.offsets[index]:self._end_offset(index)]
+
+    def _end_offset(self, index):
+        return self.offsets[index + 1] - len(self.SEPARATOR)
+
+    def _slice(self, first, last):
+        """Returns the segments [first, last) as a new TranscriptSegments with rebased offsets."""
+        if first >= last:
+            return TranscriptSegments()
+        base = self.offsets[first]
+        text = self.text[base:self._end_offset(last - 1)]
+        offsets = array("q", (offset - base for offset in self.offsets[first:last + 1]))
+        return TranscriptSegments(text, self.starts[first:last], self.durations[first:last], offsets)
+
+    def index_at_time(self, seconds):
+        """Index of the segment playing at `seconds` (the last one starting at or before it), -1 if before the first."""
+        return bisect_right(self.starts, seconds) - 1
+
+    def index_at_char(self, position):
+        """Index of the segment containing character `position` of `text`, -1 if out of range."""
+        if position < 0 or position >= len(self.text):
+            return -1
+        return bisect_right(self.offsets, position, 0, len(self)) - 1
+
+    def time_at_char(self, position):
+        """Start time of the segment containing character `position`, None if out of range."""
+        index = self.index_at_char(position)
+        return self.starts[index] if index >= 0 else None
+
+    def slice_by_time(self, start_seconds, end_seconds):
+        """
+        Segments overlapping the [start_seconds, end_seconds) interval.
+
+        Returns:
+            TranscriptSegments: The matching segments (timestamps are kept, offsets are rebased).
+        """
+        first = max(0, self.index_at_time(start_seconds))
+        if first < len(self) and self.starts[first] + self.durations[first] <= start_seconds:
+            first += 1  # the segment before the window already ended
+        last = bisect_left(self.starts, end_seconds)
+        return self._slice(first, last)
+
+    def slice_by_chars(self, start_char, end_char):
+        """
+        Whole segments overlapping the [start_char, end_char) range of `text`.
+
+        Returns:
+            TranscriptSegments: The matching segments (timestamps are kept, offsets are rebased).
+        """
+        start_char = max(0, start_char)
+        first = max(0, bisect_right(self.offsets, start_char, 0, len(self)) - 1)
+        last = bisect_left(self.offsets, end_char, 0, len(self))
+        return self._slice(first, last)
+
+    def text_between(self, start_seconds, end_seconds):
+        """Text spoken between two timestamps (seconds)."""
+        return self.slice_by_time(start_seconds, end_seconds).text
+
+    def to_bytes(self):
+        """
+        Serializes the timing arrays (not the text) for storage next to the transcript in the cache.
+        """
+        starts, durations, offsets = array("d", self.starts), array("d", self.durations), array("q", self.offsets)
+        if sys.byteorder != "little":
+            for values in (starts, durations, offsets):
+                values.byteswap()
+        return self._HEADER.pack(self._MAGIC, len(self)) + starts.tobytes() + durations.tobytes() + offsets.tobytes()
+
+    @classmethod
+    def from_bytes(cls, text, data):
+        """
+        Rebuilds the segment model from the transcript text and the output of to_bytes().
+
+        Returns:
+            Optional[TranscriptSegments]: The segment model, or None if `data` is missing or does not match `text`.
+        """
+        if not data or len(data) < cls._HEADER.size:
+            return None
+        magic, count = cls._HEADER.unpack_from(data)
+        if magic != cls._MAGIC or len(data) != cls._HEADER.size + count * 24 + 8:
+            return None
+
+        position = cls._HEADER.size
+        starts, durations, offsets = array("d"), array("d"), array("q")
+        starts.frombytes(data[position:position + count * 8])
+        durations.frombytes(data[position + count * 8:position + count * 16])
+        offsets.frombytes(data[position + count * 16:])
+        if sys.byteorder != "little":
+            for values in (starts, durations, offsets):
+                values.byteswap()
+
+        if offsets[-1] != len(text) + len(cls.SEPARATOR):
+            return None  # the text was changed after the timings were stored
+        return cls(text, starts, durations, offsets)
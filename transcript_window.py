@@ -0,0 +1,135 @@
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from text_chunks import word_chunk_spans
+
+ELISION = "[...]"
+WINDOW_HEADER = "(Trechos da transcrição mais relevantes para a pergunta do usuário, em ordem cronológica; [...] marca as partes omitidas)"
+
+def format_timestamp(seconds):
+    """Seconds as [h:mm:ss] (or [m:ss] under an hour)."""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"[{hours}:{minutes:02d}:{seconds:02d}]" if hours else f"[{minutes}:{seconds:02d}]"
+
+class TranscriptWindow:
+    """
+    Relevant slices of a transcript too long to be sent whole.
+
+    The transcript is cut into word chunks (the same chunking as RAGManager._break_into_chunks), every
+    chunk is ranked against the user's question (hybrid BM25 and embedding scores from the RAGManager's
+    per-video indexes when a RAGManager is given, local TF-IDF similarity otherwise) and the best chunks that fit the token budget are rendered in
+    chronological order, with their timestamps when the caption timings are known and [...] where
+    parts were left out.
+    """
+    def __init__(self, rag_manager=None, chunk_words=120):
+        """
+        Initialize the window builder.
+
+        Args:
+            rag_manager (RAGManager): Optional ranker of the chunks of indexed videos (its rank_chunks).
+            chunk_words (int): Words per chunk when the transcript is not indexed.
+        """
+        self.rag_manager = rag_manager
+        self.chunk_words = chunk_words
+
+    def index_transcript(self, video_id, transcript):
+        """Indexes the chunks of a transcript at ingest (BM25 now, embeddings in the background); no-op without a RAGManager."""
+        if self.rag_manager is not None:
+            return self.rag_manager.index_transcript(video_id, transcript)
+        return None
+
+    def chunks(self, transcript, segments=None, spans=None):
+        """
+        Splits the transcript into chunks.
+
+        Args:
+            transcript (str): The transcript text.
+            segments (TranscriptSegments): Caption timings of exactly this text (optional).
+            spans (list): Character spans of the chunks (e.g. from the vector index); computed when None.
+
+        Returns:
+            list: One dict per chunk, in order: {"text", "start" (character offset), "end", "time" (seconds or None)}
+        """
+        timed = segments is not None and segments.text == transcript
+        return [
+            {
+                "text": " ".join(transcript[start:end].split()),
+                "start": start,
+                "end": end,
+                "time": segments.time_at_char(start) if timed else None
+            }
+            for start, end in (spans if spans is not None else word_chunk_spans(transcript, self.chunk_words))
+        ]
+
+    def rank(self, texts, query):
+        """Lexical relevance (TF-IDF cosine) of every chunk text to the query (higher is better)."""
+        try:
+            matrix = TfidfVectorizer(sublinear_tf=True).fit_transform(list(texts) + [query])
+        except ValueError:
+            return np.zeros(len(texts))  # empty vocabulary
+        return np.asarray((matrix[:-1] @ matrix[-1].T).todense()).ravel()
+
+    @staticmethod
+    def line(chunk):
+        """A chunk as it is rendered, prefixed by its timestamp when known."""
+        return chunk["text"] if chunk["time"] is None else f"{format_timestamp(chunk['time'])} {chunk['text']}"
+
+    def render(self, chunks, selected):
+        """The selected chunks in chronological order, with timestamps and elision markers."""
+        lines = [WINDOW_HEADER]
+        previous = -1
+        for index in sorted(selected):
+            if index != previous + 1:
+                lines.append(ELISION)
+            lines.append(self.line(chunks[index]))
+            previous = index
+        if previous != len(chunks) - 1:
+            lines.append(ELISION)
+        return "\n".join(lines)
+
+    def _indexed_scores(self, transcript, query, video_id):
+        """(chunk spans, hybrid scores) from the RAGManager's indexes, indexing the transcript now if ingest did not; (None, None) without a RAGManager."""
+        if self.rag_manager is None or not video_id:
+            return None, None
+        spans, scores = self.rag_manager.rank_chunks(video_id, transcript, query)
+        if scores is None:
+            return None, None
+        return [tuple(span) for span in spans], scores
+
+    def build(self, transcript, query, budget, costs_of, segments=None, video_id=None):
+        """
+        Windowed transcript within `budget` tokens.
+
+        Args:
+            transcript (str): The transcript text.
+            query (str): The user's question.
+            budget (float): Tokens available for the window.
+            costs_of (callable): Maps a list of texts to (list of token costs, tokens of one line break).
+            segments (TranscriptSegments): Caption timings of the transcript, for the timestamps (optional).
+            video_id (str): ID of the video, to rank with its precomputed chunk embeddings (optional).
+
+        Returns:
+            str: The rendered window, or "" if not even one chunk fits.
+        """
+        if not transcript or not query:
+            return ""
+        spans, scores = self._indexed_scores(transcript, query, video_id)
+        chunks = self.chunks(transcript, segments, spans)
+        texts = [chunk["text"] for chunk in chunks]
+        if scores is None:
+            scores = self.rank(texts, query)
+        (header_cost, elision_cost, *chunk_costs), line_cost = costs_of([WINDOW_HEADER, ELISION] + [self.line(chunk) for chunk in chunks])
+        # Each chunk may bring an elision line; the header and a final elision are always there
+        used = header_cost + elision_cost + 2 * line_cost
+        selected = []
+        for index in np.argsort(-np.asarray(scores), kind="stable"):
+            cost = chunk_costs[index] + elision_cost + 2 * line_cost
+            if used + cost > budget:
+                continue
+            selected.append(int(index))
+            used += cost
+        if not selected:
+            return ""
+        print(f"[TranscriptWindow] {len(selected)}/{len(chunks)} chunk(s) selected, ~{int(used)}/{int(budget)} tokens")
+        return self.render(chunks, selected)
@@ -1,16 +1,235 @@
 import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
 from youtube_transcript_module import YouTubeTranscriptDownloader
+from transcript_cache import TranscriptCache
+from extractive_summarizer import ExtractiveSummarizer
+from transcript_segments import TranscriptSegments
+
+UNKNOWN_TITLE = "Desconhecido"
 
 class UserInputValidator:
-    def __init__(self, youtube_downloader=None):
+    MAX_PENDING_SUMMARIES = 32  # resumos não retirados com take_summary são descartados além deste número
+
+    def __init__(self, youtube_downloader=None, transcript_cache=None, title_timeout=15, transcript_timeout=90, max_concurrent_videos=3, extractive_summarizer=None):
         # Inicializa o validador de entrada com um downloader de transcritos do YouTube
         self.youtube_downloader = youtube_downloader or YouTubeTranscriptDownloader()
+        # Cache em disco das legendas já baixadas (compartilhado entre sessões)
+        self.transcript_cache = transcript_cache if transcript_cache is not None else TranscriptCache()
+        if getattr(self.youtube_downloader, "cache", False) is None:
+            # Compartilha o cache com o downloader para que ele registre falhas definitivas (cache negativo)
+            self.youtube_downloader.cache = self.transcript_cache
+        # Título e transcrição são buscados em paralelo, cada um com seu próprio tempo limite (segundos)
+        self.title_timeout = title_timeout
+        self.transcript_timeout = transcript_timeout
+        # Mensagens com vários links processam no máximo max_concurrent_videos vídeos por vez: cada vídeo que termina libera a vaga para o próximo
+        self.max_concurrent_videos = max(1, max_concurrent_videos)
+        self._video_executor = ThreadPoolExecutor(max_workers=self.max_concurrent_videos, thread_name_prefix="youtube-video")
+        # Cada vídeo usa até duas conexões (título e transcrição)
+        self._executor = ThreadPoolExecutor(max_workers=2 * self.max_concurrent_videos, thread_name_prefix="youtube-ingest")
+        # Resumo extrativo local (TF-IDF, sem LLM), gerado em segundo plano: nível intermediário entre link e transcrição.
+        # Tem seu próprio executor para não ocupar as vagas das buscas
+        self.extractive_summarizer = extractive_summarizer if extractive_summarizer is not None else ExtractiveSummarizer()
+        self._summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="extractive-summary")
+        # Futures dos resumos, fora dos metadados (que só têm valores serializáveis): transcript_version -> Future
+        self._summaries = OrderedDict()
+        self._summaries_lock = threading.Lock()
+
+    def _wait_for(self, future, deadline, default, label, video_id):
+        """
+        Aguarda o resultado de uma tarefa até o prazo final, retornando o valor padrão em caso de erro ou timeout.
+        """
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            print(f"[UserInputValidator] Tempo esgotado ao buscar {label} de {video_id}")
+        except Exception as e:
+            print(f"[UserInputValidator] Erro ao buscar {label} de {video_id}: {e}")
+        return default
+
+    def _fetch_video_content(self, video_id):
+        """
+        Obtém título e transcrição do vídeo, consultando o cache antes de acessar a rede.
+        Em caso de cache miss, título e transcrição são baixados ao mesmo tempo; a falha de um não bloqueia o outro.
+
+        Args:
+            video_id (str): O ID do vídeo do YouTube
+
+        Returns:
+            Tuple(str, str): Título do vídeo e transcrição (vazia se não disponível)
+        """
+        return self._finish_fetch(self._start_fetch(video_id))
+
+    def _start_fetch(self, video_id):
+        """
+        Inicia a busca de título e transcrição de um vídeo sem esperar pelo resultado.
+
+        Returns:
+            dict: Estado da busca, a ser passado para _finish_fetch
+        """
+        language = getattr(self.youtube_downloader, "cache_language", "")
+        fetch = {"video_id": video_id, "language": language, "result": None}
+
+        cached = self.transcript_cache.get(video_id, language)
+        fetch["cached"] = cached
+        if cached and cached["title"]:
+            print(f"[UserInputValidator] Transcrição de {video_id} obtida do cache")
+            fetch["result"] = (cached["title"], cached["transcript"])
+            return fetch
+
+        if not cached and self.transcript_cache.get_negative(video_id, language):
+            # Falha recente e definitiva (sem legenda, vídeo indisponível...): nem título nem transcrição vão para a rede
+            print(f"[UserInputValidator] {video_id} sem transcrição disponível (cache negativo)")
+            fetch["result"] = (UNKNOWN_TITLE, "")
+            return fetch
+
+        fetch["start"] = time.monotonic()
+        fetch["title_future"] = self._executor.submit(self.youtube_downloader.get_video_title, video_id)
+        if not cached:
+            fetch["transcript_future"] = self._executor.submit(self.youtube_downloader.download_transcript, video_id)
+        return fetch
+
+    def _finish_fetch(self, fetch):
+        """
+        Aguarda (com tempo limite) as tarefas iniciadas por _start_fetch e atualiza o cache.
+
+        Returns:
+            Tuple(str, str): Título do vídeo e transcrição (vazia se não disponível)
+        """
+        if fetch["result"] is not None:
+            return fetch["result"]
+
+        video_id, language, cached, start = fetch["video_id"], fetch["language"], fetch["cached"], fetch["start"]
+        title_future = fetch["title_future"]
+
+        if cached:
+            # Transcrição em cache mas o título falhou da última vez: só o título vai para a rede
+            print(f"[UserInputValidator] Transcrição de {video_id} obtida do cache, buscando apenas o título")
+            video_title = self._wait_for(title_future, start + self.title_timeout, None, "título", video_id)
+            if video_title and video_title != UNKNOWN_TITLE:
+                self.transcript_cache.put(
+                    video_id, language, cached["transcript"], video_title,
+                    fetched_at=cached["fetched_at"], segments=cached.get("segments")
+                )
+            return video_title or UNKNOWN_TITLE, cached["transcript"]
+
+        transcript_future = fetch["transcript_future"]
+        transcript = self._wait_for(transcript_future, start + self.transcript_timeout, "", "transcrição", video_id)
+        video_title = self._wait_for(title_future, start + self.title_timeout, None, "título", video_id)
+        # Títulos desconhecidos não vão para o cache, assim a próxima consulta tenta de novo
+        cached_title = video_title if video_title and video_title != UNKNOWN_TITLE else None
+
+        if transcript:
+            self.transcript_cache.put(video_id, language, transcript, cached_title, segments=self._segments_blob(video_id, transcript))
+        elif not transcript_future.done():
+            # A transcrição ainda pode chegar depois do timeout: guarda no cache para o próximo envio do link
+            transcript_future.add_done_callback(
+                lambda future: self._cache_late_transcript(future, video_id, language, cached_title)
+            )
+
+        return video_title or UNKNOWN_TITLE, transcript
+
+    def _segments_blob(self, video_id, transcript):
+        """
+        Horários dos trechos da transcrição recém-baixada, serializados para o cache (None se indisponíveis).
+        """
+        get_segments = getattr(self.youtube_downloader, "get_transcript_segments", None)
+        segments = get_segments(video_id, allow_download=False) if get_segments else None
+        if segments is None or segments.text != transcript:
+            return None
+        return segments.to_bytes()
+
+    def _fetch_many(self, video_ids):
+        """
+        Busca título e transcrição de vários vídeos, no máximo max_concurrent_videos ao mesmo tempo
+        (cada vídeo usa até duas conexões: título e transcrição). Um vídeo lento não segura os outros:
+        assim que um termina, o próximo da fila começa.
+
+        Returns:
+            dict: video_id -> (título, transcrição)
+        """
+        futures = {self._video_executor.submit(self._fetch_video_content, video_id): video_id for video_id in video_ids}
+        results = {}
+        for future in as_completed(futures):
+            video_id = futures[future]
+            try:
+                results[video_id] = future.result()
+            except Exception as e:
+                print(f"[UserInputValidator] Erro ao buscar {video_id}: {e}")
+                results[video_id] = (UNKNOWN_TITLE, "")
+        return results
+
+    def _cache_late_transcript(self, future, video_id, language, video_title):
+        """Callback que armazena no cache uma transcrição que chegou após o tempo limite."""
+        if future.cancelled() or future.exception() is not None:
+            return
+        transcript = future.result()
+        if transcript:
+            self.transcript_cache.put(video_id, language, transcript, video_title, segments=self._segments_blob(video_id, transcript))
+            print(f"[UserInputValidator] Transcrição atrasada de {video_id} armazenada no cache")
+
+    def get_transcript_segments(self, video_id):
+        """
+        Horários dos trechos de uma transcrição já armazenada no cache (usados para marcar os trechos com timestamps).
+
+        Returns:
+            Optional[TranscriptSegments]: Os trechos com horários, ou None se não estiverem no cache
+        """
+        cached = self.transcript_cache.get(video_id, getattr(self.youtube_downloader, "cache_language", ""))
+        if not cached or not cached.get("segments"):
+            return None
+        return TranscriptSegments.from_bytes(cached["transcript"], cached["segments"])
+
+    def _start_summary(self, transcript, build_version, transcript_version):
+        """
+        Agenda o resumo extrativo da transcrição em segundo plano, sem bloquear o envio da mensagem.
+        O Future fica guardado até ser retirado com take_summary(transcript_version).
+
+        Args:
+            transcript (str): Transcrição completa do vídeo
+            build_version (callable): Monta a versão resumida da mensagem (ou seção) a partir do resumo
+            transcript_version (str): Versão com transcrição da mensagem (ou seção) que o resumo substitui
+        """
+        def summarize():
+            summary = self.extractive_summarizer.summarize(transcript)
+            return build_version(summary) if summary else None
+        future = self._summary_executor.submit(summarize)
+        with self._summaries_lock:
+            self._summaries[transcript_version] = future
+            while len(self._summaries) > self.MAX_PENDING_SUMMARIES:
+                self._summaries.popitem(last=False)
+
+    def take_summary(self, transcript_version):
+        """
+        Retira o resumo de uma mensagem (ou seção de vídeo) montada por process_message_with_link.
+
+        Args:
+            transcript_version (str): O "transcript_version" da mensagem ou seção, como está nos metadados
+
+        Returns:
+            Optional[Future]: Resolve para a versão resumida (None se a transcrição for curta demais para precisar de resumo),
+                ou None se não houver resumo agendado
+        """
+        with self._summaries_lock:
+            return self._summaries.pop(transcript_version, None)
 
     def process_message_with_link(self, message_text):
         """
-        Verifica se a mensagem contém um link. Se sim, retorna uma tupla com:
+        Verifica se a mensagem contém links. Se sim, retorna uma tupla com:
         (mensagem_armazenada, mensagem_enviada, metadados_do_youtube)
 
+        Todos os links da mensagem são considerados; os IDs e as transcrições são obtidos em paralelo.
+        Com mais de um vídeo, a mensagem enviada tem uma seção por vídeo e os metadados trazem a lista "videos",
+        com as seções de cada vídeo ("link_version"/"transcript_version" de cada um são trechos da mensagem),
+        para que o MemoryManager possa comprimir um vídeo de cada vez.
+
+        "transcript_span" (de cada vídeo) é a posição (início, fim) da transcrição dentro de "transcript_version",
+        para que um vídeo longo demais possa ser enviado só com os trechos relevantes à pergunta.
+        A versão que traz só os trechos mais representativos da transcrição (de cada vídeo) é calculada em segundo
+        plano e obtida com take_summary(transcript_version); os metadados só têm valores serializáveis.
+
         Os metadados serão None se nenhum link do YouTube foi encontrado.
 
         Args:
@@ -22,52 +241,133 @@ class UserInputValidator:
         """
         # Expressão regular para detectar URLs em qualquer formato
         url_pattern = r'\b(https?://[a-zA-Z0-9-._~:/?#[\]@!$&\'()*+,;%=]+|www\.[a-zA-Z0-9-._~:/?#[\]@!$&\'()*+,;%=]+)\b'
-        match = re.search(url_pattern, message_text)  # Retorna None se não encontrar URL
+        urls = list(dict.fromkeys(match.group(0).strip() for match in re.finditer(url_pattern, message_text)))
         message_to_store = message_text
         message_to_send = message_text
         youtube_metadata = None
 
-        if match:
-            url = match.group(0).strip()  # Remove espaços em volta da URL
-            # Verifica se a URL pertence ao YouTube e extrai o ID do vídeo
-            video_id = self.youtube_downloader.get_video_id(url)  # Retorna None se inválida
-            if video_id:
-                # Obtém título e transcrição do vídeo
-                video_title = self.youtube_downloader.get_video_title(video_id)
-                transcript = self.youtube_downloader.download_transcript(video_id)
-                if transcript:
-                    # Separa a mensagem em partes antes e depois da URL
-                    split_message = message_text.split(url)
-                    before_link = split_message[0].strip()
-                    after_link = split_message[1].strip() if len(split_message) > 1 else ""
-                    message_without_link = f"{before_link} {after_link}".strip()
-
-                    # Cria versão somente com link (para otimização de memória)
-                    link_version = f"{message_without_link} Fonte: {url}"
-
-                    # Cria versão com transcrição (contexto completo)
-                    instructions = f"\n\nO usuário acabou de te enviar um link, segue abaixo a transcrição completa do vídeo com título: {video_title}, esta mesma pode conter erros de digitação ou falas misturadas caso o video possua mais de um narrador. Por favor, ignore quaisquer erros de digitação e foque na mensagem geral do conteúdo ao responder o usuário.\n\n{transcript}\n\n Agora, por favor, responda a mensagem do usuário considerando o conteúdo do vídeo acima, lembre-se de por personalidade e emoção em suas respostas!"
-                    transcript_version = f"{message_without_link}{instructions}"
-
-                    # Armazena as versões e metadados
-                    message_to_store = link_version
-                    message_to_send = transcript_version
-                    youtube_metadata = {
-                        "url": url,
-                        "video_id": video_id,
-                        "video_title": video_title,
-                        "link_version": link_version,
-                        "transcript_version": transcript_version
-                    }
-
-                    print(
-                        f"Link do YouTube detectado!\n"
-                        f"URL: {url}\n"
-                        f"ID do vídeo: {video_id}\n"
-                        f"Título: {video_title}\n"
-                        f"Transcrição (primeiros 100 caracteres): {transcript[:100]}... (tamanho total: {len(transcript)} caracteres)\n"
-                        f"Mensagem armazenada: {message_to_store}\n"
-                        f"Mensagem enviada: {message_to_send[:100]}...\n"
-                    )
-
-        return message_to_store, message_to_send, youtube_metadata
\ No newline at end of file
+        if not urls:
+            return message_to_store, message_to_send, youtube_metadata
+
+        # Verifica quais URLs pertencem ao YouTube e extrai os IDs (só encurtadores acessam a rede)
+        video_ids = list(self._executor.map(self.youtube_downloader.get_video_id, urls))
+        videos = []  # (url, video_id), sem vídeos repetidos
+        for url, video_id in zip(urls, video_ids):
+            if video_id and all(video_id != seen_id for _, seen_id in videos):
+                videos.append((url, video_id))
+        if not videos:
+            return message_to_store, message_to_send, youtube_metadata
+
+        # Obtém título e transcrição dos vídeos (cache primeiro, rede só se necessário)
+        contents = self._fetch_many([video_id for _, video_id in videos])
+        videos = [(url, video_id, *contents[video_id]) for url, video_id in videos if contents[video_id][1]]
+
+        if len(videos) == 1:
+            url, video_id, video_title, transcript = videos[0]
+            # Separa a mensagem em partes antes e depois da URL
+            split_message = message_text.split(url)
+            before_link = split_message[0].strip()
+            after_link = split_message[1].strip() if len(split_message) > 1 else ""
+            message_without_link = f"{before_link} {after_link}".strip()
+
+            # Cria versão somente com link (para otimização de memória)
+            link_version = f"{message_without_link} Fonte: {url}"
+
+            # Cria versão com transcrição (contexto completo)
+            instructions = f"\n\nO usuário acabou de te enviar um link, segue abaixo a transcrição completa do vídeo com título: {video_title}, esta mesma pode conter erros de digitação ou falas misturadas caso o video possua mais de um narrador. Por favor, ignore quaisquer erros de digitação e foque na mensagem geral do conteúdo ao responder o usuário.\n\n{transcript}\n\n Agora, por favor, responda a mensagem do usuário considerando o conteúdo do vídeo acima, lembre-se de por personalidade e emoção em suas respostas!"
+            transcript_version = f"{message_without_link}{instructions}"
+            transcript_end = transcript_version.rindex("\n\n Agora, por favor")
+
+            # Cria versão resumida (trechos mais representativos) em segundo plano
+            self._start_summary(transcript, lambda summary: (
+                f"{message_without_link}\n\nO usuário acabou de te enviar um link, segue abaixo os trechos mais representativos da transcrição do vídeo com título: {video_title} "
+                f"(a transcrição completa não cabe no contexto). Os trechos podem conter erros de digitação; foque na mensagem geral do conteúdo ao responder o usuário.\n\n"
+                f"{summary}\n\n Agora, por favor, responda a mensagem do usuário considerando o conteúdo do vídeo acima, lembre-se de por personalidade e emoção em suas respostas!"
+            ), transcript_version)
+
+            # Armazena as versões e metadados
+            message_to_store = link_version
+            message_to_send = transcript_version
+            youtube_metadata = {
+                "url": url,
+                "video_id": video_id,
+                "video_title": video_title,
+                "link_version": link_version,
+                "transcript_version": transcript_version,
+                "transcript_span": [transcript_end - len(transcript), transcript_end]
+            }
+
+            print(
+                f"Link do YouTube detectado!\n"
+                f"URL: {url}\n"
+                f"ID do vídeo: {video_id}\n"
+                f"Título: {video_title}\n"
+                f"Transcrição (primeiros 100 caracteres): {transcript[:100]}... (tamanho total: {len(transcript)} caracteres)\n"
+                f"Mensagem armazenada: {message_to_store}\n"
+                f"Mensagem enviada: {message_to_send[:100]}...\n"
+            )
+
+        elif videos:
+            message_to_store, message_to_send, youtube_metadata = self._build_multi_video_message(message_text, videos)
+
+        return message_to_store, message_to_send, youtube_metadata
+
+    def _build_multi_video_message(self, message_text, videos):
+        """
+        Monta as versões de uma mensagem com vários vídeos. Cada vídeo vira uma seção independente,
+        para que sua transcrição possa ser trocada pelo link sem afetar os outros vídeos.
+
+        Args:
+            message_text (str): Texto da mensagem do usuário
+            videos (list): Lista de (url, video_id, título, transcrição)
+
+        Returns:
+            Tuple(str, str, dict): Versão com links, versão com transcrições e metadados do YouTube
+        """
+        message_without_links = message_text
+        for url, _, _, _ in videos:
+            message_without_links = " ".join(part.strip() for part in message_without_links.split(url) if part.strip())
+
+        total = len(videos)
+        video_sections = []
+        for position, (url, video_id, video_title, transcript) in enumerate(videos, start=1):
+            link_section = f" Fonte: {url}"
+            transcript_section = (
+                f"\n\n[Vídeo {position}/{total}] O usuário enviou o link {url}, segue abaixo a transcrição completa do vídeo com título: {video_title}, "
+                f"esta mesma pode conter erros de digitação ou falas misturadas caso o video possua mais de um narrador. "
+                f"Por favor, ignore quaisquer erros de digitação e foque na mensagem geral do conteúdo ao responder o usuário.\n\n"
+                f"{transcript}\n\n[Fim do vídeo {position}/{total}]"
+            )
+            transcript_end = len(transcript_section) - len(f"\n\n[Fim do vídeo {position}/{total}]")
+            self._start_summary(transcript, lambda summary, position=position, url=url, video_title=video_title: (
+                f"\n\n[Vídeo {position}/{total}] O usuário enviou o link {url}, segue abaixo os trechos mais representativos da transcrição do vídeo com título: {video_title} "
+                f"(a transcrição completa não cabe no contexto). Os trechos podem conter erros de digitação; foque na mensagem geral do conteúdo ao responder o usuário.\n\n"
+                f"{summary}\n\n[Fim do vídeo {position}/{total}]"
+            ), transcript_section)
+            video_sections.append({
+                "url": url,
+                "video_id": video_id,
+                "video_title": video_title,
+                "link_version": link_section,
+                "transcript_version": transcript_section,
+                "transcript_span": [transcript_end - len(transcript), transcript_end]
+            })
+
+        link_version = message_without_links + "".join(section["link_version"] for section in video_sections)
+        transcript_version = message_without_links + "".join(section["transcript_version"] for section in video_sections)
+        youtube_metadata = {
+            "url": videos[0][0],
+            "video_id": videos[0][1],
+            "video_title": " | ".join(section["video_title"] for section in video_sections),
+            "link_version": link_version,
+            "transcript_version": transcript_version,
+            "videos": video_sections
+        }
+
+        print(
+            f"{total} links do YouTube detectados!\n"
+            + "".join(f"- {section['video_title']} ({section['video_id']}): {section['url']}\n" for section in video_sections)
+            + f"Mensagem armazenada: {link_version}\n"
+            f"Mensagem enviada: {transcript_version[:100]}...\n"
+        )
+        return link_version, transcript_version, youtube_metadata
@@ -0,0 +1,165 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from text_chunks import word_chunk_spans
+
+class VideoVectorIndex:
+    """
+    Chunk embeddings of transcripts, computed once per video and embedding model.
+
+    When a transcript is indexed its chunks are embedded (in batches) and kept as one contiguous float32
+    matrix of L2-normalized rows, next to the chunk character spans. A question then costs a single
+    embeddings request for the query and one matrix-vector product, instead of re-embedding every chunk.
+    """
+    def __init__(self, rag_manager, chunk_words=120, max_videos=32, batch_size=64):
+        """
+        Initialize the index.
+
+        Args:
+            rag_manager (RAGManager): Source of the embeddings (its model and _get_embeddings).
+            chunk_words (int): Words per chunk (the chunking of RAGManager._break_into_chunks).
+            max_videos (int): Indexed videos kept in memory, least recently used dropped first.
+            batch_size (int): Chunks sent per embeddings request while indexing.
+        """
+        self.rag_manager = rag_manager
+        self.chunk_words = chunk_words
+        self.max_videos = max_videos
+        self.batch_size = batch_size
+        self._entries = OrderedDict()  # (video_id, model) -> {"spans", "matrix", "checksum"}
+        self._pending = {}  # (video_id, model) -> Future of an indexing started by add_async
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vector-index")
+
+    @property
+    def model(self):
+        return getattr(self.rag_manager, "model", None)
+
+    def available(self):
+        """True when an embedding model is configured."""
+        return self.model is not None
+
+    @staticmethod
+    def checksum(text):
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def get(self, video_id, text=None):
+        """
+        The index entry of a video for the current model, or None.
+
+        Args:
+            video_id (str): The video ID.
+            text (str): The transcript the caller has; an entry built from a different text is ignored.
+
+        Returns:
+            dict: {"spans": (n, 2) int array of chunk character offsets, "matrix": (n, dim) float32, "checksum"}
+        """
+        key = (video_id, self.model)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        if text is not None and entry["checksum"] != self.checksum(text):
+            return None
+        return entry
+
+    def add(self, video_id, text):
+        """
+        Embeds the chunks of a transcript and stores them (no-op if already indexed for this model;
+        waits for the background indexing of the same video instead of embedding it twice).
+
+        Returns:
+            dict: The index entry, or None if no embeddings could be obtained.
+        """
+        entry = self.get(video_id, text)
+        if entry is not None or not self.available() or not text:
+            return entry
+        with self._lock:
+            pending = self._pending.get((video_id, self.model))
+        if pending is not None:
+            pending.result()
+            entry = self.get(video_id, text)
+            if entry is not None:
+                return entry
+        return self._build(video_id, text)
+
+    def add_async(self, video_id, text):
+        """Indexes a transcript in the background (at ingest time). Returns a Future of the entry."""
+        key = (video_id, self.model)
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key]
+            future = self._executor.submit(self._build, video_id, text)
+            self._pending[key] = future
+        future.add_done_callback(lambda _: self._forget_pending(key, future))
+        return future
+
+    def _forget_pending(self, key, future):
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+    def _build(self, video_id, text):
+        entry = self.get(video_id, text)
+        if entry is not None or not self.available() or not text:
+            return entry
+        spans = word_chunk_spans(text, self.chunk_words)
+        chunks = [" ".join(text[start:end].split()) for start, end in spans]
+        embeddings = []
+        try:
+            for start in range(0, len(chunks), self.batch_size):
+                batch = self.rag_manager._get_embeddings(chunks[start:start + self.batch_size])
+                if not batch or len(batch) != len(chunks[start:start + self.batch_size]):
+                    print(f"[VideoVectorIndex] No embeddings for {video_id}, not indexed")
+                    return None
+                embeddings.extend(batch)
+        except Exception as e:
+            print(f"[VideoVectorIndex] Indexing {video_id} failed: {e}")
+            return None
+
+        entry = {
+            "spans": np.asarray(spans, dtype=np.int64).reshape(-1, 2),
+            "matrix": np.ascontiguousarray(self._normalize(embeddings)),
+            "checksum": self.checksum(text)
+        }
+        with self._lock:
+            self._entries[(video_id, self.model)] = entry
+            self._entries.move_to_end((video_id, self.model))
+            while len(self._entries) > self.max_videos:
+                self._entries.popitem(last=False)
+        print(f"[VideoVectorIndex] Indexed {video_id}: {len(chunks)} chunk(s) with {self.model}")
+        return entry
+
+    def query_vector(self, query):
+        """The normalized embedding of a query (one request), or None."""
+        try:
+            embeddings = self.rag_manager._get_embeddings([query]) if self.available() else None
+        except Exception as e:
+            print(f"[VideoVectorIndex] Query embedding failed: {e}")
+            return None
+        if not embeddings:
+            return None
+        return self._normalize(embeddings[0])
+
+    def scores(self, entry, query):
+        """Cosine similarity of every chunk of an entry to the query, or None if the query could not be embedded."""
+        vector = self.query_vector(query)
+        if vector is None or vector.shape[0] != entry["matrix"].shape[1]:
+            return None
+        return entry["matrix"] @ vector
+
+    def forget(self, video_id=None):
+        """Drops one video (every model) or the whole index."""
+        with self._lock:
+            for key in [key for key in self._entries if video_id is None or key[0] == video_id]:
+                del self._entries[key]
@@ -1,22 +1,200 @@
-from youtube_transcript_api import YouTubeTranscriptApi
-from tenacity import retry, stop_after_attempt, wait_exponential
-from youtube_transcript_api.formatters import TextFormatter
+from youtube_transcript_api import (
+    YouTubeTranscriptApi, NoTranscriptFound, TranscriptsDisabled, VideoUnavailable, VideoUnplayable,
+    InvalidVideoId, AgeRestricted, RequestBlocked, YouTubeRequestFailed
+)
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 import requests
+import codecs
 import re
 import os
+import threading
+from collections import OrderedDict
 from typing import Optional, List, Tuple
+from urllib.parse import urlparse, parse_qs
+from circuit_breaker import CircuitBreaker
+from http_client import get_shared_client
+from transcript_segments import TranscriptSegments
+from transcript_normalizer import TranscriptNormalizer
+
+# Hosts que servem a página do YouTube (www., m. e music. são normalizados para youtube.com)
+YOUTUBE_HOSTS = {"youtube.com", "youtube-nocookie.com", "youtu.be"}
+# Encurtadores conhecidos: são os únicos links que justificam uma requisição de rede para descobrir o destino
+REDIRECTOR_HOSTS = {
+    "tinyurl.com", "bit.ly", "t.co", "goo.gl", "ow.ly", "is.gd", "buff.ly",
+    "rebrand.ly", "cutt.ly", "shorturl.at", "tiny.cc", "lnkd.in", "t.ly", "rb.gy",
+}
+VIDEO_ID_PATTERN = re.compile(r'^([a-zA-Z0-9_-]{11})(?![a-zA-Z0-9_-])')
+# Prefixos de caminho que carregam o ID do vídeo no segmento seguinte (youtube.com/<prefixo>/<id>)
+VIDEO_PATH_PREFIXES = {"embed", "shorts", "live", "v", "e"}
+# Expressão regular antiga, usada apenas como último recurso para links do YouTube embutidos em outras URLs
+LEGACY_VIDEO_URL_PATTERN = re.compile(r'(?:https?:\/\/)?(?:www\.)?(?:youtube\.com\/(?:.*?v=|embed\/|v\/)|youtu\.be\/)([a-zA-Z0-9_-]{11})')
+
+# Padrões usados na leitura parcial da página do vídeo
+TITLE_TAG_PATTERN = re.compile(r'<title>(.*?)</title>', re.DOTALL)
+OG_TITLE_PATTERN = re.compile(r'<meta property="og:title" content="(.*?)">')
+CHANNEL_ITEMPROP_PATTERN = re.compile(r'<link itemprop="name" content="(.*?)">')
+CHANNEL_JSON_PATTERN = re.compile(r'"ownerChannelName":"(.*?)"')
+DURATION_ITEMPROP_PATTERN = re.compile(r'<meta itemprop="duration" content="PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?">')
+DURATION_JSON_PATTERN = re.compile(r'"lengthSeconds":"(\d+)"')
+
+# Horários e nomes de falantes removidos do texto de cada trecho da legenda
+TIMESTAMP_TAG_PATTERN = re.compile(r'\[\d+:\d+:\d+\]')
+SPEAKER_TAG_PATTERN = re.compile(r'<\w+>')
+
+# Falhas que justificam tentar de novo (rede instável, erro HTTP passageiro do YouTube)
+TRANSIENT_TRANSCRIPT_ERRORS = (requests.ConnectionError, requests.Timeout, YouTubeRequestFailed)
+
+# Tempo (segundos) que cada tipo de falha fica no cache negativo
+NEGATIVE_CACHE_TTLS = {
+    "no_transcript": 6 * 3600,
+    "video_unavailable": 24 * 3600,
+    "rate_limited": 5 * 60,
+}
+
+class TranscriptFetchError(Exception):
+    """
+    Falha definitiva ao baixar uma legenda, com o motivo classificado
+    ("no_transcript", "video_unavailable" ou "rate_limited").
+    """
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+def classify_transcript_error(error: Exception) -> Optional[str]:
+    """
+    Classifica uma exceção da youtube_transcript_api para o cache negativo.
+
+    Retorna:
+        Optional[str]: "no_transcript", "video_unavailable", "rate_limited" ou None (falha passageira/desconhecida).
+    """
+    if isinstance(error, TranscriptFetchError):
+        return error.reason
+    if isinstance(error, RequestBlocked):
+        return "rate_limited"
+    if isinstance(error, YouTubeRequestFailed) and "429" in str(getattr(error, "reason", "")):
+        return "rate_limited"
+    if isinstance(error, (NoTranscriptFound, TranscriptsDisabled)):
+        return "no_transcript"
+    if isinstance(error, (VideoUnavailable, VideoUnplayable, InvalidVideoId, AgeRestricted)):
+        return "video_unavailable"
+    return None
+
+def classify_youtube_url(url: str) -> Tuple[str, Optional[str]]:
+    """
+    Classifica uma URL localmente, sem acessar a rede.
+
+    Args:
+        url (str): A URL a ser classificada.
+
+    Retorna:
+        Tuple[str, Optional[str]]: (tipo, video_id), onde tipo é:
+            "video": URL do YouTube com ID de vídeo válido (video_id preenchido)
+            "youtube": URL do YouTube sem ID de vídeo (canal, playlist, página inicial...)
+            "redirect": encurtador conhecido, precisa de resolução pela rede
+            "other": qualquer outra URL
+    """
+    url = url.strip()
+    if not re.match(r'^[a-zA-Z][a-zA-Z0-9+.-]*://', url):
+        url = f"https://{url}"  # aceita links como "www.youtube.com/watch?v=..."
+
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return "other", None
+
+    host = (parsed.hostname or "").lower()
+    for prefix in ("www.", "m.", "music."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+
+    if host in REDIRECTOR_HOSTS:
+        return "redirect", None
+
+    if host not in YOUTUBE_HOSTS:
+        # Último recurso: links do YouTube embutidos em outras URLs (ex.: parâmetros de redirecionamento)
+        match = LEGACY_VIDEO_URL_PATTERN.search(url)
+        return ("video", match.group(1)) if match else ("other", None)
+
+    path_parts = [part for part in parsed.path.split("/") if part]
+    candidate = None
+
+    if host == "youtu.be":
+        candidate = path_parts[0] if path_parts else None
+    elif path_parts and path_parts[0] == "watch":
+        candidate = parse_qs(parsed.query).get("v", [None])[0]
+    elif len(path_parts) >= 2 and path_parts[0] in VIDEO_PATH_PREFIXES:
+        candidate = path_parts[1]
+    elif path_parts and path_parts[0] == "attribution_link":
+        # youtube.com/attribution_link?u=/watch%3Fv%3D<id>...
+        inner = parse_qs(parsed.query).get("u", [""])[0]
+        candidate = parse_qs(urlparse(inner).query).get("v", [None])[0]
+
+    match = VIDEO_ID_PATTERN.match(candidate) if candidate else None
+    if match:
+        return "video", match.group(1)
+    return "youtube", None
 
 class YouTubeTranscriptDownloader:
     """
     Uma classe para baixar e gerenciar legendas de vídeos do YouTube.
 
     Atributos:
-        None
+        languages (List[str]): Idiomas aceitos para a legenda gerada, em ordem de preferência.
     """
+    DEFAULT_LANGUAGES = ['en', 'pt']
+    # Compartilhado entre instâncias: o YouTube limita requisições por IP, não por objeto
+    transcript_breaker = CircuitBreaker("youtube-transcripts", failure_threshold=3, reset_timeout=120)
+
+    def __init__(self, languages: Optional[List[str]] = None, cache=None, transcript_breaker: Optional[CircuitBreaker] = None,
+                 normalize_transcripts: bool = True, http_client=None):
+        """
+        Inicializa o downloader.
+
+        Args:
+            languages (Optional[List[str]]): Idiomas aceitos, em ordem de preferência. Padrão: ['en', 'pt'].
+            cache (Optional[TranscriptCache]): Cache usado para lembrar falhas definitivas (cache negativo).
+            transcript_breaker (Optional[CircuitBreaker]): Circuit breaker da API de legendas (padrão: o da classe).
+            normalize_transcripts (bool): Limpa legendas automáticas (repetições, [Music], linhas curtas) antes de usá-las.
+            http_client (Optional[HttpClient]): Cliente HTTP com conexões reaproveitadas (padrão: o compartilhado).
+        """
+        self.languages = list(languages) if languages else list(self.DEFAULT_LANGUAGES)
+        self.cache = cache
+        self.normalize_transcripts = normalize_transcripts
+        self.http = http_client or get_shared_client()
+        # A YouTubeTranscriptApi não é thread-safe: uma instância por thread, todas usando o mesmo pool de conexões
+        self._transcript_api_local = threading.local()
+        if transcript_breaker is not None:
+            self.transcript_breaker = transcript_breaker
+        # Cache do destino de encurtadores já resolvidos: url -> video_id (ou None)
+        self._redirect_cache = OrderedDict()
+        self._redirect_cache_lock = threading.Lock()
+        # Metadados já lidos da página do vídeo: video_id -> {"title", "channel", "duration_seconds"}
+        self._metadata_memo = OrderedDict()
+        self._metadata_memo_lock = threading.Lock()
+        # Últimas legendas baixadas, com os horários de cada trecho: video_id -> TranscriptSegments
+        self._segments_memo = OrderedDict()
+        self._segments_memo_lock = threading.Lock()
+
+    @property
+    def cache_language(self) -> str:
+        """
+        Chave de idioma usada no cache de legendas (a lista de preferência, ex.: "en,pt").
+        """
+        return ",".join(self.languages)
+
+    REDIRECT_CACHE_SIZE = 1024
+    METADATA_CHUNK_SIZE = 16 * 1024
+    METADATA_MAX_BYTES = 512 * 1024  # limite de leitura caso canal/duração não apareçam
+    METADATA_OVERLAP = 1024  # sobreposição entre janelas, para não perder tags cortadas entre chunks
+    METADATA_MEMO_SIZE = 1024
+    SEGMENTS_MEMO_SIZE = 64  # legendas são grandes, só as mais recentes ficam em memória
 
     def get_video_id(self, youtube_url: str) -> Optional[str]:
         """
         Extrai o ID do vídeo de uma URL do YouTube, incluindo URLs encurtadas.
+        URLs do YouTube (watch, youtu.be, shorts, embed, live, m., music.) são resolvidas localmente;
+        apenas encurtadores conhecidos fazem uma requisição de rede, e o destino fica em cache.
 
         Args:
             youtube_url (str): A URL do YouTube.
@@ -24,18 +202,31 @@ class YouTubeTranscriptDownloader:
         Retorna:
             Optional[str]: O ID do vídeo extraído ou None se não encontrado.
         """
+        kind, video_id = classify_youtube_url(youtube_url)
+        if kind != "redirect":
+            return video_id
+
+        with self._redirect_cache_lock:
+            if youtube_url in self._redirect_cache:
+                self._redirect_cache.move_to_end(youtube_url)
+                return self._redirect_cache[youtube_url]
+
         # Resolve URL encurtada para sua forma original
         try:
-            response = requests.head(youtube_url, allow_redirects=True)
-            youtube_url = response.url
+            response = self.http.head(youtube_url, allow_redirects=True, timeout=(5, 10))
+            resolved_url = response.url
         except requests.RequestException as e:
             print(f"Erro ao resolver URL: {e}")
-            return None
+            return None  # falhas de rede não entram no cache
 
-        # Expressão regular melhorada para capturar formatos comuns de URLs do YouTube, incluindo youtu.be e strings de consulta
-        pattern = r'(?:https?:\/\/)?(?:www\.)?(?:youtube\.com\/(?:.*?v=|embed\/|v\/)|youtu\.be\/)([a-zA-Z0-9_-]{11})'
-        match = re.search(pattern, youtube_url)
-        return match.group(1) if match else None
+        kind, video_id = classify_youtube_url(resolved_url)
+        video_id = video_id if kind == "video" else None
+
+        with self._redirect_cache_lock:
+            self._redirect_cache[youtube_url] = video_id
+            while len(self._redirect_cache) > self.REDIRECT_CACHE_SIZE:
+                self._redirect_cache.popitem(last=False)
+        return video_id
 
     def get_video_title(self, video_id: str) -> str:
         """
@@ -47,20 +238,89 @@ class YouTubeTranscriptDownloader:
         Retorna:
             str: O título do vídeo ou "Desconhecido" se não encontrado.
         """
+        return self.get_video_metadata(video_id)["title"] or "Desconhecido"
+
+    def get_video_metadata(self, video_id: str) -> dict:
+        """
+        Obtém título, canal e duração do vídeo lendo a página do YouTube em partes (streaming).
+        A leitura para assim que os três campos aparecem (ou ao atingir METADATA_MAX_BYTES),
+        em vez de baixar a página inteira (mais de 1 MB de HTML e JS).
+
+        Args:
+            video_id (str): O ID do vídeo do YouTube.
+
+        Retorna:
+            dict: {"title": Optional[str], "channel": Optional[str], "duration_seconds": Optional[int]}
+        """
+        with self._metadata_memo_lock:
+            if video_id in self._metadata_memo:
+                return dict(self._metadata_memo[video_id])
+
+        metadata = {"title": None, "channel": None, "duration_seconds": None}
         url = f"https://www.youtube.com/watch?v={video_id}"
+        response = None
         try:
-            response = requests.get(url)
+            response = self.http.get(url, stream=True, timeout=(5, 15))
             response.raise_for_status()
-            matches = re.findall(r'<title>(.*?)</title>', response.text)
-            return matches[0].replace(" - YouTube", "") if matches else "Desconhecido"
+
+            buffer = ""
+            bytes_read = 0
+            # Decodificador incremental: um caractere multibyte dividido entre duas partes não se perde
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            for chunk in response.iter_content(chunk_size=self.METADATA_CHUNK_SIZE):
+                if not chunk:
+                    continue
+                bytes_read += len(chunk)
+                # Só a janela nova (com sobreposição) é analisada, para não repetir a busca no buffer inteiro
+                search_from = max(0, len(buffer) - self.METADATA_OVERLAP)
+                buffer += decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+                self._extract_metadata(buffer[search_from:], metadata)
+
+                if all(value is not None for value in metadata.values()) or bytes_read >= self.METADATA_MAX_BYTES:
+                    break
         except requests.RequestException as e:
             print(f"Erro ao buscar título do vídeo: {e}")
-            return "Desconhecido"
+            return metadata
+        finally:
+            if response is not None:
+                response.close()  # encerra a conexão sem baixar o resto da página
+
+        if metadata["title"]:
+            with self._metadata_memo_lock:
+                self._metadata_memo[video_id] = dict(metadata)
+                while len(self._metadata_memo) > self.METADATA_MEMO_SIZE:
+                    self._metadata_memo.popitem(last=False)
+        return metadata
+
+    @staticmethod
+    def _extract_metadata(text: str, metadata: dict) -> None:
+        """
+        Preenche os campos ainda ausentes de `metadata` a partir de um trecho do HTML.
+        """
+        if metadata["title"] is None:
+            match = TITLE_TAG_PATTERN.search(text) or OG_TITLE_PATTERN.search(text)
+            if match:
+                metadata["title"] = match.group(1).replace(" - YouTube", "")
+
+        if metadata["channel"] is None:
+            match = CHANNEL_ITEMPROP_PATTERN.search(text) or CHANNEL_JSON_PATTERN.search(text)
+            if match:
+                metadata["channel"] = match.group(1)
+
+        if metadata["duration_seconds"] is None:
+            match = DURATION_ITEMPROP_PATTERN.search(text)
+            if match:
+                hours, minutes, seconds = (int(group) if group else 0 for group in match.groups())
+                metadata["duration_seconds"] = hours * 3600 + minutes * 60 + seconds
+            else:
+                match = DURATION_JSON_PATTERN.search(text)
+                if match:
+                    metadata["duration_seconds"] = int(match.group(1))
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
     def download_transcript(self, video_id: str) -> str:
         """
-        Baixa a legenda e retorna como uma string.
+        Baixa a legenda e retorna como uma string (os trechos separados por quebra de linha).
+        Os horários de cada trecho ficam disponíveis em get_transcript_segments().
 
         Args:
             video_id (str): O ID do vídeo do YouTube.
@@ -68,24 +328,129 @@ class YouTubeTranscriptDownloader:
         Retorna:
             str: A legenda em texto ou uma string vazia se ocorrer um erro.
         """
-        try:
-            transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-            transcript = transcript_list.find_generated_transcript(['en', 'pt'])
+        segments = self.download_transcript_segments(video_id)
+        return segments.text if segments is not None else ""
 
-            if transcript is None:
-                print(f"Aviso: Nenhuma legenda encontrada para o vídeo {video_id} nos idiomas ['en', 'pt'].")
-                return ""
+    def download_transcript_segments(self, video_id: str) -> Optional[TranscriptSegments]:
+        """
+        Baixa a legenda mantendo o início, a duração e a posição no texto de cada trecho.
+        Falhas definitivas (sem legenda, vídeo indisponível, limite de requisições) ficam no cache negativo,
+        e enquanto o YouTube estiver limitando as requisições o circuit breaker falha imediatamente.
+
+        Args:
+            video_id (str): O ID do vídeo do YouTube.
 
-            formatter = TextFormatter()
-            transcript_text = formatter.format_transcript(transcript.fetch())
+        Retorna:
+            Optional[TranscriptSegments]: Os trechos da legenda ou None se ocorrer um erro.
+        """
+        if self.cache is not None:
+            reason = self.cache.get_negative(video_id, self.cache_language)
+            if reason:
+                print(f"Aviso: legenda de {video_id} indisponível recentemente ({reason}), pulando download.")
+                return None
 
-            # Remove horários e nomes de falantes
-            transcript_text = re.sub(r'\[\d+:\d+:\d+\]', '', transcript_text)
-            transcript_text = re.sub(r'<\w+>', '', transcript_text)
-            return transcript_text
+        if not self.transcript_breaker.allow_request():
+            print(f"Aviso: API de legendas temporariamente bloqueada (circuit breaker aberto), pulando {video_id}.")
+            return None
+
+        try:
+            segments = self._fetch_transcript(video_id)
         except Exception as e:
-            print(f"Erro inesperado ao baixar legenda para {video_id}: {e}")
-            return ""
+            reason = classify_transcript_error(e)
+            if reason == "rate_limited":
+                self.transcript_breaker.trip()
+            elif reason is not None:
+                self.transcript_breaker.record_success()  # o YouTube respondeu, só não há legenda
+            elif isinstance(e, TRANSIENT_TRANSCRIPT_ERRORS):
+                self.transcript_breaker.record_failure()  # esgotou as tentativas
+
+            if reason is None:
+                print(f"Erro inesperado ao baixar legenda para {video_id}: {e}")
+                return None
+
+            if self.cache is not None:
+                self.cache.put_negative(video_id, self.cache_language, reason, NEGATIVE_CACHE_TTLS[reason])
+            print(f"Legenda indisponível para {video_id} ({reason}): {e}")
+            return None
+
+        self.transcript_breaker.record_success()
+        with self._segments_memo_lock:
+            self._segments_memo[video_id] = segments
+            self._segments_memo.move_to_end(video_id)
+            while len(self._segments_memo) > self.SEGMENTS_MEMO_SIZE:
+                self._segments_memo.popitem(last=False)
+        return segments
+
+    def get_transcript_segments(self, video_id: str, allow_download: bool = True) -> Optional[TranscriptSegments]:
+        """
+        Obtém os trechos da legenda com horários: da memória, do cache em disco ou (se permitido) do YouTube.
+
+        Args:
+            video_id (str): O ID do vídeo do YouTube.
+            allow_download (bool): Se False, nunca acessa a rede.
+
+        Retorna:
+            Optional[TranscriptSegments]: Os trechos da legenda ou None se não disponíveis.
+        """
+        with self._segments_memo_lock:
+            if video_id in self._segments_memo:
+                self._segments_memo.move_to_end(video_id)
+                return self._segments_memo[video_id]
+
+        if self.cache is not None:
+            cached = self.cache.get(video_id, self.cache_language)
+            if cached is not None:
+                segments = TranscriptSegments.from_bytes(cached["transcript"], cached["segments"])
+                if segments is not None:
+                    return segments
+
+        return self.download_transcript_segments(video_id) if allow_download else None
+
+    @retry(
+        retry=retry_if_exception_type(TRANSIENT_TRANSCRIPT_ERRORS),
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=1, max=10),
+        reraise=True
+    )
+    def _fetch_transcript(self, video_id: str) -> TranscriptSegments:
+        """
+        Busca a legenda na API, sem tratamento de erros. Apenas falhas passageiras são repetidas (com backoff).
+        Os horários de cada trecho são mantidos em vez de descartados pela formatação em texto.
+
+        Raises:
+            TranscriptFetchError: Se nenhuma legenda existir nos idiomas aceitos.
+        """
+        transcript_list = self._transcript_api().list(video_id)
+        transcript = transcript_list.find_generated_transcript(self.languages)
+
+        if transcript is None:
+            raise TranscriptFetchError("no_transcript", f"Nenhuma legenda encontrada para o vídeo {video_id} nos idiomas {self.languages}.")
+
+        # Remove horários e nomes de falantes de cada trecho
+        clean = lambda text: SPEAKER_TAG_PATTERN.sub('', TIMESTAMP_TAG_PATTERN.sub('', text))
+        if not self.normalize_transcripts:
+            return TranscriptSegments.from_snippets(transcript.fetch(), clean=clean)
+
+        # Junta as linhas curtas em frases e remove repetições e marcações ([Music], [Applause]...)
+        normalizer = TranscriptNormalizer()
+        segments = TranscriptSegments.from_snippets(normalizer.normalize(transcript.fetch(), clean=clean))
+        stats = normalizer.summary()
+        if stats["chars_saved"] > 0:
+            print(
+                f"Legenda de {video_id} normalizada: {stats['segments_in']} -> {stats['segments_out']} trechos, "
+                f"{stats['chars_saved']} caracteres a menos (~{stats['tokens_saved_estimate']} tokens)"
+            )
+        return segments
+
+    def _transcript_api(self) -> YouTubeTranscriptApi:
+        """
+        Retorna a instância da YouTubeTranscriptApi da thread atual, criando-a na primeira chamada.
+        """
+        api = getattr(self._transcript_api_local, "api", None)
+        if api is None:
+            api = YouTubeTranscriptApi(http_client=self.http.new_session())
+            self._transcript_api_local.api = api
+        return api
 
     def save_transcript(self, video_id: str, transcript_text: str) -> Optional[str]:
         """